@@ -0,0 +1,198 @@
+# TESTE 1 - MOTOR DE DOWNLOAD
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Download concorrente, em streaming e retomável dos ZIPs trimestrais da ANS
+
+# Bibliotecas
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configurações
+
+TAMANHO_CHUNK = 1024 * 1024
+TIMEOUT = (10, 60)
+MAX_TENTATIVAS = 5
+ESPERA_BASE = 1.0
+
+# Funções
+
+
+def criar_sessao(max_conexoes=4):
+    """Cria sessão HTTP com pool de conexões e retry para erros transitórios."""
+    retry = Retry(
+        total=MAX_TENTATIVAS,
+        backoff_factor=ESPERA_BASE,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'HEAD'],
+        raise_on_status=False
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=max_conexoes,
+        pool_maxsize=max_conexoes,
+        max_retries=retry
+    )
+
+    sessao = requests.Session()
+    sessao.mount('http://', adaptador)
+    sessao.mount('https://', adaptador)
+    return sessao
+
+
+def _caminho_metadados(caminho_destino):
+    return caminho_destino.with_name(caminho_destino.name + '.meta.json')
+
+
+def _caminho_parcial(caminho_destino):
+    return caminho_destino.with_name(caminho_destino.name + '.part')
+
+
+def _ler_metadados(caminho_destino):
+    caminho_meta = _caminho_metadados(caminho_destino)
+    if not caminho_meta.exists():
+        return {}
+    try:
+        return json.loads(caminho_meta.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _salvar_metadados(caminho_destino, resposta, tamanho):
+    metadados = {
+        'url': resposta.url,
+        'etag': resposta.headers.get('ETag'),
+        'last_modified': resposta.headers.get('Last-Modified'),
+        'tamanho': tamanho
+    }
+    _caminho_metadados(caminho_destino).write_text(
+        json.dumps(metadados, indent=2), encoding='utf-8')
+
+
+def _cabecalhos_condicionais(caminho_destino, metadados):
+    """Monta If-None-Match/If-Modified-Since para um arquivo já completo."""
+    cabecalhos = {}
+    if not caminho_destino.exists():
+        return cabecalhos
+    if metadados.get('tamanho') != caminho_destino.stat().st_size:
+        return cabecalhos
+
+    if metadados.get('etag'):
+        cabecalhos['If-None-Match'] = metadados['etag']
+    if metadados.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = metadados['last_modified']
+    return cabecalhos
+
+
+def baixar_arquivo(sessao, url, caminho_destino):
+    """
+    Baixa um arquivo em chunks, retomando downloads parciais com HTTP Range
+    quando o corpo da resposta é interrompido. Retorna 'baixado', 'retomado' ou 'inalterado' (ETag/Last-Modified).
+    """
+    caminho_destino = Path(caminho_destino)
+    caminho_parcial = _caminho_parcial(caminho_destino)
+    metadados = _ler_metadados(caminho_destino)
+    resultado = 'baixado'
+
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        cabecalhos = _cabecalhos_condicionais(caminho_destino, metadados)
+
+        inicio = caminho_parcial.stat().st_size if caminho_parcial.exists() else 0
+        if inicio:
+            cabecalhos = {'Range': f'bytes={inicio}-'}
+            validador = metadados.get('etag_parcial') or metadados.get('last_modified_parcial')
+            if validador:
+                cabecalhos['If-Range'] = validador
+
+        # Falhas de conexão e status 429/5xx antes da resposta já são repetidas pelo Retry da sessão
+        with sessao.get(url, headers=cabecalhos, stream=True, timeout=TIMEOUT) as resposta:
+            if resposta.status_code == 304:
+                return 'inalterado'
+
+            if resposta.status_code == 416 and inicio:
+                # Parcial já tem o tamanho total ou está inconsistente: recomeça
+                caminho_parcial.unlink()
+                continue
+
+            resposta.raise_for_status()
+
+            if resposta.status_code == 206 and inicio:
+                modo = 'ab'
+                resultado = 'retomado'
+            else:
+                modo = 'wb'
+
+            # Guarda validadores para que uma retomada futura use If-Range
+            metadados['etag_parcial'] = resposta.headers.get('ETag')
+            metadados['last_modified_parcial'] = resposta.headers.get('Last-Modified')
+            _caminho_metadados(caminho_destino).write_text(
+                json.dumps(metadados, indent=2), encoding='utf-8')
+
+            try:
+                with open(caminho_parcial, modo) as arquivo:
+                    for chunk in resposta.iter_content(chunk_size=TAMANHO_CHUNK):
+                        if chunk:
+                            arquivo.write(chunk)
+
+                tamanho = caminho_parcial.stat().st_size
+                if resposta.status_code == 206:
+                    esperado = resposta.headers.get('Content-Range', '').rpartition('/')[2]
+                elif 'Content-Encoding' not in resposta.headers:
+                    esperado = resposta.headers.get('Content-Length', '')
+                else:
+                    esperado = ''
+                if esperado.isdigit() and int(esperado) != tamanho:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"download incompleto: {tamanho} de {esperado} bytes")
+
+            except (requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ConnectionError) as erro:
+                # Corpo interrompido no meio: a próxima tentativa retoma do .part com Range
+                falha = erro
+            else:
+                caminho_parcial.replace(caminho_destino)
+                _salvar_metadados(caminho_destino, resposta, tamanho)
+                return resultado
+
+        if tentativa == MAX_TENTATIVAS:
+            raise falha
+        print(f"  🔁 {caminho_destino.name}: tentativa {tentativa} interrompida ({falha})")
+        time.sleep(ESPERA_BASE * 2 ** (tentativa - 1))
+
+    raise RuntimeError(f"Não foi possível baixar {url}")
+
+
+def baixar_em_paralelo(tarefas, max_workers=4, sessao=None):
+    """
+    Baixa uma lista de (url, caminho_destino) usando um pool de threads limitado
+    e uma única sessão compartilhada. Retorna {caminho_destino: status}.
+    """
+    sessao_propria = sessao is None
+    if sessao_propria:
+        sessao = criar_sessao(max_workers)
+
+    resultados = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {
+                executor.submit(baixar_arquivo, sessao, url, destino): destino
+                for url, destino in tarefas
+            }
+            for futuro in as_completed(futuros):
+                destino = Path(futuros[futuro])
+                try:
+                    status = futuro.result()
+                    resultados[destino] = status
+                    print(f"  ✅ {destino.name} ({status})")
+                except Exception as erro:
+                    resultados[destino] = 'erro'
+                    print(f"  ❌ Erro ao baixar {destino.name}: {erro}")
+    finally:
+        if sessao_propria:
+            sessao.close()
+
+    return resultados
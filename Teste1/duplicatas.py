@@ -0,0 +1,172 @@
+# TESTE 1 - ÍNDICE DE DUPLICATAS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Detecção de duplicatas por hash de 64 bits, incremental (chunks) e persistível entre execuções
+
+# Bibliotecas
+
+import numpy as np
+import pandas as pd
+
+# Configurações
+
+# Tipo canônico de cada coluna antes do hash: o mesmo valor gera o mesmo hash
+# venha ele do DataFrame em memória (Int32/categórico), do CSV relido ou do Parquet
+TIPOS_CANONICOS = {
+    'REG_ANS': 'Int64',
+    'CNPJ': 'string',
+    'RazaoSocial': 'string',
+    'Ano': 'string',
+    'Trimestre': 'string',
+    'ValorDespesas': 'Float64',
+    'FlagValorSuspeito': 'boolean',
+}
+
+# Hashes acumulados antes de fundir no array ordenado
+MIN_PENDENTES = 1_000_000
+
+# Funções
+
+
+def _canonico(serie, tipo):
+    if tipo == 'string' and isinstance(serie.dtype, pd.CategoricalDtype):
+        # Categórico: converte só as categorias (o hash é o mesmo do texto equivalente)
+        return serie.astype(pd.CategoricalDtype(serie.cat.categories.astype('string')))
+    if tipo == 'Float64':
+        # -0.0 + 0.0 == 0.0: duplicated() trata os dois zeros como iguais, o hash não
+        return serie.astype(tipo) + 0.0
+    return serie.astype(tipo)
+
+
+def hash_linhas(df, colunas):
+    """Hash de 64 bits por linha sobre `colunas`, estável entre chunks, arquivos e execuções."""
+    canonico = pd.DataFrame({coluna: _canonico(df[coluna], TIPOS_CANONICOS[coluna])
+                             for coluna in colunas})
+    return pd.util.hash_pandas_object(canonico, index=False).to_numpy()
+
+
+def _contar(hashes):
+    chaves, contagens = np.unique(np.asarray(hashes, dtype=np.uint64), return_counts=True)
+    return chaves, contagens.astype(np.uint32)
+
+
+class IndiceDuplicatas:
+    """
+    Multiconjunto de hashes de linha: array ordenado de chaves únicas (uint64)
+    e a contagem de cada uma. Chunks novos entram com `adicionar` e são fundidos
+    em lote; `duplicados` responde duplicated(keep=False) para qualquer linha
+    já adicionada. Ocupa 12 bytes por linha distinta.
+    """
+
+    def __init__(self):
+        self.chaves = np.empty(0, dtype=np.uint64)
+        self.contagens = np.empty(0, dtype=np.uint32)
+        self._pendentes = []
+        self._qtd_pendentes = 0
+
+    def __len__(self):
+        self.compactar()
+        return len(self.chaves)
+
+    def adicionar(self, hashes, contagens=None):
+        """Acrescenta hashes (com multiplicidade opcional) ao índice."""
+        if contagens is None:
+            chaves, contagens = _contar(hashes)
+        else:
+            chaves = np.asarray(hashes, dtype=np.uint64)
+            contagens = np.asarray(contagens, dtype=np.uint32)
+
+        self._pendentes.append((chaves, contagens))
+        self._qtd_pendentes += len(chaves)
+        # Funde quando o lote pendente passa do tamanho do índice: custo amortizado O(n log n)
+        if self._qtd_pendentes >= max(MIN_PENDENTES, len(self.chaves)):
+            self.compactar()
+
+    def mesclar(self, outro):
+        """Soma as contagens de outro índice a este."""
+        outro.compactar()
+        self.adicionar(outro.chaves, outro.contagens)
+
+    def compactar(self):
+        """Funde os lotes pendentes no array ordenado."""
+        if not self._pendentes:
+            return
+
+        chaves = np.concatenate([self.chaves] + [chaves for chaves, _ in self._pendentes])
+        contagens = np.concatenate([self.contagens] + [contagens for _, contagens in self._pendentes])
+        self._pendentes = []
+        self._qtd_pendentes = 0
+
+        ordem = np.argsort(chaves, kind='stable')
+        chaves = chaves[ordem]
+        contagens = contagens[ordem]
+
+        inicio_grupo = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+        self.chaves = chaves[inicio_grupo]
+        self.contagens = np.add.reduceat(contagens, inicio_grupo) if len(chaves) else contagens
+
+    def contagem(self, hashes):
+        """Quantas vezes cada hash foi adicionado (0 se nunca)."""
+        self.compactar()
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(self.chaves):
+            return np.zeros(len(hashes), dtype=np.uint32)
+
+        # Busca com as consultas ordenadas: acesso sequencial ao array do índice
+        unicos, inverso = np.unique(hashes, return_inverse=True)
+        posicoes = np.searchsorted(self.chaves, unicos)
+        posicoes[posicoes == len(self.chaves)] = 0
+        encontrados = self.chaves[posicoes] == unicos
+        return np.where(encontrados, self.contagens[posicoes], 0)[inverso]
+
+    def duplicados(self, hashes):
+        """Equivalente a duplicated(keep=False) para linhas já adicionadas."""
+        return self.contagem(hashes) > 1
+
+
+class IndiceFlagDuplicado:
+    """
+    Índices das duas chaves de FlagDuplicado: duplicata exata (todas as colunas)
+    OU duplicata lógica (REG_ANS+Ano+Trimestre+ValorDespesas).
+    Pode ser salvo em .npz e recarregado em outra execução.
+    """
+
+    def __init__(self, chave_exata, chave_logica):
+        self.chaves = {'exata': list(chave_exata), 'logica': list(chave_logica)}
+        self.indices = {nome: IndiceDuplicatas() for nome in self.chaves}
+
+    def hashes(self, df):
+        """Hashes de cada linha de `df` nas duas chaves."""
+        return {nome: hash_linhas(df, colunas) for nome, colunas in self.chaves.items()}
+
+    def adicionar(self, hashes):
+        for nome, indice in self.indices.items():
+            indice.adicionar(hashes[nome])
+
+    def mesclar(self, outro):
+        for nome, indice in self.indices.items():
+            indice.mesclar(outro.indices[nome])
+
+    def marcar(self, hashes):
+        """FlagDuplicado das linhas com esses hashes (já adicionadas ao índice)."""
+        flag = np.zeros(len(hashes['exata']), dtype=bool)
+        for nome, indice in self.indices.items():
+            flag |= indice.duplicados(hashes[nome])
+        return flag
+
+    def salvar(self, caminho):
+        arrays = {}
+        for nome, indice in self.indices.items():
+            indice.compactar()
+            arrays[f'{nome}_chaves'] = indice.chaves
+            arrays[f'{nome}_contagens'] = indice.contagens
+        with open(caminho, 'wb') as arquivo:
+            np.savez(arquivo, **arrays)
+
+    @classmethod
+    def carregar(cls, caminho, chave_exata, chave_logica):
+        indice_flag = cls(chave_exata, chave_logica)
+        with np.load(caminho) as dados:
+            for nome, indice in indice_flag.indices.items():
+                indice.chaves = dados[f'{nome}_chaves']
+                indice.contagens = dados[f'{nome}_contagens']
+        return indice_flag
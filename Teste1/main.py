@@ -4,44 +4,97 @@
 
 # Bibliotecas
 
+import io
+import os
+import sys
 import pandas as pd
-import requests
-from pathlib import Path
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
 import zipfile
 from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comum.esquemas import ler_csv
+from comum.instrumentacao import Execucao, etapa, instrumentar, silenciar
+from comum.manifesto import carregar_manifesto, salvar_manifesto, impressao_digital, hash_dataframe
+from comum.parquet import PARQUET_DISPONIVEL, limpar_dataset, escrever_particionado
+from download import criar_sessao, baixar_em_paralelo
+from duplicatas import IndiceFlagDuplicado
 
 # Configurações
 
-URL_BASE = "https://dadosabertos.ans.gov.br/FTP/PDA/"
+# Pode apontar para um espelho local do FTP (ex.: http://localhost:8000/)
+URL_BASE = os.environ.get("ANS_URL_BASE", "https://dadosabertos.ans.gov.br/FTP/PDA/")
 
 # Trimestres definidos manualmente
 ANO = "2025"
 TRIMESTRES = ["1T2025", "2T2025", "3T2025"]
 
+# Downloads simultâneos (threads compartilhando uma sessão HTTP)
+MAX_DOWNLOADS_SIMULTANEOS = int(os.environ.get("ANS_MAX_DOWNLOADS", "4"))
+
 PASTA_ATUAL = Path(__file__).parent
 PASTA_DOWNLOADS = PASTA_ATUAL / "downloads"
 PASTA_EXTRAIDOS = PASTA_ATUAL / "extraídos"
 PASTA_PROCESSADOS = PASTA_ATUAL / "processados"
 
+# Modo debug: extrai os ZIPs em extraídos/ (por padrão, lê direto dos ZIPs)
+EXTRAIR_ZIPS = os.environ.get("ANS_EXTRAIR_ZIPS", "0") == "1"
+
+# Modo streaming: linhas por chunk (0 = processamento em memória)
+TAMANHO_CHUNK = int(os.environ.get("ANS_CHUNKSIZE", "0"))
+
+# Processos para leitura/normalização em paralelo (1 = sequencial)
+MAX_WORKERS = int(os.environ.get("ANS_WORKERS", "1"))
+
+PALAVRAS_CHAVE_DESPESAS = ['despesa', 'evento', 'sinistro']
+EXTENSOES_VALIDAS = ['.csv', '.txt', '.xls', '.xlsx']
+
+COLUNAS_FINAIS = [
+    'REG_ANS', 'CNPJ', 'RazaoSocial', 'Ano', 'Trimestre',
+    'ValorDespesas', 'FlagValorSuspeito', 'FlagDuplicado'
+]
+# FlagDuplicado: linha idêntica (todas as colunas) OU mesmo REG_ANS+período+valor
+CHAVE_DUPLICATA_EXATA = [coluna for coluna in COLUNAS_FINAIS if coluna != 'FlagDuplicado']
+CHAVE_DUPLICATA_LOGICA = ['REG_ANS', 'Ano', 'Trimestre', 'ValorDespesas']
+
+# Execução incremental: manifesto com hash/tamanho de cada ZIP e cache por ZIP
+CAMINHO_MANIFESTO = PASTA_PROCESSADOS / "manifesto.json"
+PASTA_CACHE = PASTA_PROCESSADOS / "cache"
+REPROCESSAR = os.environ.get("ANS_REPROCESSAR", "0") == "1"
+EXTENSOES_CACHE = ['.pkl', '.duplicatas.npz']
+
+# Dataset Parquet gerado junto com o CSV (requer pyarrow)
+PASTA_PARQUET = PASTA_PROCESSADOS / "consolidado_despesas_parquet"
+PARTICOES_PARQUET = ['Ano', 'Trimestre']
+
+# Relatório de cada execução: tempo, linhas, bytes e pico de memória por etapa
+# (ANS_PERFIL=cprofile,tracemalloc para perfil; ANS_SILENCIOSO=1 para omitir os prints)
+CAMINHO_RELATORIO = PASTA_PROCESSADOS / "relatorio_execucao.json"
+
 # Funções
 
 def criar_estrutura_pastas():
-    """Cria pastas: downloads/, extraídos/, processados/."""
+    """Cria pastas: downloads/, processados/ (e extraídos/ no modo debug)."""
     print("📁 Estrutura de pastas")
 
     PASTA_DOWNLOADS.mkdir(exist_ok=True)
-    PASTA_EXTRAIDOS.mkdir(exist_ok=True)
     PASTA_PROCESSADOS.mkdir(exist_ok=True)
+    if EXTRAIR_ZIPS:
+        PASTA_EXTRAIDOS.mkdir(exist_ok=True)
 
     print("✅ Pastas criadas\n")
 
 
-def encontrar_pasta_demonstracoes():
+def encontrar_pasta_demonstracoes(sessao):
     """Navega pelo FTP da ANS e retorna URL da pasta demonstracoes_contabeis."""
     print("🔍 FTP ANS")
 
     try:
-        resposta = requests.get(URL_BASE, timeout=30)
+        resposta = sessao.get(URL_BASE, timeout=30)
         resposta.raise_for_status()
 
         soup = BeautifulSoup(resposta.text, 'html.parser')
@@ -61,40 +114,35 @@ def encontrar_pasta_demonstracoes():
         return None
 
 
+@instrumentar('download')
 def baixar_arquivos_zip():
-    """Baixa os ZIPs dos trimestres especificados via HTTP."""
+    """
+    Baixa os ZIPs dos trimestres especificados via HTTP, em paralelo.
+    Downloads parciais são retomados e arquivos inalterados são pulados.
+    """
     print("📥 Download ZIP")
 
-    pasta_demonstracoes = encontrar_pasta_demonstracoes()
+    with criar_sessao(MAX_DOWNLOADS_SIMULTANEOS) as sessao:
+        pasta_demonstracoes = encontrar_pasta_demonstracoes(sessao)
 
-    if not pasta_demonstracoes:
-        print("  ❌ Não foi possível encontrar a pasta de demonstrações!")
-        return
-
-    for trimestre in TRIMESTRES:
-        url = f"{pasta_demonstracoes}{ANO}/{trimestre}.zip"
-        nome_arquivo = f"{trimestre}.zip"
-        caminho_destino = PASTA_DOWNLOADS / nome_arquivo
-
-        print(f"  🔽 {trimestre}")
-
-        try:
-            resposta = requests.get(url, timeout=30)
-            resposta.raise_for_status()
-
-            with open(caminho_destino, 'wb') as arquivo:
-                arquivo.write(resposta.content)
+        if not pasta_demonstracoes:
+            print("  ❌ Não foi possível encontrar a pasta de demonstrações!")
+            return
 
-            print(f"  ✅ {nome_arquivo}")
+        tarefas = [
+            (f"{pasta_demonstracoes}{ANO}/{trimestre}.zip",
+             PASTA_DOWNLOADS / f"{trimestre}.zip")
+            for trimestre in TRIMESTRES
+        ]
 
-        except Exception as erro:
-            print(f"  ❌ Erro ao baixar {trimestre}: {erro}")
+        baixar_em_paralelo(tarefas, MAX_DOWNLOADS_SIMULTANEOS, sessao)
 
     print()
 
 
+@instrumentar('extracao')
 def extrair_arquivos_zip():
-    """Extrai todos os arquivos ZIP baixados."""
+    """Extrai todos os arquivos ZIP baixados (apenas no modo debug)."""
     print("📦 Extração ZIP")
 
     arquivos_zip = list(PASTA_DOWNLOADS.glob("*.zip"))
@@ -114,28 +162,43 @@ def extrair_arquivos_zip():
     print()
 
 
-def identificar_arquivos_despesas():
-    """Busca arquivos por palavras-chave: despesa, evento, sinistro."""
-    print("🔍 Arquivos Despesas")
+@dataclass(frozen=True)
+class MembroZip:
+    """Arquivo dentro de um ZIP, lido sem extração para o disco."""
+    caminho_zip: Path
+    membro: str
+
+    @property
+    def name(self):
+        return PurePosixPath(self.membro).name
+
+    @property
+    def suffix(self):
+        return PurePosixPath(self.membro).suffix
+
+    def open(self, mode='rb'):
+        # O membro continua legível após fechar o ZipFile (referência compartilhada)
+        with zipfile.ZipFile(self.caminho_zip, 'r') as zip_ref:
+            return zip_ref.open(self.membro, 'r')
+
 
+def selecionar_arquivos_despesas(candidatos):
+    """Filtra por palavras-chave (despesa, evento, sinistro) com fallback por extensão."""
     arquivos_despesas = []
-    palavras_chave = ['despesa', 'evento', 'sinistro']
 
-    for arquivo in PASTA_EXTRAIDOS.rglob("*"):
-        if arquivo.is_file():
-            nome_arquivo_minusculo = arquivo.name.lower()
+    for arquivo in candidatos:
+        nome_arquivo_minusculo = arquivo.name.lower()
 
-            if any(palavra in nome_arquivo_minusculo for palavra in palavras_chave):
-                arquivos_despesas.append(arquivo)
-                print(f"  ✅ {arquivo.name}")
+        if any(palavra in nome_arquivo_minusculo for palavra in PALAVRAS_CHAVE_DESPESAS):
+            arquivos_despesas.append(arquivo)
+            print(f"  ✅ {arquivo.name}")
 
     if not arquivos_despesas:
         print("  ⚠️ Nenhum arquivo com palavras-chave")
         print("  🔄 Processando todos CSV/TXT/XLSX")
 
-        extensoes_validas = ['.csv', '.txt', '.xls', '.xlsx']
-        for arquivo in PASTA_EXTRAIDOS.rglob("*"):
-            if arquivo.is_file() and arquivo.suffix.lower() in extensoes_validas:
+        for arquivo in candidatos:
+            if arquivo.suffix.lower() in EXTENSOES_VALIDAS:
                 arquivos_despesas.append(arquivo)
                 print(f"  ✅ {arquivo.name}")
 
@@ -148,23 +211,59 @@ def identificar_arquivos_despesas():
     return arquivos_despesas
 
 
+def identificar_arquivos_despesas():
+    """Busca arquivos de despesas na pasta extraídos/ (modo debug)."""
+    print("🔍 Arquivos Despesas")
+
+    candidatos = [arquivo for arquivo in sorted(PASTA_EXTRAIDOS.rglob("*"))
+                  if arquivo.is_file()]
+
+    return selecionar_arquivos_despesas(candidatos)
+
+
+def identificar_membros_zip():
+    """Lista os membros dos ZIPs baixados (infolist) sem extrair nada para o disco."""
+    print("🔍 Arquivos Despesas (ZIP)")
+
+    arquivos_zip = sorted(PASTA_DOWNLOADS.glob("*.zip"))
+    if not arquivos_zip:
+        print("  ⚠️ Nenhum arquivo ZIP encontrado na pasta downloads!")
+        print()
+        return []
+
+    candidatos = []
+    for arquivo_zip in arquivos_zip:
+        try:
+            with zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
+                for info in zip_ref.infolist():
+                    if not info.is_dir():
+                        candidatos.append(MembroZip(arquivo_zip, info.filename))
+        except Exception as erro:
+            print(f"  ❌ Erro ao ler {arquivo_zip.name}: {erro}")
+
+    return selecionar_arquivos_despesas(candidatos)
+
+
+@instrumentar('leitura')
 def processar_arquivo(caminho_arquivo):
-    """Lê arquivo CSV/TXT/XLSX e retorna DataFrame."""
+    """Lê arquivo CSV/TXT/XLSX (do disco ou de dentro de um ZIP) e retorna DataFrame."""
     print(f"📄 {caminho_arquivo.name}")
 
     try:
         extensao = caminho_arquivo.suffix.lower()
 
-        if extensao == '.csv':
-            df = pd.read_csv(caminho_arquivo, encoding='utf-8', sep=';')
-        elif extensao == '.txt':
-            df = pd.read_csv(caminho_arquivo, encoding='utf-8', sep='\t')
-        elif extensao in ['.xls', '.xlsx']:
-            df = pd.read_excel(caminho_arquivo, engine='openpyxl')
-        else:
+        if extensao not in EXTENSOES_VALIDAS:
             print(f"  ⚠️ Formato de arquivo não suportado: {extensao}")
             return None
 
+        with caminho_arquivo.open('rb') as arquivo:
+            if extensao == '.csv':
+                df = ler_csv(arquivo, 'demonstracoes_contabeis')
+            elif extensao == '.txt':
+                df = ler_csv(arquivo, 'demonstracoes_contabeis', sep='\t')
+            else:
+                df = pd.read_excel(arquivo, engine='openpyxl')
+
         print(f"  ✅ {len(df)} linhas, {len(df.columns)} colunas")
         return df
 
@@ -173,128 +272,340 @@ def processar_arquivo(caminho_arquivo):
         return None
 
 
-def consolidar_dados(lista_arquivos):
-    """Processa e junta todos os arquivos em um único DataFrame."""
-    print("📊 Consolidação")
+def processar_arquivo_em_chunks(caminho_arquivo, tamanho_chunk):
+    """
+    Lê arquivo CSV/TXT em chunks de `tamanho_chunk` linhas (gerador).
+    XLSX não suporta leitura parcial: é lido inteiro e fatiado.
+    """
+    extensao = caminho_arquivo.suffix.lower()
+
+    if extensao not in EXTENSOES_VALIDAS:
+        print(f"  ⚠️ Formato de arquivo não suportado: {extensao}")
+        return
+
+    with caminho_arquivo.open('rb') as arquivo:
+        if extensao in ['.csv', '.txt']:
+            separador = ';' if extensao == '.csv' else '\t'
+            with ler_csv(arquivo, 'demonstracoes_contabeis', sep=separador,
+                         chunksize=tamanho_chunk) as leitor:
+                yield from leitor
+        else:
+            df = pd.read_excel(arquivo, engine='openpyxl')
+            for inicio in range(0, len(df), tamanho_chunk):
+                yield df.iloc[inicio:inicio + tamanho_chunk]
 
-    lista_dataframes = []
 
-    for arquivo in lista_arquivos:
-        df = processar_arquivo(arquivo)
+def compactar_tipos(df):
+    """Reduz tipos do DataFrame normalizado antes de devolvê-lo ao processo pai."""
+    if pd.api.types.is_integer_dtype(df['REG_ANS']):
+        df['REG_ANS'] = pd.to_numeric(df['REG_ANS'], downcast='integer')
+    df['Ano'] = df['Ano'].astype('category')
+    df['Trimestre'] = df['Trimestre'].astype('category')
+    return df
 
+
+def processar_e_normalizar(arquivo, exibir=False):
+    """
+    Lê e normaliza um arquivo (unidade de trabalho do pool de processos).
+    As mensagens são capturadas e devolvidas para o processo pai imprimir em ordem.
+    """
+    saida = io.StringIO()
+    with redirect_stdout(saida):
+        df = processar_arquivo(arquivo)
         if df is not None:
             df['arquivo_origem'] = arquivo.name
-            lista_dataframes.append(df)
+            df = compactar_tipos(normalizar_colunas(df, exibir=exibir))
+    return df, saida.getvalue()
+
+
+def ler_arquivos(lista_arquivos, max_workers=1):
+    """
+    Lê e normaliza cada arquivo; com max_workers > 1 usa um ProcessPoolExecutor.
+    Retorna [(arquivo, DataFrame)] na ordem de lista_arquivos (só os lidos com sucesso).
+    """
+    exibir = [indice == 0 for indice in range(len(lista_arquivos))]
+
+    # Com processos, leitura/normalização de cada arquivo não chegam ao relatório: só esta etapa
+    with etapa('leitura_normalizacao') as registro:
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                resultados = list(executor.map(processar_e_normalizar, lista_arquivos, exibir))
+        else:
+            resultados = map(processar_e_normalizar, lista_arquivos, exibir)
+
+        lidos = []
+        for arquivo, (df, log) in zip(lista_arquivos, resultados):
+            print(log, end='')
+            if df is not None:
+                lidos.append((arquivo, df))
+        registro.linhas(saida=sum(len(df) for _, df in lidos))
+
+    return lidos
+
+
+@instrumentar('consolidacao')
+def consolidar_dados(lista_arquivos, max_workers=1):
+    """
+    Processa, normaliza e junta todos os arquivos em um único DataFrame.
+    Com max_workers > 1, cada arquivo é lido/normalizado em um ProcessPoolExecutor;
+    os resultados são juntados na ordem de lista_arquivos.
+    """
+    print("📊 Consolidação" + (f" ({max_workers} processos)" if max_workers > 1 else ""))
+
+    lista_dataframes = [df for _, df in ler_arquivos(lista_arquivos, max_workers)]
 
     if not lista_dataframes:
         print("  ❌ Nenhum arquivo foi processado com sucesso!")
         return None
 
-    df_consolidado = pd.concat(lista_dataframes, ignore_index=True)
+    qtd_arquivos = len(lista_dataframes)
+    df_consolidado = compactar_tipos(pd.concat(lista_dataframes, ignore_index=True))
+    del lista_dataframes
 
-    print(f"  ✅ {len(df_consolidado)} registros, {len(df_consolidado.columns)} colunas, {len(lista_dataframes)} arquivos\n")
+    print(f"  ✅ {len(df_consolidado)} registros, {len(df_consolidado.columns)} colunas, {qtd_arquivos} arquivos\n")
 
     return df_consolidado
 
 
-def normalizar_colunas(df):
+@instrumentar('consolidacao')
+def consolidar_incremental(lista_membros, max_workers=1):
+    """
+    Consolidação incremental (modo ZIP): compara hash/tamanho de cada ZIP com o
+    manifesto e só relê os ZIPs alterados. O resultado normalizado e marcado de
+    cada ZIP fica em processados/cache/ e é reaproveitado nas próximas execuções.
+
+    As duas chaves de duplicata incluem Ano+Trimestre, então as duplicatas de um
+    ZIP só podem colidir com outro ZIP do mesmo período. O índice de duplicatas
+    de cada ZIP também fica no cache; nesses períodos (raros) as linhas são
+    remarcadas consultando a soma dos índices, sem reindexar os ZIPs inalterados.
+    Retorna (DataFrame, manifesto atualizado) ou (None, None).
+    """
+    print("📊 Consolidação incremental" + (f" ({max_workers} processos)" if max_workers > 1 else ""))
+
+    PASTA_CACHE.mkdir(exist_ok=True)
+    manifesto = carregar_manifesto(CAMINHO_MANIFESTO)
+    fontes_anteriores = {} if REPROCESSAR else manifesto.get('fontes', {})
+    fontes = {}
+
+    membros_por_zip = {}
+    for membro in lista_membros:
+        membros_por_zip.setdefault(membro.caminho_zip, []).append(membro)
+
+    pendentes = []
+    for caminho_zip in membros_por_zip:
+        anterior = fontes_anteriores.get(caminho_zip.name)
+        digital = impressao_digital(caminho_zip, anterior)
+        em_cache = all(caminho_cache(caminho_zip.name, extensao).exists()
+                       for extensao in EXTENSOES_CACHE)
+
+        if anterior and anterior.get('sha256') == digital['sha256'] and em_cache:
+            fontes[caminho_zip.name] = anterior
+            print(f"  ♻️  {caminho_zip.name} (inalterado, cache)")
+        else:
+            fontes[caminho_zip.name] = digital
+            pendentes.append(caminho_zip)
+
+    membros_pendentes = [membro for caminho_zip in pendentes
+                         for membro in membros_por_zip[caminho_zip]]
+    lidos = ler_arquivos(membros_pendentes, max_workers)
+
+    for caminho_zip in pendentes:
+        lista_dataframes = [df for membro, df in lidos if membro.caminho_zip == caminho_zip]
+        if not lista_dataframes:
+            del fontes[caminho_zip.name]
+            continue
+
+        df_zip = compactar_tipos(pd.concat(lista_dataframes, ignore_index=True))
+        df_zip = marcar_valores_suspeitos(df_zip, exibir=False)
+        indice_zip = novo_indice_duplicatas()
+        df_zip = detectar_duplicatas_suspeitas(df_zip, exibir=False, indice=indice_zip)
+        with etapa('cache', linhas_entrada=len(df_zip)):
+            df_zip.to_pickle(caminho_cache(caminho_zip.name, '.pkl'))
+            indice_zip.salvar(caminho_cache(caminho_zip.name, '.duplicatas.npz'))
+
+        fontes[caminho_zip.name]['linhas'] = len(df_zip)
+        print(f"  🔄 {caminho_zip.name} (processado, {len(df_zip)} linhas)")
+
+    # Remove caches de ZIPs que não existem mais
+    for nome in set(manifesto.get('fontes', {})) - set(fontes):
+        for extensao in EXTENSOES_CACHE:
+            caminho_cache(nome, extensao).unlink(missing_ok=True)
+
+    with etapa('cache') as registro:
+        lista_dataframes = [pd.read_pickle(caminho_cache(nome, '.pkl')) for nome in fontes]
+        registro.linhas(saida=sum(len(df) for df in lista_dataframes))
+    if not lista_dataframes:
+        print("  ❌ Nenhum arquivo foi processado com sucesso!")
+        return None, None
+
+    df_consolidado = compactar_tipos(pd.concat(lista_dataframes, ignore_index=True))
+    print(f"  ✅ {len(df_consolidado)} registros, {len(pendentes)} de {len(fontes)} ZIPs reprocessados\n")
+
+    # Períodos presentes em mais de um ZIP: remarca duplicatas no conjunto
+    periodos_por_zip = [set(zip(df['Ano'].astype(str), df['Trimestre'].astype(str)))
+                        for df in lista_dataframes]
+    del lista_dataframes
+    vistos, compartilhados = set(), set()
+    for periodos in periodos_por_zip:
+        compartilhados |= vistos & periodos
+        vistos |= periodos
+    if compartilhados:
+        with etapa('duplicatas', linhas_entrada=len(df_consolidado)):
+            periodo = df_consolidado['Ano'].astype(str) + '|' + df_consolidado['Trimestre'].astype(str)
+            mascara = periodo.isin({f"{ano}|{trimestre}" for ano, trimestre in compartilhados})
+
+            indice = novo_indice_duplicatas()
+            for nome in fontes:
+                indice.mesclar(IndiceFlagDuplicado.carregar(
+                    caminho_cache(nome, '.duplicatas.npz'), CHAVE_DUPLICATA_EXATA, CHAVE_DUPLICATA_LOGICA))
+            df_consolidado.loc[mascara, 'FlagDuplicado'] = indice.marcar(
+                indice.hashes(df_consolidado[mascara]))
+
+    df_consolidado = marcar_valores_suspeitos(df_consolidado)
+    print("🔍 Duplicatas")
+    exibir_total_duplicatas(df_consolidado)
+
+    manifesto['fontes'] = fontes
+    return df_consolidado, manifesto
+
+
+def caminho_cache(nome_zip, extensao):
+    """Arquivo de cache de um ZIP (linhas em .pkl, índice de duplicatas em .duplicatas.npz)."""
+    return PASTA_CACHE / f"{Path(nome_zip).stem}{extensao}"
+
+
+def registrar_particoes(manifesto, df):
+    """Guarda no manifesto o hash de cada período (Ano/Trimestre) exportado."""
+    particoes = {}
+    for (ano, trimestre), df_periodo in df.groupby(['Ano', 'Trimestre'], observed=True, sort=True):
+        particoes[f"{ano}-{trimestre}"] = {
+            'linhas': len(df_periodo),
+            'hash': hash_dataframe(df_periodo.astype({'Ano': str, 'Trimestre': str}))
+        }
+    manifesto['particoes'] = particoes
+    return manifesto
+
+
+@instrumentar('normalizacao')
+def normalizar_colunas(df, exibir=True):
     """
     Padroniza colunas: REG_ANS, CNPJ, RazaoSocial, Ano, Trimestre,
     ValorDespesas, FlagValorSuspeito, FlagDuplicado.
+    Monta um DataFrame novo só com as colunas finais (sem copiar o original).
     """
-    print("🔄 Normalização")
+    if exibir:
+        print("🔄 Normalização")
 
-    df_normalizado = df.copy()
+    df_normalizado = pd.DataFrame(index=df.index)
 
-    if 'REG_ANS' not in df_normalizado.columns:
-        print("  ⚠️ Coluna REG_ANS não encontrada!")
+    if 'REG_ANS' in df.columns:
+        df_normalizado['REG_ANS'] = df['REG_ANS']
+    else:
+        if exibir:
+            print("  ⚠️ Coluna REG_ANS não encontrada!")
         df_normalizado['REG_ANS'] = pd.NA
 
-    if 'CNPJ' not in df_normalizado.columns:
+    if 'CNPJ' in df.columns:
+        df_normalizado['CNPJ'] = df['CNPJ']
+    else:
         df_normalizado['CNPJ'] = pd.NA
-        print("  ⚠️ Coluna CNPJ não encontrada nos dados - preenchida com NULL")
+        if exibir:
+            print("  ⚠️ Coluna CNPJ não encontrada nos dados - preenchida com NULL")
 
-    if 'RazaoSocial' not in df_normalizado.columns and 'Razao_Social' not in df_normalizado.columns:
+    if 'RazaoSocial' in df.columns:
+        df_normalizado['RazaoSocial'] = df['RazaoSocial']
+    elif 'Razao_Social' in df.columns:
+        df_normalizado['RazaoSocial'] = df['Razao_Social']
+    else:
         df_normalizado['RazaoSocial'] = pd.NA
-        print("  ⚠️ Coluna RazaoSocial não encontrada nos dados - preenchida com NULL")
-
-    elif 'Razao_Social' in df_normalizado.columns:
-        df_normalizado['RazaoSocial'] = df_normalizado['Razao_Social']
+        if exibir:
+            print("  ⚠️ Coluna RazaoSocial não encontrada nos dados - preenchida com NULL")
 
-    if 'arquivo_origem' in df_normalizado.columns:
-        df_normalizado['Trimestre'] = df_normalizado['arquivo_origem'].str.extract(
-            r'(\dT)', expand=False)
-        df_normalizado['Ano'] = df_normalizado['arquivo_origem'].str.extract(
+    if 'arquivo_origem' in df.columns:
+        df_normalizado['Ano'] = df['arquivo_origem'].str.extract(
             r'(20\d{2})', expand=False)
+        df_normalizado['Trimestre'] = df['arquivo_origem'].str.extract(
+            r'(\dT)', expand=False)
     else:
-        df_normalizado['Trimestre'] = 'N/A'
         df_normalizado['Ano'] = '2025'
+        df_normalizado['Trimestre'] = 'N/A'
 
-    if 'VL_SALDO_FINAL' in df_normalizado.columns:
+    if 'VL_SALDO_FINAL' in df.columns:
         df_normalizado['ValorDespesas'] = pd.to_numeric(
-            df_normalizado['VL_SALDO_FINAL'], errors='coerce')
-        df_normalizado['ValorDespesas'] = df_normalizado['ValorDespesas'].fillna(
-            0.0)
+            df['VL_SALDO_FINAL'], errors='coerce').fillna(0.0)
     else:
-        print("  ⚠️ Coluna VL_SALDO_FINAL não encontrada!")
+        if exibir:
+            print("  ⚠️ Coluna VL_SALDO_FINAL não encontrada!")
         df_normalizado['ValorDespesas'] = 0.0
 
     df_normalizado['FlagValorSuspeito'] = False
     df_normalizado['FlagDuplicado'] = False
 
-    colunas_finais = [
-        'REG_ANS', 'CNPJ', 'RazaoSocial', 'Ano', 'Trimestre',
-        'ValorDespesas', 'FlagValorSuspeito', 'FlagDuplicado'
-    ]
-
-    df_final = df_normalizado[colunas_finais]
-
-    print(f"  ✅ Colunas normalizadas: {', '.join(colunas_finais)}")
-    print()
+    if exibir:
+        print(f"  ✅ Colunas normalizadas: {', '.join(COLUNAS_FINAIS)}")
+        print()
 
-    return df_final
+    return df_normalizado[COLUNAS_FINAIS]
 
 
-def marcar_valores_suspeitos(df):
+@instrumentar('valores_suspeitos')
+def marcar_valores_suspeitos(df, exibir=True):
     """Marca valores <= 0 como suspeitos. Mantém valores originais."""
-    print("🔍 Valores suspeitos")
+    if exibir:
+        print("🔍 Valores suspeitos")
 
-    df_marcado = df.copy()
+    # Cópia rasa: só a coluna de flag é substituída
+    df_marcado = df.copy(deep=False)
 
     df_marcado['FlagValorSuspeito'] = (df_marcado['ValorDespesas'] <= 0) | (
         df_marcado['ValorDespesas'].isna())
 
-    total_suspeitos = df_marcado['FlagValorSuspeito'].sum()
-    total_negativos = (df_marcado['ValorDespesas'] < 0).sum()
-    total_zerados = (df_marcado['ValorDespesas'] == 0).sum()
+    if exibir:
+        total_suspeitos = df_marcado['FlagValorSuspeito'].sum()
+        total_negativos = (df_marcado['ValorDespesas'] < 0).sum()
+        total_zerados = (df_marcado['ValorDespesas'] == 0).sum()
 
-    print(f"  📋 Valores negativos: {total_negativos}")
-    print(f"  📋 Valores zerados: {total_zerados}")
-    print(f"  📋 Total suspeitos: {total_suspeitos}")
-    print()
+        print(f"  📋 Valores negativos: {total_negativos}")
+        print(f"  📋 Valores zerados: {total_zerados}")
+        print(f"  📋 Total suspeitos: {total_suspeitos}")
+        print()
 
     return df_marcado
 
 
-def detectar_duplicatas_suspeitas(df):
+@instrumentar('duplicatas')
+def detectar_duplicatas_suspeitas(df, exibir=True, indice=None):
     """
-    Detecta registros idênticos ou com REG_ANS+período+valor duplicados.
+    Detecta registros idênticos ou com REG_ANS+período+valor duplicados,
+    via índice de hashes de 64 bits por linha (IndiceFlagDuplicado).
+    Se `indice` for passado, as linhas de `df` são acrescentadas a ele.
     Nota: REG_ANS pode repetir no mesmo período (múltiplas contas contábeis).
     """
-    print("🔍 Duplicatas")
+    if exibir:
+        print("🔍 Duplicatas")
+
+    df_resultado = df.copy(deep=False)
 
-    df_resultado = df.copy()
+    if indice is None:
+        indice = novo_indice_duplicatas()
+    hashes = indice.hashes(df_resultado)
+    indice.adicionar(hashes)
 
-    dup_total = df_resultado.duplicated(keep=False)
+    df_resultado['FlagDuplicado'] = indice.marcar(hashes)
 
-    dup_logica = df_resultado.duplicated(
-        subset=['REG_ANS', 'Ano', 'Trimestre', 'ValorDespesas'],
-        keep=False
-    )
+    if exibir:
+        exibir_total_duplicatas(df_resultado)
 
-    df_resultado['FlagDuplicado'] = dup_total | dup_logica
+    return df_resultado
+
+
+def novo_indice_duplicatas():
+    return IndiceFlagDuplicado(CHAVE_DUPLICATA_EXATA, CHAVE_DUPLICATA_LOGICA)
 
-    total_duplicados = df_resultado['FlagDuplicado'].sum()
+
+def exibir_total_duplicatas(df):
+    """Imprime o total de registros marcados como duplicata."""
+    total_duplicados = df['FlagDuplicado'].sum()
 
     if total_duplicados > 0:
         print(f"  ⚠️ {total_duplicados} duplicatas")
@@ -302,36 +613,157 @@ def detectar_duplicatas_suspeitas(df):
         print("  ✅ Sem duplicatas")
 
     print()
-    return df_resultado
 
 
+@instrumentar('consolidacao')
+def consolidar_em_streaming(lista_arquivos, tamanho_chunk):
+    """
+    Modo streaming: lê cada arquivo em chunks, normaliza e marca cada chunk
+    isoladamente e grava o CSV de forma incremental. O pico de memória
+    depende do tamanho do chunk; as duplicatas (que comparam linhas de chunks
+    diferentes) usam um índice de hashes por linha distinta, consultado numa
+    segunda passada sobre o CSV parcial.
+    """
+    print(f"📊 Consolidação (streaming, {tamanho_chunk} linhas/chunk)")
+
+    caminho_csv = PASTA_PROCESSADOS / "consolidado_despesas.csv"
+    caminho_parcial = PASTA_PROCESSADOS / "consolidado_despesas.parcial.csv"
+
+    indice = novo_indice_duplicatas()
+    arquivos_ok = 0
+    total_registros = 0
+    primeiro_chunk = True
+
+    for arquivo in lista_arquivos:
+        print(f"📄 {arquivo.name}")
+        linhas_arquivo = 0
+        try:
+            for chunk in processar_arquivo_em_chunks(arquivo, tamanho_chunk):
+                chunk['arquivo_origem'] = arquivo.name
+                df_chunk = normalizar_colunas(chunk, exibir=primeiro_chunk)
+                df_chunk = marcar_valores_suspeitos(df_chunk, exibir=False)
+
+                indice.adicionar(indice.hashes(df_chunk))
+
+                df_chunk.to_csv(caminho_parcial, index=False, encoding='utf-8', sep=';',
+                                mode='w' if primeiro_chunk else 'a',
+                                header=primeiro_chunk)
+                primeiro_chunk = False
+                linhas_arquivo += len(df_chunk)
+        except Exception as erro:
+            print(f"  ❌ Erro ao processar {arquivo.name}: {erro}")
+            continue
+
+        if linhas_arquivo:
+            arquivos_ok += 1
+            total_registros += linhas_arquivo
+            print(f"  ✅ {linhas_arquivo} linhas")
+
+    if not arquivos_ok:
+        print("  ❌ Nenhum arquivo foi processado com sucesso!")
+        return None
+
+    print(f"  ✅ {total_registros} registros, {arquivos_ok} arquivos\n")
+
+    # Segunda passada (também em chunks) consulta o índice e aplica FlagDuplicado ao CSV final
+    with etapa('exportacao', linhas_entrada=total_registros) as registro:
+        print("💾 Exportação")
+        total_suspeitos = 0
+        total_duplicados = 0
+        total_ok = 0
+        if PARQUET_DISPONIVEL:
+            limpar_dataset(PASTA_PARQUET)
+        with pd.read_csv(caminho_parcial, sep=';', chunksize=tamanho_chunk,
+                         dtype={'Ano': str, 'Trimestre': str}) as leitor:
+            for numero, chunk in enumerate(leitor):
+                flags = indice.marcar(indice.hashes(chunk))
+                chunk['FlagDuplicado'] = flags
+
+                total_suspeitos += int(chunk['FlagValorSuspeito'].sum())
+                total_duplicados += int(flags.sum())
+                total_ok += int(((~chunk['FlagValorSuspeito']) & (~flags)).sum())
+
+                chunk.to_csv(caminho_csv, index=False, sep=';',
+                             encoding='utf-8-sig' if numero == 0 else 'utf-8',
+                             mode='w' if numero == 0 else 'a', header=numero == 0)
+                if PARQUET_DISPONIVEL:
+                    escrever_parquet(chunk, f"parte-{numero:05d}", numero * tamanho_chunk)
+        registro.linhas(saida=total_registros)
+
+    caminho_parcial.unlink()
+    print(f"  ✅ {caminho_csv.name}")
+    if PARQUET_DISPONIVEL:
+        print(f"  ✅ {PASTA_PARQUET.name}/")
+
+    compactar_consolidado(caminho_csv)
+    exibir_resumo(total_registros, total_ok, total_suspeitos, total_duplicados)
+
+    return True
+
+
+def escrever_parquet(df, nome_base, primeira_linha=0):
+    """
+    Grava o consolidado como Parquet particionado por Ano/Trimestre, com tipos
+    do esquema e ordenado por REG_ANS (estatísticas de row group seletivas).
+    `primeira_linha` é a posição de df no CSV, para a leitura restaurar a ordem.
+    """
+    df_tipado = df.astype({
+        'REG_ANS': 'Int32',
+        'CNPJ': 'string',
+        'RazaoSocial': 'string',
+        'Ano': 'Int16',
+        'Trimestre': 'string',
+    })
+    escrever_particionado(df_tipado, PASTA_PARQUET, PARTICOES_PARQUET, nome_base,
+                          ordenar_por='REG_ANS', primeira_linha=primeira_linha)
+
+
+def compactar_consolidado(caminho_csv):
+    """Gera consolidado_despesas.zip a partir do CSV."""
+    caminho_zip = PASTA_PROCESSADOS / "consolidado_despesas.zip"
+
+    with zipfile.ZipFile(caminho_zip, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write(caminho_csv, arcname="consolidado_despesas.csv")
+    print(f"  ✅ {caminho_zip.name}\n")
+
+
+def exibir_resumo(total_registros, total_ok, total_suspeitos, total_duplicados):
+    """Imprime o resumo final da exportação."""
+    print(f"\n📊 RESUMO:")
+    print(f"  📁 {PASTA_PROCESSADOS}")
+    print(f"  📄 Total de registros: {total_registros}")
+    print(f"  ✅ Registros OK: {total_ok}")
+    print(f"  ⚠️  Valores suspeitos: {total_suspeitos}")
+    print(f"  ⚠️  Duplicatas suspeitas: {total_duplicados}")
+    print()
+
+
+@instrumentar('exportacao')
 def exportar_resultado(df):
     """Exporta DataFrame em CSV e ZIP com estatísticas."""
     print("💾 Exportação")
 
     try:
         caminho_csv = PASTA_PROCESSADOS / "consolidado_despesas.csv"
-        caminho_zip = PASTA_PROCESSADOS / "consolidado_despesas.zip"
 
         df.to_csv(caminho_csv, index=False, encoding='utf-8-sig', sep=';')
         print(f"  ✅ {caminho_csv.name}")
 
-        with zipfile.ZipFile(caminho_zip, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.write(caminho_csv, arcname="consolidado_despesas.csv")
-        print(f"  ✅ {caminho_zip.name}\n")
+        if PARQUET_DISPONIVEL:
+            limpar_dataset(PASTA_PARQUET)
+            escrever_parquet(df, "parte-00000")
+            print(f"  ✅ {PASTA_PARQUET.name}/")
+        else:
+            print("  ⚠️ pyarrow não instalado: Parquet não gerado")
+
+        compactar_consolidado(caminho_csv)
 
         total_registros = len(df)
         total_suspeitos = df['FlagValorSuspeito'].sum()
         total_duplicados = df['FlagDuplicado'].sum()
         total_ok = ((~df['FlagValorSuspeito']) & (~df['FlagDuplicado'])).sum()
 
-        print(f"\n📊 RESUMO:")
-        print(f"  📁 {PASTA_PROCESSADOS}")
-        print(f"  📄 Total de registros: {total_registros}")
-        print(f"  ✅ Registros OK: {total_ok}")
-        print(f"  ⚠️  Valores suspeitos: {total_suspeitos}")
-        print(f"  ⚠️  Duplicatas suspeitas: {total_duplicados}")
-        print()
+        exibir_resumo(total_registros, total_ok, total_suspeitos, total_duplicados)
 
         return True
 
@@ -352,25 +784,50 @@ def main():
     try:
         criar_estrutura_pastas()
         baixar_arquivos_zip()
-        extrair_arquivos_zip()
 
-        arquivos_despesas = identificar_arquivos_despesas()
+        if EXTRAIR_ZIPS:
+            extrair_arquivos_zip()
+            arquivos_despesas = identificar_arquivos_despesas()
+        else:
+            arquivos_despesas = identificar_membros_zip()
 
         if not arquivos_despesas:
             print("❌ Nenhum arquivo de despesas encontrado. Encerrando processo.")
             return
 
-        df_consolidado = consolidar_dados(arquivos_despesas)
+        if TAMANHO_CHUNK > 0 or EXTRAIR_ZIPS:
+            # Estes modos não registram os períodos: um manifesto antigo deixaria
+            # o Teste 2 reaproveitando caches desatualizados
+            CAMINHO_MANIFESTO.unlink(missing_ok=True)
 
-        if df_consolidado is None:
-            print("❌ Falha na consolidação dos dados. Encerrando processo.")
-            return
+        if TAMANHO_CHUNK > 0:
+            sucesso = consolidar_em_streaming(arquivos_despesas, TAMANHO_CHUNK)
+
+            if sucesso is None:
+                print("❌ Falha na consolidação dos dados. Encerrando processo.")
+                return
+        elif not EXTRAIR_ZIPS:
+            df_final, manifesto = consolidar_incremental(arquivos_despesas, MAX_WORKERS)
+
+            if df_final is None:
+                print("❌ Falha na consolidação dos dados. Encerrando processo.")
+                return
+
+            sucesso = exportar_resultado(df_final)
+
+            if sucesso:
+                salvar_manifesto(CAMINHO_MANIFESTO, registrar_particoes(manifesto, df_final))
+        else:
+            df_normalizado = consolidar_dados(arquivos_despesas, MAX_WORKERS)
+
+            if df_normalizado is None:
+                print("❌ Falha na consolidação dos dados. Encerrando processo.")
+                return
 
-        df_normalizado = normalizar_colunas(df_consolidado)
-        df_com_flags_valor = marcar_valores_suspeitos(df_normalizado)
-        df_final = detectar_duplicatas_suspeitas(df_com_flags_valor)
+            df_com_flags_valor = marcar_valores_suspeitos(df_normalizado)
+            df_final = detectar_duplicatas_suspeitas(df_com_flags_valor)
 
-        sucesso = exportar_resultado(df_final)
+            sucesso = exportar_resultado(df_final)
 
         if sucesso:
             print("="*60)
@@ -392,4 +849,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    configuracao = {'trimestres': TRIMESTRES, 'extrair_zips': EXTRAIR_ZIPS, 'tamanho_chunk': TAMANHO_CHUNK,
+                    'max_workers': MAX_WORKERS, 'reprocessar': REPROCESSAR}
+    with silenciar():
+        with Execucao('teste1', CAMINHO_RELATORIO, configuracao):
+            main()
+        print(f"📈 {CAMINHO_RELATORIO}")
@@ -0,0 +1,76 @@
+# TESTE 2 - AGREGADOS PARCIAIS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Soma, média e desvio padrão por grupo a partir de estados parciais combináveis (chunks, períodos, processos)
+
+# Bibliotecas
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Funções
+
+
+def calcular_parciais(df, chaves, coluna, dropna=True):
+    """
+    Estado parcial por grupo de um bloco de linhas: n (contagem de valores não
+    nulos), soma, média e M2 (soma dos quadrados dos desvios à média do bloco).
+    Com dropna=False, chaves nulas formam um grupo próprio.
+    """
+    grupos = df.groupby(chaves, observed=True, dropna=dropna)[coluna]
+
+    parciais = pd.DataFrame({'n': grupos.count(), 'soma': grupos.sum()})
+    parciais['media'] = parciais['soma'] / parciais['n']
+    parciais['m2'] = (grupos.var(ddof=0) * parciais['n']).fillna(0.0)
+
+    return parciais
+
+
+def _somas_exatas(valores, codigos):
+    """math.fsum dos valores de cada grupo (códigos 0..k-1), percorrendo fatias contíguas."""
+    if not len(codigos):
+        return np.empty(0)
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.flatnonzero(np.diff(codigos[ordem])) + 1
+    return np.array([math.fsum(bloco) for bloco in np.split(valores[ordem], limites)])
+
+
+def combinar_parciais(lista_parciais, dropna=True):
+    """
+    Combina estados parciais do mesmo grupo (fórmula de Chan et al. para k partes):
+    n = Σnᵢ, soma = Σsomaᵢ, M2 = Σ[M2ᵢ + nᵢ·(médiaᵢ − média)²].
+    As somas parciais são combinadas com math.fsum (exata): o total não depende
+    da ordem nem de como as linhas foram divididas em blocos.
+    O resultado é de novo um estado parcial, então pode ser combinado outra vez.
+    """
+    todos = pd.concat(lista_parciais)
+    if todos.index.nlevels > 1:
+        # Categorias diferentes entre blocos: nível comum em texto
+        todos.index = pd.MultiIndex.from_arrays(
+            [todos.index.get_level_values(nivel).astype(object) for nivel in range(todos.index.nlevels)],
+            names=todos.index.names)
+    niveis = list(range(todos.index.nlevels))
+
+    grupos = todos.groupby(level=niveis, dropna=dropna)
+    combinados = pd.DataFrame({'n': grupos['n'].sum()})
+    combinados['soma'] = _somas_exatas(todos['soma'].to_numpy(), grupos.ngroup().to_numpy())
+    combinados['media'] = combinados['soma'] / combinados['n']
+
+    media_grupo = combinados['media'].reindex(todos.index).to_numpy()
+    desvio = np.where(todos['n'].to_numpy() > 0, todos['media'].to_numpy() - media_grupo, 0.0)
+    contribuicao = todos['m2'].to_numpy() + todos['n'].to_numpy() * desvio ** 2
+    combinados['m2'] = pd.Series(contribuicao, index=todos.index).groupby(level=niveis, dropna=dropna).sum()
+
+    return combinados
+
+
+def finalizar_parciais(parciais):
+    """Total, média, desvio padrão amostral (ddof=1; NaN com n < 2) e contagem por grupo."""
+    n = parciais['n']
+    return pd.DataFrame({
+        'TotalDespesas': parciais['soma'],
+        'MediaDespesas': parciais['media'],
+        'DesvioPadrao': np.sqrt(parciais['m2'] / (n - 1)).where(n > 1),
+        'QtdRegistros': n,
+    }).reset_index()
@@ -0,0 +1,115 @@
+# TESTE 2 - CACHE DE VALIDAÇÃO
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Validar cada CNPJ/Razão Social distinto uma única vez, com cache LRU persistido entre execuções
+
+# Bibliotecas
+
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Configurações
+
+# Mudar quando a regra de validação mudar: invalida os caches gravados
+VERSAO_VALIDACAO = 1
+
+# Funções
+
+
+class CacheLRU:
+    """Cache chave → resultado com limite de entradas (descarta a menos usada) e contadores de acerto."""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self):
+        return len(self.itens)
+
+    def buscar(self, chave):
+        """Resultado em cache ou None; conta acerto/falha."""
+        if chave in self.itens:
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return self.itens[chave]
+        self.falhas += 1
+        return None
+
+    def guardar(self, chave, valor):
+        self.itens[chave] = valor
+        self.itens.move_to_end(chave)
+        while len(self.itens) > self.capacidade:
+            self.itens.popitem(last=False)
+
+    def taxa_acerto(self):
+        consultas = self.acertos + self.falhas
+        return self.acertos / consultas if consultas else 0.0
+
+
+def carregar_caches(caminho, nomes, capacidade):
+    """Lê os caches persistidos (um por nome); vazios se o arquivo não existe ou é de outra versão."""
+    caches = {nome: CacheLRU(capacidade) for nome in nomes}
+
+    if not os.path.exists(caminho):
+        return caches
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+    except (OSError, ValueError):
+        return caches
+    if dados.get('versao') != VERSAO_VALIDACAO:
+        return caches
+
+    for nome, cache in caches.items():
+        # Gravado da menos para a mais usada: a ordem LRU é preservada
+        for chave, valor in dados.get(nome, []):
+            cache.guardar(chave, valor)
+    return caches
+
+
+def salvar_caches(caminho, caches):
+    """Grava os caches (ordem LRU) de forma atômica."""
+    dados = {'versao': VERSAO_VALIDACAO}
+    for nome, cache in caches.items():
+        dados[nome] = list(cache.itens.items())
+
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def validar_distintos(serie, validador, cache):
+    """
+    Aplica `validador` (vetorizado, Series → array bool) só aos valores distintos
+    de `serie` que não estão no cache e espalha o resultado para todas as linhas.
+    O custo passa a depender do número de operadoras, não do número de linhas.
+    """
+    codigos, distintos = pd.factorize(serie)
+    distintos = pd.Series(distintos, dtype='string')
+    chaves = distintos.tolist()
+
+    resultado = np.zeros(len(chaves), dtype=bool)
+    pendentes = []
+    for posicao, chave in enumerate(chaves):
+        valor = cache.buscar(chave)
+        if valor is None:
+            pendentes.append(posicao)
+        else:
+            resultado[posicao] = valor
+
+    if pendentes:
+        validos = validador(distintos.iloc[pendentes])
+        resultado[pendentes] = validos
+        for posicao, valido in zip(pendentes, validos):
+            cache.guardar(chaves[posicao], bool(valido))
+
+    # Código -1 = NA, inválido para os dois validadores
+    if not len(resultado):
+        return np.zeros(len(codigos), dtype=bool)
+    return np.where(codigos >= 0, resultado[codigos], False)
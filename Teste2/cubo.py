@@ -0,0 +1,170 @@
+# TESTE 2 - CUBO DE DESPESAS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Cubo pré-agregado (operadora × UF × Modalidade × Ano × Trimestre) e consultas de roll-up, top-N e crescimento sem reler as despesas
+
+# Bibliotecas
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from comum.esquemas import ler_csv
+from agregacao import calcular_parciais, combinar_parciais, finalizar_parciais
+
+# Configurações
+
+CAMINHO_CUBO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processados', 'cubo_despesas.csv')
+
+# Granularidade do cubo: cada célula guarda n, soma, média e M2 das despesas
+DIMENSOES_CUBO = ['RegistroANS', 'RazaoSocial', 'UF', 'Modalidade', 'Ano', 'Trimestre']
+MEDIDAS_CUBO = ['n', 'soma', 'media', 'm2']
+
+OPERADORA = ['RegistroANS', 'RazaoSocial']
+
+# Funções
+
+
+def linhas_analise(df):
+    """Despesas usadas nas análises do Teste 3: com cadastro, sem valor suspeito e sem duplicata."""
+    return df[~df['FlagSemCadastro'] & ~df['FlagValorSuspeito'] & ~df['FlagDuplicado']]
+
+
+def construir_cubo(df):
+    """Cubo a partir das despesas validadas (UF/Modalidade nulas formam células próprias)."""
+    parciais = calcular_parciais(linhas_analise(df), DIMENSOES_CUBO, 'ValorDespesas', dropna=False)
+    return CuboDespesas(parciais.reset_index())
+
+
+def numero_periodo(ano, trimestre):
+    """Período ordenável (ex.: 2025, '3T' → 20253), como `ano * 10 + trimestre` do Teste 3."""
+    return ano.astype('int64') * 10 + trimestre.astype(str).str[:1].astype('int64')
+
+
+def rotulo_periodo(periodo):
+    """Rótulo no formato do manifesto (ex.: 20253 → '2025-3T')."""
+    return (periodo // 10).astype(str) + '-' + (periodo % 10).astype(str) + 'T'
+
+
+class CuboDespesas:
+    """
+    Consultas sobre o cubo: as células são combinadas pela mesma fórmula de
+    agregacao.py, então qualquer roll-up tem total, média e desvio padrão
+    exatos sem voltar às linhas de despesa.
+    """
+
+    def __init__(self, celulas):
+        self.celulas = celulas.reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.celulas)
+
+    @classmethod
+    def carregar(cls, caminho=CAMINHO_CUBO):
+        return cls(ler_csv(caminho, 'cubo'))
+
+    def salvar(self, caminho=CAMINHO_CUBO):
+        self.celulas[DIMENSOES_CUBO + MEDIDAS_CUBO].to_csv(caminho, index=False)
+
+    def filtrar(self, **filtros):
+        """Sub-cubo, ex.: filtrar(UF='SP', Trimestre=['1T', '2T'])."""
+        mascara = pd.Series(True, index=self.celulas.index)
+        for coluna, valor in filtros.items():
+            valores = valor if isinstance(valor, (list, tuple, set)) else [valor]
+            mascara &= self.celulas[coluna].isin(valores)
+        return CuboDespesas(self.celulas[mascara])
+
+    def agregar(self, dimensoes=()):
+        """
+        Roll-up para `dimensoes`: TotalDespesas, MediaDespesas, DesvioPadrao,
+        QtdRegistros e, se a operadora não for uma das dimensões, QtdOperadoras.
+        Sem dimensões, uma linha com o total geral.
+        """
+        dimensoes = list(dimensoes)
+        celulas = self.celulas
+        if not dimensoes:
+            celulas = celulas.assign(Total='Total')
+            chaves = ['Total']
+        else:
+            chaves = dimensoes
+
+        # Mesmo tipo e ordem de chaves nos dois agrupamentos abaixo
+        celulas = celulas.astype({coluna: object for coluna in chaves
+                                  if isinstance(celulas[coluna].dtype, pd.CategoricalDtype)})
+
+        parciais = celulas.set_index(chaves)[MEDIDAS_CUBO]
+        agregado = finalizar_parciais(combinar_parciais([parciais], dropna=False))
+
+        if 'RegistroANS' not in chaves:
+            operadoras = celulas.groupby(chaves, observed=True, dropna=False)['RegistroANS'].nunique()
+            agregado['QtdOperadoras'] = operadoras.to_numpy()
+
+        return agregado.drop(columns='Total') if not dimensoes else agregado
+
+    def top(self, n, dimensoes=OPERADORA, medida='TotalDespesas'):
+        """As `n` maiores combinações de `dimensoes` pela `medida`."""
+        return self.agregar(dimensoes).nlargest(n, medida).reset_index(drop=True)
+
+    def serie(self, dimensoes=OPERADORA):
+        """Roll-up por `dimensoes` + período, ordenado, com a coluna Periodo (ex.: 20253)."""
+        dimensoes = list(dimensoes)
+        agregado = self.agregar(dimensoes + ['Ano', 'Trimestre'])
+        agregado['Periodo'] = numero_periodo(agregado['Ano'], agregado['Trimestre'])
+        return agregado.sort_values(dimensoes + ['Periodo'], kind='stable').reset_index(drop=True)
+
+    def crescimento(self, dimensoes=OPERADORA, inicial=None, final=None):
+        """
+        Crescimento percentual do TotalDespesas entre dois períodos ('2025-1T').
+        Sem períodos, usa o primeiro e o último período de cada grupo (como
+        3_query_crescimento.sql). Só grupos com valor inicial > 0 e período
+        final posterior ao inicial; ordenado do maior para o menor crescimento.
+        """
+        dimensoes = list(dimensoes)
+        serie = self.serie(dimensoes)[dimensoes + ['Periodo', 'TotalDespesas']]
+
+        def extremo(rotulo, manter):
+            if rotulo is None:
+                return serie.drop_duplicates(dimensoes, keep=manter)
+            ano, trimestre = rotulo.split('-', 1)
+            return serie[serie['Periodo'] == int(ano) * 10 + int(trimestre[:1])]
+
+        resultado = extremo(inicial, 'first').merge(
+            extremo(final, 'last'), on=dimensoes, suffixes=('Inicial', 'Final'))
+        resultado = resultado.rename(columns={'TotalDespesasInicial': 'ValorInicial',
+                                              'TotalDespesasFinal': 'ValorFinal'})
+        resultado = resultado[(resultado['ValorInicial'] > 0) &
+                              (resultado['PeriodoFinal'] > resultado['PeriodoInicial'])].copy()
+
+        resultado['CrescimentoPercentual'] = (
+            (resultado['ValorFinal'] - resultado['ValorInicial']) / resultado['ValorInicial'] * 100)
+        for coluna in ['PeriodoInicial', 'PeriodoFinal']:
+            resultado[coluna] = rotulo_periodo(resultado[coluna])
+
+        return resultado.sort_values('CrescimentoPercentual', ascending=False).reset_index(drop=True)
+
+    def variacao_trimestral(self, dimensoes=OPERADORA):
+        """Variação percentual do TotalDespesas de cada período em relação ao período anterior do grupo."""
+        dimensoes = list(dimensoes)
+        serie = self.serie(dimensoes)
+        anterior = serie.groupby(dimensoes, observed=True, dropna=False)['TotalDespesas'].shift()
+        serie['VariacaoPercentual'] = (serie['TotalDespesas'] - anterior) / anterior * 100
+        serie['Periodo'] = rotulo_periodo(serie['Periodo'])
+        return serie
+
+    def acima_da_media(self, dimensoes=OPERADORA + ['UF'], grupo=None):
+        """
+        Grupos com TotalDespesas acima da média de todos os grupos ou, com
+        `grupo` (ex.: 'UF'), da média dentro do seu grupo (5_query_acima_media.sql).
+        """
+        agregado = self.agregar(dimensoes)
+        if grupo is None:
+            media = agregado['TotalDespesas'].mean()
+        else:
+            media = agregado.groupby(grupo, observed=True, dropna=False)['TotalDespesas'].transform('mean')
+        agregado['MediaReferencia'] = media
+        agregado['PercentualDaMedia'] = agregado['TotalDespesas'] / media * 100
+
+        acima = agregado[agregado['TotalDespesas'] > media]
+        return acima.sort_values('TotalDespesas', ascending=False).reset_index(drop=True)
@@ -4,21 +4,60 @@
 
 # Bibliotecas
 
+import numpy as np
 import pandas as pd
 import requests
 import os
+import sys
+from dataclasses import dataclass
 from bs4 import BeautifulSoup
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from comum.esquemas import ler_csv
+from comum.manifesto import carregar_manifesto, salvar_manifesto, hash_arquivo
+from comum.estatisticas import salvar_estatisticas
+from comum.instrumentacao import Execucao, instrumentar, silenciar
+from comum.parquet import dataset_disponivel, ler_parquet
+from cache_validacao import carregar_caches, salvar_caches, validar_distintos
+from agregacao import calcular_parciais, combinar_parciais, finalizar_parciais
+from cubo import construir_cubo
+
 # Configurações dos arquivos
 
 CAMINHO_CONSOLIDADO = '../Teste1/processados/consolidado_despesas.csv'
+CAMINHO_CONSOLIDADO_PARQUET = '../Teste1/processados/consolidado_despesas_parquet'
 CAMINHO_DOWNLOAD = 'downloads/'
 CAMINHO_ENRIQUECIDO = 'processados/dados_enriquecidos.csv'
 CAMINHO_VALIDADO = 'processados/dados_validados.csv'
 CAMINHO_PROCESSADOS = 'processados/'
+CAMINHO_CUBO = 'processados/cubo_despesas.csv'
+
+# Relatório de cada execução por etapa (ANS_PERFIL=cprofile,tracemalloc; ANS_SILENCIOSO=1)
+CAMINHO_RELATORIO = 'processados/relatorio_execucao.json'
+
+# Execução incremental: só os períodos (Ano/Trimestre) alterados no Teste 1 são reprocessados
+CAMINHO_MANIFESTO_TESTE1 = '../Teste1/processados/manifesto.json'
+CAMINHO_MANIFESTO = 'processados/manifesto.json'
+CAMINHO_CACHE = 'processados/cache/'
+REPROCESSAR = os.environ.get('ANS_REPROCESSAR', '0') == '1'
+
+# Resultados de validação por CNPJ/Razão Social distintos, reaproveitados entre execuções
+CAMINHO_CACHE_VALIDACAO = 'processados/cache_validacao.json'
+CAPACIDADE_CACHE_VALIDACAO = 100_000
 
 URL_CADASTRO_ANS = 'https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/'
 
+# Colunas do cadastro anexadas a cada despesa no enriquecimento
+COLUNAS_CADASTRO = ['CNPJ', 'RazaoSocial', 'Modalidade', 'UF']
+LIMITE_MAPA_DIRETO = 10_000_000
+
+CHAVES_AGREGACAO = ['RazaoSocial', 'UF']
+
+# Pesos dos dígitos verificadores do CNPJ
+PESOS_DIGITO1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int32)
+PESOS_DIGITO2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int32)
+
 
 # Funções para enriquecimento com cadastro ANS
 
@@ -32,6 +71,7 @@ def criar_pastas():
     print("✅ Pastas criadas\n")
 
 
+@instrumentar('download_cadastro')
 def baixar_cadastro_ans():
     """Baixa o arquivo de cadastro da ANS."""
     print("📥 Download cadastro ANS")
@@ -69,52 +109,130 @@ def baixar_cadastro_ans():
     return arquivo_escolhido
 
 
-def carregar_dados(nome_arquivo_cadastro):
-    """Carrega consolidado do Teste 1 e cadastro ANS."""
+def chave_particao(df):
+    """Rótulo do período de cada linha, no formato do manifesto (ex.: 2025-1T)."""
+    return df['Ano'].astype(str) + '-' + df['Trimestre'].astype(str)
+
+
+@instrumentar('carregamento')
+def carregar_dados(nome_arquivo_cadastro, particoes=None):
+    """
+    Carrega consolidado do Teste 1 e cadastro ANS.
+    Com `particoes` (ex.: ['2025-1T']), carrega só esses períodos do consolidado.
+    """
     print("📂 Carregamento")
 
-    consolidado = pd.read_csv(CAMINHO_CONSOLIDADO, sep=';')
-    print(f"  ✅ Consolidado: {len(consolidado):,} registros")
+    if dataset_disponivel(CAMINHO_CONSOLIDADO_PARQUET):
+        filtros = None
+        if particoes is not None:
+            filtros = [[('Ano', '==', int(ano)), ('Trimestre', '==', trimestre)]
+                       for ano, trimestre in (particao.split('-', 1) for particao in particoes)]
+        consolidado = ler_parquet(CAMINHO_CONSOLIDADO_PARQUET, 'consolidado', filtros=filtros)
+        print(f"  ✅ Consolidado (Parquet): {len(consolidado):,} registros")
+    else:
+        consolidado = ler_csv(CAMINHO_CONSOLIDADO, 'consolidado')
+        if particoes is not None:
+            consolidado = consolidado[chave_particao(consolidado).isin(particoes)].reset_index(drop=True)
+        print(f"  ✅ Consolidado: {len(consolidado):,} registros")
 
     caminho_cadastro = os.path.join(CAMINHO_DOWNLOAD, nome_arquivo_cadastro)
-    cadastro = pd.read_csv(caminho_cadastro, encoding='utf-8', sep=';')
+    cadastro = ler_csv(caminho_cadastro, 'cadop')
     print(f"  ✅ Cadastro: {len(cadastro):,} operadoras\n")
 
     return consolidado, cadastro
 
 
-def enriquecer_dados(consolidado, cadastro):
-    """Faz o JOIN e enriquece os dados."""
-    print("🔗 Enriquecimento")
-
-    cadastro.rename(columns={
+@dataclass
+class DimensaoOperadoras:
+    """
+    Cadastro indexado por REG_ANS. Como REG_ANS é um inteiro de 6 dígitos, o
+    índice é um mapa direto REG_ANS → linha (-1 = sem cadastro); chaves maiores
+    que LIMITE_MAPA_DIRETO usam busca binária nas chaves ordenadas.
+    """
+    chaves: np.ndarray
+    mapa: np.ndarray
+    colunas: dict
+    duplicatas_removidas: int
+
+    def posicoes(self, reg_ans):
+        """Linha da dimensão para cada REG_ANS (-1 quando não há cadastro)."""
+        valores = reg_ans.to_numpy(dtype='int64', na_value=-1)
+        if not len(self.chaves):
+            return np.full(len(valores), -1)
+
+        no_mapa = (valores >= 0) & (valores < len(self.mapa))
+        posicoes = np.full(len(valores), -1)
+        posicoes[no_mapa] = self.mapa[valores[no_mapa]]
+
+        fora_do_mapa = np.flatnonzero(~no_mapa & (valores > self.chaves[0]))
+        if len(fora_do_mapa):
+            candidatos = np.searchsorted(self.chaves, valores[fora_do_mapa])
+            candidatos[candidatos == len(self.chaves)] = 0
+            encontrados = self.chaves[candidatos] == valores[fora_do_mapa]
+            posicoes[fora_do_mapa[encontrados]] = candidatos[encontrados]
+
+        return posicoes
+
+
+def indexar_cadastro(cadastro):
+    """
+    Monta a dimensão de operadoras uma única vez: remove REG_ANS duplicados
+    (keep='first') e ordena por REG_ANS para busca binária.
+    """
+    dimensao = cadastro.rename(columns={
         'REGISTRO_OPERADORA': 'REG_ANS',
         'Razao_Social': 'RazaoSocial'
-    }, inplace=True)
-
-    tamanho_original = len(cadastro)
-    cadastro_limpo = cadastro.drop_duplicates(subset='REG_ANS', keep='first')
-    duplicatas_removidas = tamanho_original - len(cadastro_limpo)
-    print(f"  ⚠️  {duplicatas_removidas} duplicatas removidas")
-
-    resultado = consolidado.merge(
-        cadastro_limpo[['REG_ANS', 'CNPJ', 'RazaoSocial', 'Modalidade', 'UF']],
-        on='REG_ANS',
-        how='left',
-        suffixes=('', '_Cadastro')
+    })
+
+    tamanho_original = len(dimensao)
+    dimensao = dimensao.drop_duplicates(subset='REG_ANS', keep='first')
+    duplicatas_removidas = tamanho_original - len(dimensao)
+    dimensao = dimensao[dimensao['REG_ANS'].notna()]
+
+    chaves = dimensao['REG_ANS'].to_numpy(dtype='int64')
+    ordem = np.argsort(chaves, kind='stable')
+    chaves = chaves[ordem]
+
+    diretas = chaves[(chaves >= 0) & (chaves < LIMITE_MAPA_DIRETO)]
+    mapa = np.full(diretas.max() + 1 if len(diretas) else 0, -1, dtype=np.int32)
+    mapa[diretas] = np.flatnonzero((chaves >= 0) & (chaves < LIMITE_MAPA_DIRETO))
+
+    return DimensaoOperadoras(
+        chaves=chaves,
+        mapa=mapa,
+        colunas={coluna: dimensao[coluna].array.take(ordem) for coluna in COLUNAS_CADASTRO},
+        duplicatas_removidas=duplicatas_removidas
     )
 
-    resultado['CNPJ'] = resultado['CNPJ_Cadastro']
-    resultado['RazaoSocial'] = resultado['RazaoSocial_Cadastro']
+
+def anexar_cadastro(fatos, dimensao):
+    """
+    Anexa CNPJ, RazaoSocial, Modalidade e UF do cadastro a um bloco de despesas
+    (o consolidado inteiro ou um chunk) com gathers por posição, sem merge.
+    Mesmo resultado de um LEFT JOIN por REG_ANS.
+    """
+    posicoes = dimensao.posicoes(fatos['REG_ANS'])
+
+    resultado = fatos.rename(columns={'REG_ANS': 'RegistroANS'})
+    for coluna, valores in dimensao.colunas.items():
+        resultado[coluna] = valores.take(posicoes, allow_fill=True)
 
     resultado['FlagSemCadastro'] = resultado['CNPJ'].isna()
-    sem_cadastro = resultado['FlagSemCadastro'].sum()
-    print(f"  ⚠️  {sem_cadastro:,} sem cadastro")
+    return resultado
+
+
+@instrumentar('enriquecimento')
+def enriquecer_dados(consolidado, cadastro):
+    """Enriquece as despesas com o cadastro ANS (LEFT JOIN por REG_ANS via índice)."""
+    print("🔗 Enriquecimento")
 
-    resultado.drop(['CNPJ_Cadastro', 'RazaoSocial_Cadastro'],
-                   axis=1, inplace=True)
+    dimensao = indexar_cadastro(cadastro)
+    print(f"  ⚠️  {dimensao.duplicatas_removidas} duplicatas removidas")
 
-    resultado.rename(columns={'REG_ANS': 'RegistroANS'}, inplace=True)
+    resultado = anexar_cadastro(consolidado, dimensao)
+
+    sem_cadastro = resultado['FlagSemCadastro'].sum()
+    print(f"  ⚠️  {sem_cadastro:,} sem cadastro")
 
     print("✅ Enriquecimento concluído\n")
     return resultado
@@ -179,25 +297,169 @@ def validar_razao_social(razao):
     return True
 
 
-def aplicar_validacao(df):
-    """Valida CNPJ e Razão Social."""
-    print("🔍 Validação")
+def digito_verificador(digitos, pesos):
+    """Dígito verificador de cada linha de uma matriz de dígitos (módulo 11)."""
+    resto = (digitos @ pesos) % 11
+    return np.where(resto < 2, 0, 11 - resto)
+
+
+def validar_cnpjs(cnpjs):
+    """
+    Versão vetorizada de validar_cnpj para uma Series inteira (mesmo resultado).
+    Remove a pontuação com operações de string vetorizadas, converte os CNPJs
+    com 14 dígitos em uma matriz uint8 e calcula os dois dígitos verificadores
+    com produto matricial pelos pesos.
+    """
+    limpo = cnpjs.astype('string')
+    for pontuacao in ['.', '/', '-']:
+        limpo = limpo.str.replace(pontuacao, '', regex=False)
+    limpo = limpo.str.strip()
+
+    validos = np.zeros(len(limpo), dtype=bool)
+
+    com_14_digitos = limpo.str.fullmatch(r'[0-9]{14}').fillna(False).to_numpy(dtype=bool)
+    if com_14_digitos.any():
+        bytes_cnpj = limpo[com_14_digitos].to_numpy(dtype='S14')
+        digitos = bytes_cnpj.view(np.uint8).reshape(-1, 14) - ord('0')
+
+        repetidos = (digitos == digitos[:, :1]).all(axis=1)
+        digito1 = digito_verificador(digitos[:, :12], PESOS_DIGITO1)
+        digito2 = digito_verificador(digitos[:, :13], PESOS_DIGITO2)
+
+        validos[com_14_digitos] = (~repetidos & (digitos[:, 12] == digito1) &
+                                   (digitos[:, 13] == digito2))
 
-    df['FlagCNPJInvalido'] = ~df['CNPJ'].apply(validar_cnpj)
-    cnpj_invalidos = df['FlagCNPJInvalido'].sum()
-    print(f"  ⚠️  CNPJs inválidos: {cnpj_invalidos:,}")
+    # Dígitos Unicode fora de 0-9 (isdigit() aceita): raros, validados um a um
+    restantes = limpo[~com_14_digitos]
+    outros = np.zeros(len(limpo), dtype=bool)
+    outros[~com_14_digitos] = ((restantes.str.len() == 14) &
+                               restantes.str.isdigit()).fillna(False).to_numpy(dtype=bool)
+    for posicao in np.flatnonzero(outros):
+        validos[posicao] = validar_cnpj_unicode(limpo.iat[posicao])
 
-    df['FlagRazaoSocialInvalida'] = ~df['RazaoSocial'].apply(
-        validar_razao_social)
-    razoes_invalidas = df['FlagRazaoSocialInvalida'].sum()
-    print(f"  ⚠️  Razões inválidas: {razoes_invalidas:,}")
+    return validos
 
+
+def validar_cnpj_unicode(cnpj):
+    """validar_cnpj para dígitos não ASCII; dígitos sem valor decimal (ex.: '²') são inválidos."""
+    try:
+        return validar_cnpj(cnpj)
+    except ValueError:
+        return False
+
+
+def validar_razoes_sociais(razoes):
+    """Versão vetorizada de validar_razao_social para uma Series inteira."""
+    texto = razoes.astype('string').str.strip()
+    invalidas = texto.isna() | (texto == '') | (texto.str.lower() == 'nan')
+    return ~invalidas.fillna(True).to_numpy(dtype=bool)
+
+
+@instrumentar('validacao')
+def aplicar_validacao(df, exibir=True):
+    """
+    Valida CNPJ e Razão Social uma vez por valor distinto; os resultados
+    ficam em um cache LRU persistido em processados/cache_validacao.json.
+    """
+    caches = carregar_caches(CAMINHO_CACHE_VALIDACAO, ['cnpj', 'razao_social'],
+                             CAPACIDADE_CACHE_VALIDACAO)
+
+    df['FlagCNPJInvalido'] = ~validar_distintos(df['CNPJ'], validar_cnpjs, caches['cnpj'])
+
+    df['FlagRazaoSocialInvalida'] = ~validar_distintos(
+        df['RazaoSocial'], validar_razoes_sociais, caches['razao_social'])
+
+    salvar_caches(CAMINHO_CACHE_VALIDACAO, caches)
+
+    print("🗂️  Cache de validação")
+    for nome, cache in caches.items():
+        print(f"  📋 {nome}: {cache.acertos + cache.falhas:,} distintos, "
+              f"{cache.acertos:,} do cache ({cache.taxa_acerto():.1%})")
+    print()
+
+    if exibir:
+        exibir_validacao(df)
+
+    return df
+
+
+def exibir_validacao(df):
+    """Imprime o resumo das flags de validação."""
+    print("🔍 Validação")
+
+    print(f"  ⚠️  CNPJs inválidos: {df['FlagCNPJInvalido'].sum():,}")
+    print(f"  ⚠️  Razões inválidas: {df['FlagRazaoSocialInvalida'].sum():,}")
     print(f"  ⚠️  Valores suspeitos: {df['FlagValorSuspeito'].sum():,}")
     print(f"  ⚠️  Duplicatas: {df['FlagDuplicado'].sum():,}\n")
 
-    return df
 
+@instrumentar('validacao_incremental')
+def validar_incremental(nome_arquivo_cadastro, particoes):
+    """
+    Enriquece e valida só os períodos cujo hash mudou no manifesto do Teste 1
+    (ou todos, se o cadastro mudou). Cada período validado fica em
+    processados/cache/<Ano>-<Trimestre>.pkl, com seus agregados parciais em
+    <Ano>-<Trimestre>.agregado.pkl, e é reaproveitado nas próximas execuções.
+    Retorna (DataFrame validado completo, agregados parciais, manifesto atualizado).
+    """
+    print("♻️  Execução incremental")
+
+    os.makedirs(CAMINHO_CACHE, exist_ok=True)
+    caminho_cadastro = os.path.join(CAMINHO_DOWNLOAD, nome_arquivo_cadastro)
+    hash_cadastro = hash_arquivo(caminho_cadastro)
+
+    manifesto = {} if REPROCESSAR else carregar_manifesto(CAMINHO_MANIFESTO)
+    anteriores = manifesto.get('particoes', {}) if manifesto.get('cadastro') == hash_cadastro else {}
+
+    def caminho_cache(particao, extensao='.pkl'):
+        return os.path.join(CAMINHO_CACHE, f"{particao}{extensao}")
+
+    pendentes = []
+    for particao, info in sorted(particoes.items()):
+        em_cache = all(os.path.exists(caminho_cache(particao, extensao))
+                       for extensao in ['.pkl', '.agregado.pkl'])
+        if anteriores.get(particao) == info['hash'] and em_cache:
+            print(f"  ♻️  {particao} (inalterado, cache)")
+        else:
+            print(f"  🔄 {particao} (reprocessar)")
+            pendentes.append(particao)
+    print()
 
+    if pendentes:
+        consolidado, cadastro = carregar_dados(nome_arquivo_cadastro, pendentes)
+        enriquecido = enriquecer_dados(consolidado, cadastro)
+        validado = aplicar_validacao(enriquecido, exibir=False)
+
+        chave = chave_particao(validado)
+        for particao in pendentes:
+            validado_particao = validado[chave == particao].reset_index(drop=True)
+            validado_particao.to_pickle(caminho_cache(particao))
+            parciais_agregacao(validado_particao).to_pickle(caminho_cache(particao, '.agregado.pkl'))
+        del consolidado, enriquecido, validado
+
+    # Remove caches de períodos que saíram do consolidado
+    for arquivo in os.listdir(CAMINHO_CACHE):
+        if arquivo.endswith('.pkl') and arquivo.split('.')[0] not in particoes:
+            os.remove(os.path.join(CAMINHO_CACHE, arquivo))
+
+    validado = pd.concat([pd.read_pickle(caminho_cache(particao)) for particao in sorted(particoes)],
+                         ignore_index=True)
+    # Categorias diferentes entre períodos viram object no concat
+    validado = validado.astype({coluna: 'category' for coluna in ['Trimestre', 'Modalidade', 'UF']
+                                if coluna in validado.columns})
+    exibir_validacao(validado)
+
+    parciais = [pd.read_pickle(caminho_cache(particao, '.agregado.pkl'))
+                for particao in sorted(particoes)]
+
+    manifesto = {
+        'cadastro': hash_cadastro,
+        'particoes': {particao: info['hash'] for particao, info in particoes.items()}
+    }
+    return validado, parciais, manifesto
+
+
+@instrumentar('exportacao')
 def salvar_validado(df):
     """Salva dados validados."""
     print("💾 Salvamento")
@@ -217,19 +479,26 @@ def salvar_validado(df):
         f"  ✅ Registros 100% válidos: {len(validos):,} ({len(validos)/len(df)*100:.2f}%)\n")
 
 
-def agregar_dados(df):
-    """Agrupa dados por RazaoSocial e UF com múltiplas métricas."""
+def parciais_agregacao(df):
+    """Agregados parciais (n, soma, média, M2) por RazaoSocial + UF de um bloco de linhas validadas."""
+    return calcular_parciais(df[~df['FlagSemCadastro']], CHAVES_AGREGACAO, 'ValorDespesas')
+
+
+@instrumentar('agregacao')
+def agregar_dados(df, parciais=None):
+    """
+    Agrupa dados por RazaoSocial e UF com múltiplas métricas.
+    A agregação combina estados parciais (agregacao.py): `parciais` pode vir de
+    chunks, períodos ou processos diferentes; sem ela, o DataFrame inteiro é um bloco.
+    """
     print("📊 Agregação")
 
-    df_limpo = df[~df['FlagSemCadastro']].copy()
-    print(f"  ✅ {len(df_limpo):,} registros")
+    print(f"  ✅ {(~df['FlagSemCadastro']).sum():,} registros")
 
-    agregado = df_limpo.groupby(['RazaoSocial', 'UF']).agg({
-        'ValorDespesas': ['sum', 'mean', 'std', 'count']
-    }).reset_index()
+    if parciais is None:
+        parciais = [parciais_agregacao(df)]
 
-    agregado.columns = ['RazaoSocial', 'UF', 'TotalDespesas',
-                        'MediaDespesas', 'DesvioPadrao', 'QtdRegistros']
+    agregado = finalizar_parciais(combinar_parciais(parciais))
 
     agregado = agregado.sort_values('TotalDespesas', ascending=False)
 
@@ -238,12 +507,16 @@ def agregar_dados(df):
     return agregado
 
 
+@instrumentar('exportacao')
 def salvar_agregado(df):
     """Salva o resultado agregado."""
     caminho_saida = 'processados/despesas_agregadas.csv'
     df.to_csv(caminho_saida, index=False)
     print(f"\nArquivo agregado salvo: {caminho_saida}")
 
+    # Resumo pronto para o /api/estatisticas do Teste 4
+    print(f"Estatísticas salvas: {salvar_estatisticas(caminho_saida, df)}")
+
     print("RESUMO DA AGREGAÇÃO")
     print(f"Total de grupos (Operadora + UF): {len(df):,}")
     print(f"Total de despesas agregadas: R$ {df['TotalDespesas'].sum():,.2f}")
@@ -253,6 +526,19 @@ def salvar_agregado(df):
         10).to_string(index=False))
 
 
+@instrumentar('cubo')
+def salvar_cubo(df):
+    """Monta e salva o cubo operadora × UF × Modalidade × Ano × Trimestre (cubo.py)."""
+    print("\n🧊 Cubo")
+
+    cubo = construir_cubo(df)
+    cubo.salvar(CAMINHO_CUBO)
+
+    print(f"  ✅ {len(cubo):,} células ({cubo.celulas['n'].sum():,} registros)")
+    print(f"  ✅ {CAMINHO_CUBO}\n")
+    return cubo
+
+
 def salvar_enriquecido(dados_enriquecidos):
     """Salva os dados enriquecidos."""
     print("Salvando resultado enriquecido...")
@@ -267,6 +553,7 @@ def salvar_enriquecido(dados_enriquecidos):
     print(f"Sem cadastro: {(dados_enriquecidos['FlagSemCadastro']).sum():,}")
 
 
+@instrumentar('compactacao')
 def compactar_resultados():
     """Compacta todos os arquivos processados em um ZIP."""
     import zipfile
@@ -298,15 +585,32 @@ def main():
 
     criar_pastas()
     nome_arquivo = baixar_cadastro_ans()
-    consolidado, cadastro = carregar_dados(nome_arquivo)
-    enriquecido = enriquecer_dados(consolidado, cadastro)
-    validado = aplicar_validacao(enriquecido)
+
+    # Sem manifesto do Teste 1 (modos streaming/debug): processamento completo
+    particoes = carregar_manifesto(CAMINHO_MANIFESTO_TESTE1).get('particoes')
+    manifesto = None
+    parciais = None
+    if particoes:
+        validado, parciais, manifesto = validar_incremental(nome_arquivo, particoes)
+    else:
+        consolidado, cadastro = carregar_dados(nome_arquivo)
+        enriquecido = enriquecer_dados(consolidado, cadastro)
+        validado = aplicar_validacao(enriquecido)
+
     salvar_validado(validado)
-    agregado = agregar_dados(validado)
+    agregado = agregar_dados(validado, parciais)
     salvar_agregado(agregado)
+    salvar_cubo(validado)
     compactar_resultados()
 
+    if manifesto is not None:
+        salvar_manifesto(CAMINHO_MANIFESTO, manifesto)
+
     print("✅ PROCESSO CONCLUÍDO")
 
 if __name__ == "__main__":
-    main()
+    configuracao = {'reprocessar': REPROCESSAR, 'capacidade_cache_validacao': CAPACIDADE_CACHE_VALIDACAO}
+    with silenciar():
+        with Execucao('teste2', CAMINHO_RELATORIO, configuracao):
+            main()
+        print(f"📈 {CAMINHO_RELATORIO}")
@@ -0,0 +1,385 @@
+# TESTE 3 - CARGA EM LOTE NO SQLITE
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Carregar operadoras, despesas e agregados dos CSVs do pipeline em um banco SQLite local, com validação, tabela de rejeitados (stg_erros) e índices criados após a carga
+
+# Bibliotecas
+
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from comum.esquemas import ler_csv
+
+# Configurações
+
+PASTA_TESTE3 = os.path.dirname(os.path.abspath(__file__))
+
+# Primeiro caminho existente de cada lista: a pasta data/ do Teste 3 ou as saídas dos Testes 1 e 2
+FONTES = {
+    'operadoras': [os.path.join(PASTA_TESTE3, 'data', 'operadoras.csv'),
+                   os.path.join(PASTA_TESTE3, '..', 'Teste2', 'downloads', 'Relatorio_cadop.csv')],
+    'despesas': [os.path.join(PASTA_TESTE3, 'data', 'consolidado_despesas.csv'),
+                 os.path.join(PASTA_TESTE3, '..', 'Teste1', 'processados', 'consolidado_despesas.csv')],
+    'agregados': [os.path.join(PASTA_TESTE3, 'data', 'despesas_agregadas.csv'),
+                  os.path.join(PASTA_TESTE3, '..', 'Teste2', 'processados', 'despesas_agregadas.csv')],
+}
+
+CAMINHO_BANCO = os.environ.get('ANS_BANCO', os.path.join(PASTA_TESTE3, 'data', 'ans.sqlite'))
+
+# Linhas lidas e inseridas por lote (executemany em uma única transação)
+LINHAS_POR_LOTE = int(os.environ.get('ANS_LOTE_CARGA', '100000'))
+
+# Mesmas tabelas de 1_create_tables.sql; DECIMAL(15,2) vira NUMERIC com valores arredondados na carga
+TABELAS = [
+    """CREATE TABLE operadoras (
+        registro_ans INTEGER PRIMARY KEY,
+        cnpj TEXT NOT NULL,
+        razao_social TEXT NOT NULL,
+        modalidade TEXT,
+        uf TEXT
+    )""",
+    """CREATE TABLE despesas (
+        id INTEGER PRIMARY KEY,
+        registro_ans INTEGER NOT NULL,
+        ano INTEGER NOT NULL,
+        trimestre INTEGER NOT NULL CHECK (trimestre BETWEEN 1 AND 4),
+        valor_despesas NUMERIC NOT NULL,
+        flag_valor_suspeito INTEGER NOT NULL DEFAULT 0,
+        flag_duplicado INTEGER NOT NULL DEFAULT 0,
+        flag_cnpj_invalido INTEGER NOT NULL DEFAULT 0,
+        flag_razao_social_invalida INTEGER NOT NULL DEFAULT 0,
+        flag_sem_cadastro INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE agregados (
+        id INTEGER PRIMARY KEY,
+        registro_ans INTEGER NOT NULL REFERENCES operadoras(registro_ans),
+        uf TEXT NOT NULL,
+        total_despesas NUMERIC NOT NULL,
+        media_despesas NUMERIC NOT NULL,
+        desvio_padrao NUMERIC,
+        qtd_registros INTEGER NOT NULL
+    )""",
+    """CREATE TABLE stg_erros (
+        arquivo_origem TEXT NOT NULL,
+        linha_original TEXT NOT NULL,
+        linha_hash TEXT NOT NULL,
+        motivo_rejeicao TEXT NOT NULL,
+        data_rejeicao TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+# Criados depois da carga: cada INSERT não precisa atualizar os índices.
+# idx_despesas_operadora foi omitido: o índice (registro_ans, ano, trimestre) já atende buscas por operadora
+INDICES = [
+    "CREATE UNIQUE INDEX uq_operadoras_cnpj ON operadoras(cnpj)",
+    "CREATE INDEX idx_operadoras_uf ON operadoras(uf)",
+    "CREATE INDEX idx_operadoras_razao_social ON operadoras(razao_social)",
+    "CREATE INDEX idx_despesas_periodo ON despesas(ano, trimestre)",
+    "CREATE INDEX idx_despesas_operadora_periodo ON despesas(registro_ans, ano, trimestre)",
+    "CREATE UNIQUE INDEX uk_agregados_operadora_uf ON agregados(registro_ans, uf)",
+    "CREATE INDEX idx_agregados_uf ON agregados(uf)",
+    "CREATE INDEX idx_agregados_total_desc ON agregados(total_despesas DESC)",
+    "CREATE UNIQUE INDEX uq_erros ON stg_erros(arquivo_origem, linha_hash, motivo_rejeicao)",
+]
+
+# Funções
+
+
+def localizar_fonte(nome):
+    """Primeiro arquivo existente para a tabela `nome`."""
+    for caminho in FONTES[nome]:
+        if os.path.exists(caminho):
+            return os.path.normpath(caminho)
+    raise FileNotFoundError(f"Nenhum arquivo encontrado para '{nome}': {FONTES[nome]}")
+
+
+def abrir_banco(caminho):
+    """
+    Cria o banco do zero em um arquivo temporário. Sem journal e sem fsync
+    durante a carga: se ela falhar, o banco anterior continua intacto.
+    """
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    conexao = sqlite3.connect(caminho)
+    conexao.execute("PRAGMA journal_mode = OFF")
+    conexao.execute("PRAGMA synchronous = OFF")
+    conexao.execute("PRAGMA cache_size = -200000")
+    for ddl in TABELAS:
+        conexao.execute(ddl)
+    return conexao
+
+
+def texto(serie):
+    """TRIM + NULLIF(..., '') do SQL de importação."""
+    limpo = serie.str.strip()
+    return limpo.mask(limpo == '')
+
+
+def converter_valor(serie):
+    """
+    Texto monetário → float: remove o que não for dígito, vírgula, ponto ou
+    sinal e trata '1.234,56' como 1234.56 (mesma regra do 2_import_data.sql).
+    """
+    limpo = serie.str.replace(r'[^0-9,.-]', '', regex=True)
+    com_virgula = limpo.str.contains(',', regex=False, na=False)
+    limpo = limpo.where(~com_virgula,
+                        limpo.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(limpo, errors='coerce')
+
+
+def inteiro(serie, padrao=r'\d+'):
+    """Texto que casa com `padrao` → Int64; o resto vira nulo."""
+    valido = serie.str.fullmatch(padrao, na=False)
+    return pd.to_numeric(serie.where(valido), errors='coerce').astype('Int64')
+
+
+def registrar_erros(erros, arquivo_origem, brutos, motivos, colunas_linha):
+    """
+    Acumula as linhas rejeitadas no formato de stg_erros. `motivos` é uma
+    Series de texto com o motivo de cada linha (nulo = linha aceita).
+    """
+    rejeitadas = motivos.notna()
+    if not rejeitadas.any():
+        return
+
+    linhas = brutos.loc[rejeitadas, colunas_linha].fillna('').astype(str).agg('|'.join, axis=1)
+    erros.append(pd.DataFrame({
+        'arquivo_origem': arquivo_origem,
+        'linha_original': linhas,
+        'linha_hash': [hashlib.md5(linha.encode('utf-8')).hexdigest() for linha in linhas],
+        'motivo_rejeicao': motivos[rejeitadas],
+    }))
+
+
+def primeiro_motivo(condicoes):
+    """Motivo da primeira condição verdadeira de cada linha ([(mascara, motivo)], como um CASE WHEN)."""
+    motivos = pd.Series(None, index=condicoes[0][0].index, dtype=object)
+    for mascara, motivo in reversed(condicoes):
+        motivos = motivos.mask(mascara, motivo)
+    return motivos
+
+
+def inserir_lote(conexao, tabela, df):
+    """INSERT em lote com executemany, convertendo nulos do pandas para None."""
+    colunas = list(df.columns)
+    valores = [df[coluna].to_numpy(dtype=object, na_value=None).tolist() for coluna in colunas]
+    marcadores = ', '.join('?' * len(colunas))
+    conexao.executemany(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})",
+                        zip(*valores))
+    return len(df)
+
+
+def carregar_operadoras(conexao, caminho, erros):
+    """Carrega o cadastro; rejeita REG_ANS/CNPJ/Razão Social/UF inválidos e REG_ANS ou CNPJ repetidos."""
+    brutos = ler_csv(caminho, 'cadop', dtype=str, keep_default_na=False, engine='c')
+
+    registro = texto(brutos['REGISTRO_OPERADORA'])
+    df = pd.DataFrame({
+        'registro_ans': inteiro(registro),
+        'cnpj': texto(brutos['CNPJ']),
+        'razao_social': texto(brutos['Razao_Social']),
+        'modalidade': texto(brutos['Modalidade']),
+        'uf': texto(brutos['UF']).str.upper(),
+    })
+
+    motivos = primeiro_motivo([
+        (df['registro_ans'].isna(), 'reg_ans inválido ou vazio'),
+        (df['cnpj'].isna(), 'CNPJ vazio'),
+        (df['razao_social'].isna(), 'Razão social vazia'),
+        (df['uf'].str.len().ne(2).fillna(True), 'UF inválida (deve ter 2 caracteres)'),
+    ])
+    # Chave primária e CNPJ único: entre as linhas aceitas, a primeira ocorrência é mantida
+    for coluna, motivo in [('registro_ans', 'reg_ans duplicado'), ('cnpj', 'CNPJ duplicado')]:
+        aceitas = motivos.isna()
+        motivos = motivos.mask(aceitas & df[coluna].where(aceitas).duplicated(), motivo)
+
+    registrar_erros(erros, 'operadoras', brutos, motivos,
+                    ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Modalidade', 'UF'])
+
+    validas = df[motivos.isna()]
+    inserir_lote(conexao, 'operadoras', validas)
+    return len(brutos), validas
+
+
+def carregar_despesas(conexao, caminho, erros, registros_cadastrados):
+    """
+    Carrega o consolidado em lotes de LINHAS_POR_LOTE linhas. Conversões e
+    regras do 2_import_data.sql; valores com mais de 2 casas são arredondados.
+    flag_sem_cadastro é calculada na carga, sem UPDATE posterior.
+    """
+    lidas = 0
+    inseridas = 0
+    lotes = ler_csv(caminho, 'consolidado', dtype=str, keep_default_na=False,
+                    chunksize=LINHAS_POR_LOTE)
+
+    for brutos in lotes:
+        lidas += len(brutos)
+
+        ano = inteiro(texto(brutos['Ano']), r'\d{4}')
+        trimestre = inteiro(texto(brutos['Trimestre']).str.replace('T', '', regex=False), r'[1-4]')
+        valor = converter_valor(texto(brutos['ValorDespesas']))
+
+        df = pd.DataFrame({
+            'registro_ans': inteiro(texto(brutos['REG_ANS'])),
+            'ano': ano,
+            'trimestre': trimestre,
+            'valor_despesas': valor.round(2),
+            'flag_valor_suspeito': (valor <= 0).fillna(False).astype(int),
+            'flag_duplicado': brutos['FlagDuplicado'].str.strip().str.lower().eq('true').astype(int),
+        })
+
+        motivos = primeiro_motivo([
+            (df['registro_ans'].isna(), 'reg_ans inválido'),
+            (ano.isna(), 'ano inválido (formato não é AAAA)'),
+            (~ano.between(2000, 2100).fillna(False), 'ano fora do intervalo aceitável'),
+            (trimestre.isna(), 'trimestre inválido (deve ser 1-4)'),
+            (valor.isna(), 'valor não numérico'),
+        ])
+        registrar_erros(erros, 'despesas', brutos, motivos,
+                        ['REG_ANS', 'Ano', 'Trimestre', 'ValorDespesas'])
+
+        validas = df[motivos.isna()].copy()
+        validas['flag_sem_cadastro'] = (~validas['registro_ans'].isin(registros_cadastrados)).astype(int)
+        inseridas += inserir_lote(conexao, 'despesas', validas)
+
+    return lidas, inseridas
+
+
+def carregar_agregados(conexao, caminho, erros, operadoras):
+    """
+    Carrega os agregados do Teste 2, buscando o registro_ans pela razão social
+    + UF no cadastro carregado. Para (registro_ans, UF) repetidos vale a última linha.
+    """
+    brutos = ler_csv(caminho, 'agregadas', dtype=str, keep_default_na=False, engine='c')
+
+    razao = texto(brutos['RazaoSocial']).str.upper()
+    uf = texto(brutos['UF']).str.upper()
+    chaves = pd.MultiIndex.from_arrays([operadoras['razao_social'].str.upper(), operadoras['uf']])
+    registro = pd.Series(operadoras['registro_ans'].to_numpy(), index=chaves)
+    registro = registro[~registro.index.duplicated()]
+
+    total = converter_valor(texto(brutos['TotalDespesas']))
+    media = converter_valor(texto(brutos['MediaDespesas']))
+    df = pd.DataFrame({
+        'registro_ans': registro.reindex(pd.MultiIndex.from_arrays([razao, uf])).to_numpy(),
+        'uf': uf,
+        'total_despesas': total.round(2),
+        'media_despesas': media.round(2),
+        'desvio_padrao': converter_valor(texto(brutos['DesvioPadrao'])).round(2),
+        'qtd_registros': inteiro(texto(brutos['QtdRegistros'])),
+    }).astype({'registro_ans': 'Int64'})
+
+    motivos = primeiro_motivo([
+        (df['registro_ans'].isna(), 'Operadora não encontrada no cadastro'),
+        (uf.str.len().ne(2).fillna(True), 'UF inválida'),
+        (total.isna(), 'total_despesas não numérico'),
+        (media.isna(), 'media_despesas não numérico'),
+        (df['qtd_registros'].isna(), 'qtd_registros inválido'),
+    ])
+    registrar_erros(erros, 'agregados', brutos, motivos, ['RazaoSocial', 'UF', 'TotalDespesas'])
+
+    validas = df[motivos.isna()].drop_duplicates(['registro_ans', 'uf'], keep='last')
+    inserir_lote(conexao, 'agregados', validas)
+    return len(brutos), len(validas)
+
+
+def exibir_carga(tabela, lidas, inseridas, segundos):
+    print(f"  ✅ {tabela}: {inseridas:,}/{lidas:,} linhas em {segundos:.2f}s "
+          f"({inseridas / max(segundos, 1e-9):,.0f} linhas/s)")
+
+
+def carregar_banco(caminho_banco=CAMINHO_BANCO):
+    """Carrega as três tabelas e os rejeitados, cria os índices e publica o banco."""
+    print("🗄️  Carga SQLite")
+
+    temporario = caminho_banco + '.tmp'
+    conexao = abrir_banco(temporario)
+    erros = []
+    inicio = time.perf_counter()
+
+    try:
+        with conexao:
+            etapa = time.perf_counter()
+            lidas, operadoras = carregar_operadoras(conexao, localizar_fonte('operadoras'), erros)
+            exibir_carga('operadoras', lidas, len(operadoras), time.perf_counter() - etapa)
+
+            etapa = time.perf_counter()
+            lidas, inseridas = carregar_despesas(conexao, localizar_fonte('despesas'), erros,
+                                                 operadoras['registro_ans'].to_numpy())
+            exibir_carga('despesas', lidas, inseridas, time.perf_counter() - etapa)
+
+            etapa = time.perf_counter()
+            lidas, inseridas = carregar_agregados(conexao, localizar_fonte('agregados'), erros, operadoras)
+            exibir_carga('agregados', lidas, inseridas, time.perf_counter() - etapa)
+
+            if erros:
+                rejeitados = pd.concat(erros, ignore_index=True).drop_duplicates(
+                    ['arquivo_origem', 'linha_hash', 'motivo_rejeicao'])
+                inserir_lote(conexao, 'stg_erros', rejeitados)
+
+        etapa = time.perf_counter()
+        with conexao:
+            for ddl in INDICES:
+                conexao.execute(ddl)
+            conexao.execute("ANALYZE")
+        print(f"  ✅ {len(INDICES)} índices + ANALYZE em {time.perf_counter() - etapa:.2f}s")
+    except BaseException:
+        # Carga incompleta: remove o temporário e mantém o banco anterior
+        conexao.close()
+        os.remove(temporario)
+        raise
+    finally:
+        conexao.close()
+
+    os.replace(temporario, caminho_banco)
+    print(f"  ⏱️  Total: {time.perf_counter() - inicio:.2f}s")
+    print(f"  💾 {caminho_banco}\n")
+
+
+def exibir_relatorio(caminho_banco=CAMINHO_BANCO):
+    """Resumo de rejeitados e flags, como a etapa 5 do 2_import_data.sql."""
+    conexao = sqlite3.connect(caminho_banco)
+    try:
+        print("🔍 Rejeitados (stg_erros)")
+        rejeitados = conexao.execute(
+            "SELECT arquivo_origem, motivo_rejeicao, COUNT(*) FROM stg_erros "
+            "GROUP BY arquivo_origem, motivo_rejeicao ORDER BY arquivo_origem, COUNT(*) DESC").fetchall()
+        for arquivo, motivo, quantidade in rejeitados:
+            print(f"  ⚠️  {arquivo}: {motivo} ({quantidade:,})")
+        if not rejeitados:
+            print("  ✅ Nenhum")
+
+        print("\n🚩 Flags em despesas")
+        total, suspeitos, duplicados, sem_cadastro = conexao.execute(
+            "SELECT COUNT(*), SUM(flag_valor_suspeito), SUM(flag_duplicado), SUM(flag_sem_cadastro) "
+            "FROM despesas").fetchone()
+        for nome, quantidade in [('Valores suspeitos (≤0)', suspeitos), ('Duplicados', duplicados),
+                                 ('Sem cadastro', sem_cadastro)]:
+            quantidade = quantidade or 0
+            print(f"  ⚠️  {nome}: {quantidade:,} ({quantidade / max(total, 1):.2%})")
+        print()
+    finally:
+        conexao.close()
+
+
+# Execução do script
+
+def main():
+    print("=" * 60)
+    print("TESTE 3: CARGA DE DADOS (SQLITE)")
+    print("=" * 60 + "\n")
+
+    carregar_banco()
+    exibir_relatorio()
+
+    print("✅ CARGA CONCLUÍDA")
+
+
+if __name__ == "__main__":
+    main()
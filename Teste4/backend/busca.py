@@ -0,0 +1,96 @@
+# TESTE 4 - ÍNDICE DE BUSCA DE OPERADORAS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Busca literal por trecho de Razão Social, Nome Fantasia ou CNPJ, sem acento e sem diferenciar maiúsculas, por índice de trigramas
+
+# Bibliotecas
+
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+# Configurações
+
+# Separa os campos no texto indexado; nunca aparece em uma busca normalizada
+SEPARADOR = '\x00'
+
+# Entrada formada só por dígitos e pontuação de CNPJ ("00.366.982/0001-30")
+PADRAO_CNPJ = re.compile(r'[\d./\-\s]+')
+
+# Funções
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('SAÚDE' → 'saude'), para indexação e busca."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere)).casefold()
+
+
+def trigramas(texto):
+    return {texto[inicio:inicio + 3] for inicio in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """
+    Índice de trigramas sobre os campos normalizados de cada linha. Uma busca
+    com 3+ caracteres intersecta as listas de linhas dos seus trigramas
+    (começando pela menor) e confirma só as candidatas com `in`; buscas de
+    1–2 caracteres unem as listas dos trigramas que as contêm. O custo depende
+    do número de resultados, não do tamanho do cadastro.
+    """
+
+    def __init__(self, colunas):
+        valores = zip(*[[None if valor is None else str(valor) for valor in coluna]
+                        for coluna in colunas])
+        # Separadores nas pontas: todo trecho de 1–2 caracteres está em algum trigrama
+        self.textos = [SEPARADOR + SEPARADOR.join(normalizar(valor) for valor in linha if valor) + SEPARADOR
+                       for linha in valores]
+
+        listas = defaultdict(list)
+        for posicao, texto in enumerate(self.textos):
+            for trigrama in trigramas(texto):
+                listas[trigrama].append(posicao)
+        self.listas = {trigrama: np.array(posicoes, dtype=np.int32) for trigrama, posicoes in listas.items()}
+        self._curtas = {}
+
+    def __len__(self):
+        return len(self.textos)
+
+    def _lista_curta(self, trecho):
+        """Linhas que contêm um trecho de 1–2 caracteres (calculado uma vez por trecho)."""
+        if trecho not in self._curtas:
+            listas = [posicoes for trigrama, posicoes in self.listas.items() if trecho in trigrama]
+            self._curtas[trecho] = (np.unique(np.concatenate(listas)) if listas
+                                    else np.empty(0, dtype=np.int32))
+        return self._curtas[trecho]
+
+    def buscar(self, texto):
+        """Posições (em ordem crescente) das linhas que contêm `texto`, tratado como literal."""
+        texto = texto.strip()
+        if PADRAO_CNPJ.fullmatch(texto):
+            texto = re.sub(r'\D', '', texto)
+        consulta = normalizar(texto)
+
+        if not consulta:
+            return np.arange(len(self.textos))
+        if len(consulta) < 3:
+            return self._lista_curta(consulta)
+
+        listas = []
+        for trigrama in trigramas(consulta):
+            posicoes = self.listas.get(trigrama)
+            if posicoes is None:
+                return np.empty(0, dtype=np.int32)
+            listas.append(posicoes)
+
+        listas.sort(key=len)
+        candidatas = listas[0]
+        for posicoes in listas[1:]:
+            candidatas = np.intersect1d(candidatas, posicoes, assume_unique=True)
+            if not len(candidatas):
+                return candidatas
+
+        # Trigramas presentes não garantem o trecho contíguo: confirma cada candidata
+        return np.array([posicao for posicao in candidatas.tolist() if consulta in self.textos[posicao]],
+                        dtype=np.int32)
@@ -0,0 +1,60 @@
+# TESTE 4 - CONFIGURAÇÃO DA API
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Caminhos dos dados e opções da API a partir de valores padrão, de um arquivo JSON (ANS_CONFIG) e de variáveis de ambiente
+
+# Bibliotecas
+
+import json
+import os
+
+# Configurações
+
+PASTA_DADOS_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Teste3', 'data')
+
+# Opção → variável de ambiente (o ambiente tem prioridade sobre o arquivo JSON)
+VARIAVEIS = {
+    'pasta_dados': 'ANS_DADOS',
+    'operadoras_csv': 'ANS_OPERADORAS_CSV',
+    'despesas_csv': 'ANS_DESPESAS_CSV',
+    'despesas_parquet': 'ANS_DESPESAS_PARQUET',
+    'agregadas_csv': 'ANS_AGREGADAS_CSV',
+    'historico_mmap': 'ANS_HISTORICO_MMAP',
+    'recarregar_automatico': 'ANS_RECARREGAR',
+}
+
+# Nome de cada arquivo dentro de pasta_dados, quando o caminho não é informado
+ARQUIVOS = {
+    'operadoras_csv': 'operadoras.csv',
+    'despesas_csv': 'consolidado_despesas.csv',
+    'despesas_parquet': 'consolidado_despesas_parquet',
+    'agregadas_csv': 'despesas_agregadas.csv',
+}
+
+# Funções
+
+
+def carregar_configuracao(arquivo=None):
+    """
+    Configuração da API. Prioridade: variáveis de ambiente, depois o JSON em
+    `arquivo` (ou ANS_CONFIG) e por fim os padrões (arquivos em Teste3/data,
+    recarregamento automático ligado). Opção desconhecida no JSON é erro.
+    """
+    arquivo = arquivo or os.environ.get('ANS_CONFIG')
+    config = {}
+    if arquivo:
+        with open(arquivo, 'r', encoding='utf-8') as entrada:
+            config = json.load(entrada)
+        desconhecidas = set(config) - set(VARIAVEIS)
+        if desconhecidas:
+            raise ValueError(f"Opções desconhecidas em {arquivo}: {', '.join(sorted(desconhecidas))}")
+
+    for opcao, variavel in VARIAVEIS.items():
+        if os.environ.get(variavel):
+            config[opcao] = os.environ[variavel]
+
+    pasta = config.setdefault('pasta_dados', PASTA_DADOS_PADRAO)
+    for opcao, nome in ARQUIVOS.items():
+        config.setdefault(opcao, os.path.join(pasta, nome))
+    config.setdefault('historico_mmap', None)
+    config['recarregar_automatico'] = str(config.get('recarregar_automatico', '1')).lower() not in ('0', 'false')
+    return config
@@ -0,0 +1,403 @@
+# TESTE 4 - CAMADA DE DADOS DA API
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Carregar os arquivos uma única vez, indexar operadoras por CNPJ e REG_ANS e recarregar quando o arquivo muda
+
+# Bibliotecas
+
+import base64
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from comum.esquemas import ler_csv
+from comum.estatisticas import calcular_estatisticas, ler_estatisticas
+from comum.manifesto import hash_arquivo
+from comum.parquet import ler_parquet
+from busca import IndiceBusca
+
+# Configurações
+
+COLUNAS_BUSCA = ['Razao_Social', 'Nome_Fantasia', 'CNPJ']
+
+# Chave da paginação por cursor: (REG_ANS, CNPJ), estável entre recarregamentos do cadastro
+REG_ANS_AUSENTE = 2 ** 63 - 1
+
+COLUNAS_HISTORICO = ['REG_ANS', 'Ano', 'Trimestre', 'ValorDespesas']
+ARRAYS_HISTORICO = ['chaves', 'inicios', 'ano', 'trimestre', 'valor']
+
+# Registros convertidos por vez ao gerar o histórico em partes
+LINHAS_POR_LOTE = 1000
+
+# Funções
+
+
+def assinatura_arquivo(caminho):
+    """(mtime_ns, tamanho) do arquivo; para um dataset Parquet (pasta), dos seus arquivos."""
+    caminho = Path(caminho)
+    if not caminho.is_dir():
+        info = caminho.stat()
+        return info.st_mtime_ns, info.st_size
+
+    infos = [arquivo.stat() for arquivo in caminho.rglob('*.parquet')]
+    return (len(infos), max((info.st_mtime_ns for info in infos), default=0),
+            sum(info.st_size for info in infos))
+
+
+class ArquivoMonitorado:
+    """
+    Valor derivado de um arquivo (ex.: índice de operadoras), carregado uma vez
+    e recarregado quando o mtime ou o tamanho do arquivo mudam. A troca é
+    atômica: cada requisição lê uma única referência (assinatura, valor), então
+    nunca vê metade de um recarregamento. Se a releitura falhar (arquivo sendo
+    gravado ou removido), continua servindo a versão anterior e tenta de novo
+    na próxima chamada. Com `monitorar=False`, depois da primeira carga o
+    arquivo só é verificado em `atualizar()` (recarga controlada no servidor).
+    Conta acertos (versão carregada servida), cargas, falhas e tempo de carga
+    para o /metrics.
+    """
+
+    def __init__(self, caminho, carregar, monitorar=True):
+        self.caminho = caminho
+        self.monitorar = monitorar
+        self._carregar = carregar
+        self._trava = threading.Lock()
+        self._estado = None
+        # Contadores do /metrics com trava própria: os acertos não passam por _trava
+        self._trava_metricas = threading.Lock()
+        self.zerar_metricas()
+
+    def _assinatura(self):
+        return assinatura_arquivo(self.caminho)
+
+    @property
+    def versao(self):
+        """Assinatura do arquivo da versão carregada (None antes da primeira carga)."""
+        estado = self._estado
+        return None if estado is None else estado[0]
+
+    def zerar_metricas(self):
+        with self._trava_metricas:
+            self._metricas = {'acertos': 0, 'cargas': 0, 'falhas': 0,
+                              'duracao_cargas': 0.0, 'duracao_ultima_carga': 0.0}
+
+    def metricas(self):
+        """Cópia dos contadores (acertos, cargas, falhas, tempo total e da última carga)."""
+        with self._trava_metricas:
+            return dict(self._metricas)
+
+    def _contar(self, contador, valor=1):
+        with self._trava_metricas:
+            self._metricas[contador] += valor
+
+    def _registrar_carga(self, duracao, sucesso):
+        with self._trava_metricas:
+            self._metricas['duracao_cargas'] += duracao
+            if sucesso:
+                self._metricas['cargas'] += 1
+                self._metricas['duracao_ultima_carga'] = duracao
+            else:
+                self._metricas['falhas'] += 1
+
+    def obter(self):
+        """Valor atual, recarregando se o arquivo mudou desde a última leitura."""
+        estado = self._estado
+        if estado is not None and not self.monitorar:
+            self._contar('acertos')
+            return estado[1]
+        return self.atualizar()
+
+    def atualizar(self):
+        """Verifica o arquivo e recarrega se ele mudou; retorna o valor atual."""
+        estado = self._estado
+        try:
+            assinatura = self._assinatura()
+        except OSError:
+            # Arquivo removido ou sendo substituído: serve a última versão carregada
+            if estado is None:
+                raise
+            self._contar('acertos')
+            return estado[1]
+        if estado is not None and estado[0] == assinatura:
+            self._contar('acertos')
+            return estado[1]
+
+        with self._trava:
+            # Outra thread pode ter recarregado enquanto esta esperava
+            estado = self._estado
+            if estado is not None and estado[0] == assinatura:
+                self._contar('acertos')
+                return estado[1]
+            inicio = time.perf_counter()
+            try:
+                valor = self._carregar(self.caminho)
+            except Exception:
+                self._registrar_carga(time.perf_counter() - inicio, sucesso=False)
+                if estado is None:
+                    raise
+                print(f"⚠️  Falha ao recarregar {self.caminho}; mantendo a versão anterior")
+                return estado[1]
+            self._registrar_carga(time.perf_counter() - inicio, sucesso=True)
+            self._estado = (assinatura, valor)
+            return valor
+
+
+@dataclass(frozen=True)
+class IndiceOperadoras:
+    """
+    Cadastro de operadoras em memória: DataFrame (para filtros vetorizados),
+    um registro por linha já convertido para tipos JSON e dicionários
+    CNPJ → linha e REG_ANS → linha. Em chaves repetidas vale a primeira linha,
+    como no df[df['CNPJ'] == cnpj].iloc[0] anterior. `busca` é o índice de
+    trigramas de Razão Social, Nome Fantasia e CNPJ; `chaves`/`ordem`/`rank`
+    ordenam as linhas por (REG_ANS, CNPJ) para a paginação por cursor.
+    """
+    df: pd.DataFrame
+    registros: list
+    por_cnpj: dict
+    por_reg_ans: dict
+    busca: IndiceBusca
+    chaves: list
+    ordem: np.ndarray
+    rank: np.ndarray
+
+    def __len__(self):
+        return len(self.registros)
+
+    def buscar_cnpj(self, cnpj):
+        """Registro da operadora com esse CNPJ, ou None."""
+        posicao = self.por_cnpj.get(cnpj)
+        return None if posicao is None else self.registros[posicao]
+
+    def buscar_reg_ans(self, reg_ans):
+        """Registro da operadora com esse REG_ANS, ou None."""
+        posicao = self.por_reg_ans.get(reg_ans)
+        return None if posicao is None else self.registros[posicao]
+
+    def apos(self, cursor, limite, posicoes=None):
+        """
+        Paginação por cursor (keyset): as `limite` linhas seguintes a `cursor`
+        na ordem (REG_ANS, CNPJ), entre todas ou só entre `posicoes` (resultado
+        de uma busca). Uma busca binária localiza o cursor, então o custo não
+        depende da profundidade da página. Retorna (posições, próximo cursor
+        ou None na última página).
+        """
+        inicio = 0 if cursor is None else bisect.bisect_right(self.chaves, cursor)
+
+        if posicoes is None:
+            fim = min(inicio + limite, len(self.ordem))
+            ranks = np.arange(inicio, fim)
+            restantes = len(self.ordem) - inicio
+        else:
+            ranks = self.rank[posicoes]
+            ranks = ranks[ranks >= inicio]
+            restantes = len(ranks)
+            if restantes > limite:
+                ranks = np.partition(ranks, limite - 1)[:limite]
+            ranks = np.sort(ranks)
+
+        proximo = self.chaves[ranks[-1]] if restantes > limite and len(ranks) else None
+        return self.ordem[ranks], proximo
+
+
+def indexar(coluna):
+    """Dicionário valor → posição da primeira ocorrência (nulos ignorados)."""
+    primeira = (coluna.notna() & ~coluna.duplicated()).to_numpy()
+    return dict(zip(coluna[primeira].tolist(), np.flatnonzero(primeira).tolist()))
+
+
+def codificar_cursor(chave):
+    """Cursor opaco (base64 de JSON) para a chave (REG_ANS, CNPJ)."""
+    return base64.urlsafe_b64encode(json.dumps(list(chave)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Chave (REG_ANS, CNPJ) de um cursor; ValueError se o token não for válido."""
+    try:
+        reg_ans, cnpj = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (TypeError, ValueError) as erro:
+        raise ValueError('cursor inválido') from erro
+    if not isinstance(reg_ans, int) or not isinstance(cnpj, str):
+        raise ValueError('cursor inválido')
+    return reg_ans, cnpj
+
+
+def carregar_operadoras(caminho):
+    """Lê o cadastro (esquema 'cadop') e monta o índice."""
+    df = ler_csv(caminho, 'cadop').reset_index(drop=True)
+    registros = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+    chaves = [(REG_ANS_AUSENTE if registro['REGISTRO_OPERADORA'] is None else registro['REGISTRO_OPERADORA'],
+               registro['CNPJ'] or '') for registro in registros]
+    ordem = np.array(sorted(range(len(chaves)), key=chaves.__getitem__), dtype=np.int64)
+    rank = np.empty(len(ordem), dtype=np.int64)
+    rank[ordem] = np.arange(len(ordem))
+
+    return IndiceOperadoras(
+        df=df,
+        registros=registros,
+        por_cnpj=indexar(df['CNPJ']),
+        por_reg_ans=indexar(df['REGISTRO_OPERADORA']),
+        busca=IndiceBusca([[registro.get(coluna) for registro in registros] for coluna in COLUNAS_BUSCA]),
+        chaves=[chaves[posicao] for posicao in ordem.tolist()],
+        ordem=ordem,
+        rank=rank,
+    )
+
+
+@dataclass(frozen=True)
+class HistoricoDespesas:
+    """
+    Despesas com valor > 0 ordenadas por REG_ANS (ordem estável: dentro de
+    uma operadora, a ordem do arquivo) e `inicios[i]:inicios[i + 1]` como a
+    faixa da operadora `chaves[i]`. O histórico de uma operadora é uma fatia
+    dos arrays; Ano -1 e Trimestre -1 representam nulos.
+    """
+    chaves: np.ndarray
+    inicios: np.ndarray
+    ano: np.ndarray
+    trimestre: np.ndarray
+    valor: np.ndarray
+    trimestres: tuple
+
+    def __len__(self):
+        return len(self.valor)
+
+    def fatia(self, reg_ans):
+        """Faixa das despesas da operadora (vazia se não houver nenhuma)."""
+        if reg_ans is None:
+            return slice(0, 0)
+        posicao = int(np.searchsorted(self.chaves, reg_ans))
+        if posicao == len(self.chaves) or self.chaves[posicao] != reg_ans:
+            return slice(0, 0)
+        return slice(int(self.inicios[posicao]), int(self.inicios[posicao + 1]))
+
+    def registros(self, reg_ans):
+        """Histórico da operadora no formato da API (ANO, TRIMESTRE, VALOR_DESPESA)."""
+        return self._converter(self.fatia(reg_ans))
+
+    def lotes(self, reg_ans, tamanho=LINHAS_POR_LOTE):
+        """Mesmos registros em listas de até `tamanho`, convertidas uma de cada vez (respostas em partes)."""
+        fatia = self.fatia(reg_ans)
+        for inicio in range(fatia.start, fatia.stop, tamanho):
+            yield self._converter(slice(inicio, min(inicio + tamanho, fatia.stop)))
+
+    def _converter(self, fatia):
+        # ANO sai como texto, como no CSV lido com dtype=str (contrato da API)
+        return [{'ANO': None if ano < 0 else str(ano),
+                 'TRIMESTRE': None if codigo < 0 else self.trimestres[codigo],
+                 'VALOR_DESPESA': valor}
+                for ano, codigo, valor in zip(self.ano[fatia].tolist(),
+                                              self.trimestre[fatia].tolist(),
+                                              self.valor[fatia].tolist())]
+
+
+def ler_despesas(caminho):
+    """Colunas do histórico a partir do dataset Parquet (pasta) ou do CSV consolidado."""
+    if os.path.isdir(caminho):
+        return ler_parquet(caminho, 'consolidado', colunas=COLUNAS_HISTORICO)
+    return ler_csv(caminho, 'consolidado', usecols=COLUNAS_HISTORICO)
+
+
+def construir_historico(df):
+    """Ordena as despesas por REG_ANS e calcula o início da faixa de cada operadora."""
+    df = df[(df['ValorDespesas'] > 0).fillna(False) & df['REG_ANS'].notna()]
+
+    reg_ans = df['REG_ANS'].to_numpy(dtype='int64')
+    ordem = np.argsort(reg_ans, kind='stable')
+    chaves, inicios = np.unique(reg_ans[ordem], return_index=True)
+
+    trimestre = df['Trimestre'].astype('category')
+    return HistoricoDespesas(
+        chaves=chaves,
+        inicios=np.append(inicios, len(ordem)).astype('int64'),
+        ano=df['Ano'].to_numpy(dtype='int16', na_value=-1)[ordem],
+        trimestre=trimestre.cat.codes.to_numpy(dtype='int16')[ordem],
+        valor=df['ValorDespesas'].to_numpy(dtype='float64')[ordem],
+        trimestres=tuple(str(categoria) for categoria in trimestre.cat.categories),
+    )
+
+
+def salvar_historico(historico, pasta):
+    """
+    Grava os arrays como .npy em `pasta`. Escreve em uma pasta temporária e
+    renomeia: se outro worker publicou a mesma versão antes, descarta a sua.
+    """
+    temporaria = f"{pasta}.tmp-{os.getpid()}"
+    os.makedirs(temporaria, exist_ok=True)
+    for nome in ARRAYS_HISTORICO:
+        np.save(os.path.join(temporaria, f"{nome}.npy"), getattr(historico, nome))
+    with open(os.path.join(temporaria, 'trimestres.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(list(historico.trimestres), arquivo)
+
+    try:
+        os.rename(temporaria, pasta)
+    except OSError:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+def abrir_historico(pasta):
+    """Histórico gravado por salvar_historico, com os arrays mapeados em memória (somente leitura)."""
+    arrays = {nome: np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode='r')
+              for nome in ARRAYS_HISTORICO}
+    with open(os.path.join(pasta, 'trimestres.json'), 'r', encoding='utf-8') as arquivo:
+        trimestres = tuple(json.load(arquivo))
+    return HistoricoDespesas(**arrays, trimestres=trimestres)
+
+
+def carregar_historico(caminho, pasta_mmap=None):
+    """
+    Histórico de despesas do arquivo `caminho`. Com `pasta_mmap`, é gravado
+    uma vez por versão do arquivo (subpasta com a assinatura) e aberto com
+    mmap: vários workers do gunicorn compartilham as mesmas páginas do
+    cache do sistema em vez de cada um manter uma cópia.
+    """
+    if pasta_mmap is None:
+        return construir_historico(ler_despesas(caminho))
+
+    identificacao = repr((os.path.abspath(caminho), assinatura_arquivo(caminho)))
+    versao = os.path.join(pasta_mmap, hashlib.sha1(identificacao.encode('utf-8')).hexdigest()[:16])
+
+    if not os.path.isdir(versao):
+        os.makedirs(pasta_mmap, exist_ok=True)
+        salvar_historico(construir_historico(ler_despesas(caminho)), versao)
+        # Versões antigas: quem ainda as mapeia continua lendo (o arquivo só some no munmap)
+        for antiga in os.listdir(pasta_mmap):
+            caminho_antiga = os.path.join(pasta_mmap, antiga)
+            if caminho_antiga != versao and '.tmp-' not in antiga:
+                shutil.rmtree(caminho_antiga, ignore_errors=True)
+
+    return abrir_historico(versao)
+
+
+@dataclass(frozen=True)
+class Estatisticas:
+    """Estatísticas de uma versão do CSV agregado; `etag` é o SHA-256 do CSV."""
+    dados: dict
+    etag: str
+    origem: str
+
+
+def carregar_estatisticas(caminho):
+    """
+    Usa o JSON lateral gravado pelo Teste 2 quando ele corresponde ao CSV
+    (mesmo SHA-256); senão lê só as 3 colunas necessárias e calcula.
+    """
+    versao = hash_arquivo(caminho)
+    dados = ler_estatisticas(caminho, versao)
+    if dados is not None:
+        return Estatisticas(dados=dados, etag=versao, origem='json')
+
+    agregado = ler_csv(caminho, 'agregadas', usecols=['RazaoSocial', 'UF', 'TotalDespesas'])
+    return Estatisticas(dados=calcular_estatisticas(agregado), etag=versao, origem='csv')
@@ -0,0 +1,64 @@
+# TESTE 4 - SERVIDOR DE PRODUÇÃO
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: gunicorn com dados pré-carregados no mestre e compartilhados entre os workers; recarga de dados com SIGHUP
+
+# Bibliotecas
+
+import gc
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Configurações
+
+# Nos workers, os dados só são relidos no SIGHUP (abaixo), não a cada requisição
+os.environ.setdefault('ANS_RECARREGAR', '0')
+
+# Cada worker grava suas métricas nesta pasta e o /metrics soma todas (metricas.py);
+# sem ANS_METRICAS_DIR, uma pasta temporária removida ao encerrar. A marca fica no
+# ambiente porque o gunicorn executa este arquivo de novo a cada SIGHUP
+if not os.environ.get('ANS_METRICAS_DIR'):
+    os.environ['ANS_METRICAS_DIR'] = tempfile.mkdtemp(prefix='ans-metricas-')
+    os.environ['ANS_METRICAS_DIR_TEMPORARIA'] = os.environ['ANS_METRICAS_DIR']
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('ANS_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('ANS_WORKERS', str(os.cpu_count() or 1)))
+
+# Importa wsgi.py (e carrega os dados) uma vez no mestre, antes de criar os workers
+preload_app = True
+
+# Tempo para os workers antigos terminarem as requisições em andamento na recarga
+graceful_timeout = 30
+
+# Funções
+
+
+def on_starting(server):
+    """Remove métricas de uma execução anterior (se ANS_METRICAS_DIR for uma pasta fixa)."""
+    for caminho in Path(os.environ['ANS_METRICAS_DIR']).glob('metricas-*.json'):
+        caminho.unlink(missing_ok=True)
+
+
+def on_exit(server):
+    if os.environ.get('ANS_METRICAS_DIR_TEMPORARIA'):
+        shutil.rmtree(os.environ['ANS_METRICAS_DIR_TEMPORARIA'], ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Worker encerrado (recarga, max_requests, timeout): os contadores dele vão para os aposentados."""
+    from metricas import aposentar_processo
+    aposentar_processo(worker.pid)
+
+
+def on_reload(server):
+    """
+    SIGHUP (kill -HUP <pid do mestre>): o mestre relê os arquivos que mudaram
+    antes de criar os novos workers, que herdam a versão nova; os antigos
+    terminam as requisições em andamento e saem.
+    """
+    from main import precarregar
+    gc.unfreeze()
+    precarregar()
+    gc.freeze()
@@ -1,36 +1,151 @@
-from flask import Flask, request, jsonify
-import pandas as pd
+from flask import Flask, Response, request, jsonify
+from functools import partial
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from comum.parquet import dataset_disponivel
+from configuracao import carregar_configuracao
+from dados import (ArquivoMonitorado, carregar_estatisticas, carregar_historico, carregar_operadoras,
+                   codificar_cursor, decodificar_cursor)
+from metricas import (MIMETYPE_METRICAS, exportar, iniciar_medicao, registrar_dados, registrar_erro,
+                      registrar_resposta)
+from respostas import (MIMETYPE_NDJSON, ProvedorJSON, comprimir_resposta, formato_ndjson, partes_json,
+                       partes_ndjson, resposta_incremental)
 
 app = Flask(__name__)
+# Latência, status e tamanho por rota (metricas.py); o after_request registrado
+# primeiro roda por último, então mede o corpo já comprimido
+app.before_request(iniciar_medicao)
+app.after_request(registrar_resposta)
+app.teardown_request(registrar_erro)
+# jsonify com orjson (se instalado) e compressão gzip/br das respostas grandes
+app.json = ProvedorJSON(app)
+app.after_request(comprimir_resposta)
+
+# Caminhos e opções: padrões em Teste3/data, arquivo JSON (ANS_CONFIG) ou variáveis ANS_* (configuracao.py)
+CONFIG = carregar_configuracao()
+
+
+def origem_despesas(config):
+    """Dataset Parquet do Teste 1 se existir; senão o CSV consolidado."""
+    return config['despesas_parquet'] if dataset_disponivel(config['despesas_parquet']) else config['despesas_csv']
+
+
+# Cadastro lido uma vez e indexado por CNPJ/REG_ANS; recarregado quando o arquivo muda
+operadoras = ArquivoMonitorado(CONFIG['operadoras_csv'], carregar_operadoras, CONFIG['recarregar_automatico'])
+
+# Histórico de despesas agrupado por REG_ANS; com ANS_HISTORICO_MMAP (pasta), gravado
+# em .npy e mapeado em memória para ser compartilhado entre workers
+despesas = ArquivoMonitorado(origem_despesas(CONFIG),
+                             partial(carregar_historico, pasta_mmap=CONFIG['historico_mmap']),
+                             CONFIG['recarregar_automatico'])
 
-OPERADORAS_CSV = r'C:\Users\jessi\OneDrive\Área de Trabalho\Teste_JessicaMachado\Teste3\data\operadoras.csv'
-DESPESAS_CSV = r'C:\Users\jessi\OneDrive\Área de Trabalho\Teste_JessicaMachado\Teste3\data\consolidado_despesas.csv'
-AGREGADAS_CSV = r'C:\Users\jessi\OneDrive\Área de Trabalho\Teste_JessicaMachado\Teste3\data\despesas_agregadas.csv'
+# Estatísticas calculadas uma vez por versão de despesas_agregadas.csv (ou lidas do JSON do Teste 2)
+estatisticas = ArquivoMonitorado(CONFIG['agregadas_csv'], carregar_estatisticas, CONFIG['recarregar_automatico'])
+
+DADOS = {'operadoras': operadoras, 'despesas': despesas, 'estatisticas': estatisticas}
+registrar_dados(DADOS)
+
+
+def configurar(**opcoes):
+    """Troca caminhos e opções depois da importação (ex.: outro diretório de dados)."""
+    CONFIG.update(opcoes)
+    operadoras.caminho = CONFIG['operadoras_csv']
+    despesas.caminho = origem_despesas(CONFIG)
+    estatisticas.caminho = CONFIG['agregadas_csv']
+    for arquivo in DADOS.values():
+        arquivo.monitorar = CONFIG['recarregar_automatico']
+
+
+def precarregar():
+    """
+    Carrega (ou recarrega, se os arquivos mudaram) todos os dados. No servidor
+    de produção roda no processo mestre antes do fork: os workers herdam os
+    arrays e índices já prontos, compartilhados em copy-on-write.
+    """
+    for nome, arquivo in DADOS.items():
+        try:
+            arquivo.atualizar()
+            print(f"✅ {nome}: {arquivo.caminho}")
+        except Exception as e:
+            # A API sobe mesmo assim; /api/pronto indica o que falta
+            print(f"❌ {nome}: {arquivo.caminho} ({e})")
 
 
 @app.route('/')
 def index():
     return {'status': 'API Flask rodando'}
 
+# Prontidão: 200 quando cadastro, histórico e estatísticas estão carregados, senão 503
+
+@app.route('/api/pronto')
+def get_pronto():
+    versoes = {nome: arquivo.versao for nome, arquivo in DADOS.items()}
+    pronto = all(versao is not None for versao in versoes.values())
+    resposta = jsonify({'pronto': pronto, 'pid': os.getpid(),
+                        'dados': {nome: versao is not None for nome, versao in versoes.items()}})
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta, 200 if pronto else 503
+
+# Métricas no formato texto do Prometheus (somadas entre os workers com ANS_METRICAS_DIR)
+
+@app.route('/metrics')
+def get_metricas():
+    resposta = Response(exportar(), content_type=MIMETYPE_METRICAS)
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
 # Lista paginada de operadoras (CSV)
+# - page/limit: paginação por número de página (usada pelo frontend)
+# - after: paginação por cursor na ordem (REG_ANS, CNPJ); vazio = primeira página,
+#   depois o `next` da resposta anterior. Custo constante em qualquer profundidade
+# - fields: colunas de cada item (padrão CNPJ,Razao_Social)
+# - count=none: omite `total`
+
+CAMPOS_OPERADORA = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Nome_Fantasia', 'Modalidade', 'UF']
+CAMPOS_PADRAO = ['CNPJ', 'Razao_Social']
+
 
 @app.route('/api/operadoras')
 def get_operadoras():
     page = int(request.args.get('page', 1))
     limit = int(request.args.get('limit', 10))
-    search = request.args.get('search', '').strip().lower()
+    search = request.args.get('search', '').strip()
+    after = request.args.get('after')
+    contar = request.args.get('count', 'exact') != 'none'
+
+    campos = [campo.strip() for campo in request.args.get('fields', '').split(',') if campo.strip()] or CAMPOS_PADRAO
+    invalidos = [campo for campo in campos if campo not in CAMPOS_OPERADORA]
+    if invalidos:
+        return jsonify({'error': f'Campos inválidos: {", ".join(invalidos)}'}), 400
+
+    try:
+        cursor = decodificar_cursor(after) if after else None
+    except ValueError:
+        return jsonify({'error': 'Cursor inválido'}), 400
+
     try:
-        df = pd.read_csv(OPERADORAS_CSV, dtype=str, sep=';')
-        if search:
-            df = df[df['Razao_Social'].str.lower().str.contains(
-                search) | df['CNPJ'].str.contains(search)]
-        total = len(df)
-        start = (page - 1) * limit
-        end = start + limit
-        data = df.iloc[start:end][['CNPJ', 'Razao_Social']
-                                  ].to_dict(orient='records')
-        return jsonify({'data': data, 'total': total, 'page': page, 'limit': limit})
+        indice = operadoras.obter()
+        # Busca literal, sem acento/maiúsculas, em Razão Social, Nome Fantasia e CNPJ (busca.py)
+        posicoes = indice.busca.buscar(search) if search else None
+
+        if after is not None:
+            pagina, proximo = indice.apos(cursor, limit, posicoes)
+            resposta = {'limit': limit, 'next': None if proximo is None else codificar_cursor(proximo)}
+        else:
+            if posicoes is None:
+                posicoes = indice.busca.buscar('')
+            start = (page - 1) * limit
+            pagina = posicoes[start:start + limit]
+            resposta = {'page': page, 'limit': limit}
+
+        if contar:
+            resposta['total'] = len(indice) if posicoes is None else len(posicoes)
+        resposta['data'] = [{campo: indice.registros[posicao][campo] for campo in campos}
+                            for posicao in pagina.tolist()]
+        return jsonify(resposta)
     except Exception as e:
         return jsonify({'error': f'Erro ao ler operadoras.csv: {str(e)}'}), 500
 
@@ -39,15 +154,13 @@ def get_operadoras():
 @app.route('/api/operadoras/<cnpj>')
 def get_operadora(cnpj):
     try:
-        df = pd.read_csv(OPERADORAS_CSV, dtype=str, sep=';')
-        op = df[df['CNPJ'] == cnpj]
-        if op.empty:
+        operadora = operadoras.obter().buscar_cnpj(cnpj)
+        if operadora is None:
             return jsonify({'error': 'Operadora não encontrada'}), 404
-        row = op.iloc[0]
         result = {
-            'CNPJ': row['CNPJ'],
-            'RAZAO_SOCIAL': row['Razao_Social'],
-            'UF': row['UF']
+            'CNPJ': operadora['CNPJ'],
+            'RAZAO_SOCIAL': operadora['Razao_Social'],
+            'UF': operadora['UF']
         }
         return jsonify(result)
     except Exception as e:
@@ -58,29 +171,19 @@ def get_operadora(cnpj):
 @app.route('/api/operadoras/<cnpj>/despesas')
 def get_despesas_operadora(cnpj):
     try:
-        df_op = pd.read_csv(OPERADORAS_CSV, dtype=str, sep=';')
-        op = df_op[df_op['CNPJ'] == cnpj]
-        if op.empty:
+        operadora = operadoras.obter().buscar_cnpj(cnpj)
+        if operadora is None:
             return jsonify({'error': 'Operadora não encontrada'}), 404
-        reg_ans = op.iloc[0]['REGISTRO_OPERADORA']
         try:
-            df_desp = pd.read_csv(DESPESAS_CSV, dtype=str, sep=';')
+            historico = despesas.obter()
         except Exception as e:
             return jsonify({'error': f'Erro ao ler o arquivo de despesas: {str(e)}'}), 500
-        # Ajuste para nomes reais das colunas
-        if 'REG_ANS' not in df_desp.columns:
-            return jsonify({'error': 'Coluna REG_ANS não encontrada no CSV de despesas.'}), 500
-        filtro = df_desp['REG_ANS'] == reg_ans
-        despesas_df = df_desp.loc[filtro, ['Ano', 'Trimestre', 'ValorDespesas']].copy()
-        # Converter para float e filtrar apenas valores maiores que zero
-        despesas_df['ValorDespesas'] = pd.to_numeric(despesas_df['ValorDespesas'], errors='coerce').fillna(0)
-        despesas_df = despesas_df[despesas_df['ValorDespesas'] > 0]
-        despesas = despesas_df.rename(columns={
-            'Ano': 'ANO',
-            'Trimestre': 'TRIMESTRE',
-            'ValorDespesas': 'VALOR_DESPESA'
-        }).to_dict(orient='records')
-        return jsonify({'cnpj': cnpj, 'despesas': despesas})
+        # Só valores maiores que zero, na ordem do arquivo: uma fatia do histórico,
+        # serializada em lotes (JSON ou, com ?format=ndjson, uma linha por despesa)
+        lotes = historico.lotes(operadora['REGISTRO_OPERADORA'])
+        if formato_ndjson():
+            return resposta_incremental(partes_ndjson(lotes), MIMETYPE_NDJSON)
+        return resposta_incremental(partes_json({'cnpj': cnpj}, 'despesas', lotes))
     except Exception as e:
         return jsonify({'error': f'Erro ao ler despesas: {str(e)}'}), 500
 
@@ -89,24 +192,17 @@ def get_despesas_operadora(cnpj):
 @app.route('/api/estatisticas')
 def get_estatisticas():
     try:
-        try:
-            df_ag = pd.read_csv(AGREGADAS_CSV)
-        except Exception as e:
-            return jsonify({'error': 'Arquivo de estatísticas muito grande para leitura direta. Use um arquivo menor para testes.'}), 500
-        df_ag['TotalDespesas'] = pd.to_numeric(df_ag['TotalDespesas'], errors='coerce').fillna(0)
-        total_despesas = float(df_ag['TotalDespesas'].sum())
-        media_despesas = float(df_ag['TotalDespesas'].mean())
-        top5 = df_ag.nlargest(5, 'TotalDespesas')[['RazaoSocial', 'TotalDespesas']].to_dict(orient='records')
-        uf_despesas = df_ag.groupby('UF')['TotalDespesas'].sum().to_dict()
-        return jsonify({
-            'total_despesas': total_despesas,
-            'media_despesas': media_despesas,
-            'top5_operadoras': top5,
-            'uf_despesas': uf_despesas
-        })
+        versao = estatisticas.obter()
     except Exception as e:
         return jsonify({'error': f'Erro ao calcular estatísticas: {str(e)}'}), 500
+    # ETag = SHA-256 do CSV: com If-None-Match igual, responde 304 sem corpo
+    resposta = jsonify(versao.dados)
+    resposta.set_etag(versao.etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
 
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção: gunicorn -c gunicorn.conf.py (ver README)
+    precarregar()
     app.run(debug=True)
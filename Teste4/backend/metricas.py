@@ -0,0 +1,431 @@
+# TESTE 4 - MÉTRICAS DA API
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Latência, contagem e tamanho das respostas por rota, acertos/cargas dos dados em memória e log de requisições lentas, expostos em /metrics (formato texto do Prometheus)
+
+# Bibliotecas
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from flask import g, request
+
+# Configurações
+
+# Requisições mais lentas que isso (ms) são impressas no log; 0 desliga
+LIMITE_LENTA_MS = float(os.environ.get('ANS_REQUISICAO_LENTA_MS', '0'))
+
+MIMETYPE_METRICAS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites superiores dos buckets dos histogramas
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Rótulo das requisições que não casam com nenhuma rota (404): evita um rótulo por URL
+ROTA_DESCONHECIDA = '<nenhuma>'
+
+# Vários processos (workers do gunicorn): cada um grava os seus números em
+# <pasta>/metricas-<pid>-<id>.json e o /metrics soma os arquivos de todos.
+# Sem a pasta, o /metrics mostra só o processo que respondeu (servidor de desenvolvimento)
+PASTA_METRICAS = os.environ.get('ANS_METRICAS_DIR')
+
+# Segundos entre as gravações do arquivo de um processo (atraso máximo dos outros workers no /metrics)
+INTERVALO_GRAVACAO = 1.0
+
+# Contadores dos workers que já saíram, somados pelo mestre (aposentar_processo)
+ARQUIVO_APOSENTADOS = 'metricas-aposentados.json'
+CONTADORES_DADOS = ('acertos', 'cargas', 'falhas', 'duracao_cargas')
+
+# Conjuntos de dados (ArquivoMonitorado) incluídos no /metrics, por registrar_dados()
+DADOS = {}
+
+# Funções
+
+
+def escapar(valor):
+    """Valor de rótulo no formato texto do Prometheus."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def rotulos(nomes, valores, extra=''):
+    pares = [f'{nome}="{escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador com rótulos (um valor por combinação de rótulos)."""
+
+    def __init__(self, nome, ajuda, nomes_rotulos=(), tipo='counter'):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.nomes_rotulos = nomes_rotulos
+        self.tipo = tipo
+        self.zerar()
+
+    def zerar(self):
+        self._valores = {}
+        self._trava = threading.Lock()
+
+    def vazio(self):
+        return Contador(self.nome, self.ajuda, self.nomes_rotulos, self.tipo)
+
+    def incrementar(self, *valores_rotulos, valor=1):
+        with self._trava:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + valor
+
+    def estado(self):
+        """[[rótulos, valor], ...] (JSON), para somar processos com mesclar()."""
+        with self._trava:
+            return [[list(chave), valor] for chave, valor in self._valores.items()]
+
+    def mesclar(self, estado):
+        for chave, valor in estado:
+            self.incrementar(*chave, valor=valor)
+
+    def linhas(self):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} {self.tipo}'
+        with self._trava:
+            valores = sorted(self._valores.items())
+        for valores_rotulos, valor in valores:
+            yield f'{self.nome}{rotulos(self.nomes_rotulos, valores_rotulos)} {numero(valor)}'
+
+
+class Histograma:
+    """Histograma com rótulos: contagem acumulada por bucket, soma e total."""
+
+    def __init__(self, nome, ajuda, nomes_rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.nomes_rotulos = nomes_rotulos
+        self.buckets = tuple(buckets)
+        self.zerar()
+
+    def zerar(self):
+        self._series = {}  # rótulos → [contagem por bucket (não acumulada) + infinito, soma]
+        self._trava = threading.Lock()
+
+    def vazio(self):
+        return Histograma(self.nome, self.ajuda, self.nomes_rotulos, self.buckets)
+
+    def _serie(self, valores_rotulos):
+        serie = self._series.get(valores_rotulos)
+        if serie is None:
+            serie = self._series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+        return serie
+
+    def observar(self, valor, *valores_rotulos):
+        # Índice do primeiro bucket com limite >= valor (o último é o +Inf)
+        indice = next((i for i, limite in enumerate(self.buckets) if valor <= limite), len(self.buckets))
+        with self._trava:
+            serie = self._serie(valores_rotulos)
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def estado(self):
+        """[[rótulos, contagens por bucket, soma], ...] (JSON), para somar processos com mesclar()."""
+        with self._trava:
+            return [[list(chave), list(contagens), soma] for chave, (contagens, soma) in self._series.items()]
+
+    def mesclar(self, estado):
+        with self._trava:
+            for chave, contagens, soma in estado:
+                serie = self._serie(tuple(chave))
+                serie[0] = [atual + novo for atual, novo in zip(serie[0], contagens)]
+                serie[1] += soma
+
+    def linhas(self):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} histogram'
+        with self._trava:
+            series = sorted((chave, (list(contagens), soma)) for chave, (contagens, soma) in self._series.items())
+        for valores_rotulos, (contagens, soma) in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ('+Inf',), contagens):
+                acumulado += contagem
+                le = f'le="{limite if limite == "+Inf" else numero(limite)}"'
+                yield f'{self.nome}_bucket{rotulos(self.nomes_rotulos, valores_rotulos, le)} {acumulado}'
+            yield f'{self.nome}_sum{rotulos(self.nomes_rotulos, valores_rotulos)} {numero(soma)}'
+            yield f'{self.nome}_count{rotulos(self.nomes_rotulos, valores_rotulos)} {acumulado}'
+
+
+REQUISICOES = Contador('ans_api_requisicoes_total', 'Requisições por rota, método e status.',
+                       ('rota', 'metodo', 'status'))
+LATENCIA = Histograma('ans_api_latencia_segundos',
+                      'Tempo da requisição até o fim da resposta (nas respostas em partes, até a última parte).',
+                      ('rota',), BUCKETS_LATENCIA)
+TAMANHO = Histograma('ans_api_resposta_bytes', 'Tamanho do corpo enviado (após compressão).',
+                     ('rota',), BUCKETS_BYTES)
+METRICAS = [REQUISICOES, LATENCIA, TAMANHO]
+
+
+def rota_atual():
+    """Regra da rota (ex.: /api/operadoras/<cnpj>), não a URL: um rótulo por rota, não por CNPJ."""
+    return request.url_rule.rule if request.url_rule is not None else ROTA_DESCONHECIDA
+
+
+def registrar(medicao, status, duracao, tamanho):
+    """Registra uma requisição; `medicao` = (rota, método, URL) capturados durante a requisição."""
+    rota, metodo, url = medicao
+    REQUISICOES.incrementar(rota, metodo, str(status))
+    LATENCIA.observar(duracao, rota)
+    TAMANHO.observar(tamanho, rota)
+    if LIMITE_LENTA_MS and duracao * 1000 >= LIMITE_LENTA_MS:
+        print(f"🐢 {metodo} {url} {status} {duracao * 1000:.1f} ms {tamanho} bytes", flush=True)
+    if PASTA_METRICAS:
+        agendar_gravacao()
+
+
+def iniciar_medicao():
+    """before_request: marca o início da requisição."""
+    g.inicio_medicao = time.perf_counter()
+
+
+def medicao_atual():
+    return rota_atual(), request.method, request.full_path.rstrip('?')
+
+
+def contar_partes(partes, medicao, status, inicio):
+    """
+    Repassa as partes de uma resposta em partes e registra tempo e bytes
+    quando ela termina (fora do contexto da requisição, por isso `medicao`).
+    """
+    tamanho = 0
+    try:
+        for parte in partes:
+            tamanho += len(parte)
+            yield parte
+    finally:
+        registrar(medicao, status, time.perf_counter() - inicio, tamanho)
+
+
+def registrar_resposta(resposta):
+    """
+    after_request (registrado antes de comprimir_resposta para rodar depois
+    dele e medir o corpo comprimido). Respostas em partes são medidas quando
+    a última parte é enviada.
+    """
+    inicio = g.get('inicio_medicao')
+    if inicio is None:
+        return resposta
+    g.medicao_registrada = True
+
+    if resposta.is_streamed and not resposta.direct_passthrough:
+        resposta.response = contar_partes(resposta.response, medicao_atual(), resposta.status_code, inicio)
+        return resposta
+
+    tamanho = resposta.calculate_content_length() or 0
+    registrar(medicao_atual(), resposta.status_code, time.perf_counter() - inicio, tamanho)
+    return resposta
+
+
+def registrar_erro(erro):
+    """teardown_request: exceção não tratada (sem after_request) conta como 500."""
+    inicio = g.get('inicio_medicao')
+    if erro is None or inicio is None or g.get('medicao_registrada'):
+        return
+    registrar(medicao_atual(), 500, time.perf_counter() - inicio, 0)
+
+
+def registrar_dados(dados):
+    """Inclui os conjuntos de dados (nome → ArquivoMonitorado) no /metrics."""
+    DADOS.update(dados)
+
+
+# Processo atual: arquivo de métricas, alterações ainda não gravadas e thread de gravação
+_processo = {'pid': None, 'arquivo': None, 'pendente': False, 'gravador': None}
+_trava_processo = threading.Lock()
+
+
+def estado_processo():
+    """Números do processo: métricas das requisições e contadores de cada conjunto de dados."""
+    return {
+        'metricas': {metrica.nome: metrica.estado() for metrica in METRICAS},
+        'dados': {conjunto: {**arquivo.metricas(), 'carregado': arquivo.versao is not None}
+                  for conjunto, arquivo in DADOS.items()},
+    }
+
+
+def arquivo_processo():
+    """Arquivo deste processo (o id evita reaproveitar o arquivo de um worker antigo com o mesmo pid)."""
+    if _processo['pid'] != os.getpid():
+        _processo.update(pid=os.getpid(), pendente=False, gravador=None,
+                         arquivo=Path(PASTA_METRICAS) / f"metricas-{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+    return _processo['arquivo']
+
+
+def gravar_json(caminho, dados):
+    """Grava de forma atômica (quem lê nunca vê um arquivo pela metade)."""
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix('.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def ler_json(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None  # worker gravando ou arquivo removido
+
+
+def gravar_processo():
+    gravar_json(arquivo_processo(), estado_processo())
+
+
+def agendar_gravacao():
+    """Marca alterações pendentes; uma thread do processo grava no máximo uma vez por INTERVALO_GRAVACAO."""
+    with _trava_processo:
+        arquivo_processo()
+        _processo['pendente'] = True
+        if _processo['gravador'] is None:
+            _processo['gravador'] = threading.Thread(target=gravar_periodicamente, daemon=True)
+            _processo['gravador'].start()
+
+
+def gravar_periodicamente():
+    while True:
+        time.sleep(INTERVALO_GRAVACAO)
+        with _trava_processo:
+            pendente, _processo['pendente'] = _processo['pendente'], False
+        if pendente:
+            gravar_processo()
+
+
+def antes_do_fork():
+    # Mestre do gunicorn: as cargas feitas antes de criar os workers ficam no arquivo dele
+    if PASTA_METRICAS and DADOS:
+        gravar_processo()
+
+
+def depois_do_fork():
+    # Worker novo: começa do zero (o que herdou do mestre já está no arquivo do mestre)
+    global _trava_processo
+    _trava_processo = threading.Lock()
+    _processo.update(pid=None, arquivo=None, pendente=False, gravador=None)
+    for metrica in METRICAS:
+        metrica.zerar()
+    for arquivo in DADOS.values():
+        arquivo.zerar_metricas()
+
+
+def gravar_pendentes():
+    # Worker encerrando (recarga, max_requests): não perde o último intervalo
+    if PASTA_METRICAS and _processo['pendente'] and _processo['pid'] == os.getpid():
+        gravar_processo()
+
+
+os.register_at_fork(before=antes_do_fork, after_in_child=depois_do_fork)
+atexit.register(gravar_pendentes)
+
+
+def aposentar_processo(pid):
+    """
+    Mestre do gunicorn, quando um worker sai: soma os contadores dele ao
+    arquivo dos aposentados e remove o arquivo do worker. Os totais continuam
+    crescendo e os gauges e ans_api_processos ficam só com os processos vivos.
+    """
+    pasta = Path(PASTA_METRICAS)
+    caminho_aposentados = pasta / ARQUIVO_APOSENTADOS
+    aposentados = ler_json(caminho_aposentados) or {'absorvidos': [], 'metricas': {}, 'dados': {}}
+
+    absorvidos = []
+    for caminho in pasta.glob(f'metricas-{pid}-*.json'):
+        estado = ler_json(caminho)
+        if estado is None or caminho.name in aposentados['absorvidos']:
+            continue
+        for metrica in METRICAS:
+            soma = metrica.vazio()
+            soma.mesclar(aposentados['metricas'].get(metrica.nome, []))
+            soma.mesclar(estado['metricas'].get(metrica.nome, []))
+            aposentados['metricas'][metrica.nome] = soma.estado()
+        for conjunto, numeros in estado['dados'].items():
+            total = aposentados['dados'].setdefault(conjunto, dict.fromkeys(CONTADORES_DADOS, 0))
+            for chave in CONTADORES_DADOS:
+                total[chave] += numeros[chave]
+        absorvidos.append(caminho)
+    if not absorvidos:
+        return
+
+    # Quem ler o arquivo do worker antes da remoção o ignora por estar em 'absorvidos'
+    aposentados['absorvidos'] = [nome for nome in aposentados['absorvidos'] if (pasta / nome).exists()]
+    aposentados['absorvidos'] += [caminho.name for caminho in absorvidos]
+    gravar_json(caminho_aposentados, aposentados)
+    for caminho in absorvidos:
+        caminho.unlink(missing_ok=True)
+
+
+def estados_processos():
+    """
+    Estados dos processos vivos e, por último, o dos aposentados (com
+    PASTA_METRICAS) ou só o deste processo.
+    """
+    if not PASTA_METRICAS:
+        return [estado_processo()], None
+    gravar_processo()
+    pasta = Path(PASTA_METRICAS)
+    estados = {caminho.name: ler_json(caminho) for caminho in sorted(pasta.glob('metricas-*.json'))
+               if caminho.name != ARQUIVO_APOSENTADOS}
+    # Lido depois dos workers: um worker aposentado nesse meio-tempo aparece só em um dos dois
+    aposentados = ler_json(pasta / ARQUIVO_APOSENTADOS)
+    if aposentados:
+        for nome in aposentados['absorvidos']:
+            estados.pop(nome, None)
+    return [estado for estado in estados.values() if estado is not None], aposentados
+
+
+def metricas_dados(estados, aposentados=None):
+    """
+    Métricas dos conjuntos de dados somadas entre os processos (última carga: a
+    maior; carregado: em todos). Os contadores incluem os dos aposentados.
+    """
+    series = [
+        ('ans_api_dados_acertos_total', 'counter', 'Leituras servidas da versão já carregada.', 'acertos', sum),
+        ('ans_api_dados_cargas_total', 'counter', 'Cargas (e recargas) concluídas do arquivo.', 'cargas', sum),
+        ('ans_api_dados_falhas_total', 'counter', 'Cargas que falharam.', 'falhas', sum),
+        ('ans_api_dados_carga_segundos_total', 'counter', 'Tempo total gasto em cargas.', 'duracao_cargas', sum),
+        ('ans_api_dados_ultima_carga_segundos', 'gauge', 'Duração da última carga.', 'duracao_ultima_carga', max),
+        ('ans_api_dados_carregados', 'gauge', '1 se o conjunto está carregado em todos os processos.', 'carregado',
+         lambda valores: int(all(valores))),
+    ]
+    conjuntos = list(dict.fromkeys(conjunto for estado in estados for conjunto in estado['dados']))
+    dados_aposentados = aposentados['dados'] if aposentados else {}
+    for nome, tipo, ajuda, chave, combinar in series:
+        yield f'# HELP {nome} {ajuda}'
+        yield f'# TYPE {nome} {tipo}'
+        for conjunto in conjuntos:
+            valores = [estado['dados'][conjunto][chave] for estado in estados if conjunto in estado['dados']]
+            if chave in CONTADORES_DADOS and conjunto in dados_aposentados:
+                valores.append(dados_aposentados[conjunto][chave])
+            yield f'{nome}{rotulos(("dados",), (conjunto,))} {numero(combinar(valores))}'
+
+
+def exportar():
+    """
+    Texto do /metrics. Com PASTA_METRICAS, soma os números de todos os
+    processos (os dos outros workers com até INTERVALO_GRAVACAO de atraso).
+    """
+    estados, aposentados = estados_processos()
+    linhas = ['# HELP ans_api_info Processo que respondeu.', '# TYPE ans_api_info gauge',
+              f'ans_api_info{rotulos(("pid",), (os.getpid(),))} 1',
+              '# HELP ans_api_processos Processos somados nesta resposta.', '# TYPE ans_api_processos gauge',
+              f'ans_api_processos {len(estados)}']
+    for metrica in METRICAS:
+        soma = metrica.vazio()
+        for estado in estados + ([aposentados] if aposentados else []):
+            soma.mesclar(estado['metricas'].get(metrica.nome, []))
+        linhas.extend(soma.linhas())
+    linhas.extend(metricas_dados(estados, aposentados))
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,170 @@
+# TESTE 4 - RESPOSTAS JSON
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Serialização rápida (orjson opcional), respostas grandes geradas em partes (JSON ou NDJSON) e compressão gzip/br acima de um limite
+
+# Bibliotecas
+
+import gzip
+import itertools
+import json
+import os
+import zlib
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    ORJSON_DISPONIVEL = False
+
+try:
+    import brotli
+    BROTLI_DISPONIVEL = True
+except ImportError:
+    BROTLI_DISPONIVEL = False
+
+# Configurações
+
+# Respostas menores que isso vão sem compressão (não compensa o custo)
+LIMITE_COMPRESSAO = int(os.environ.get('ANS_LIMITE_COMPRESSAO', 8 * 1024))
+
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
+
+if ORJSON_DISPONIVEL:
+    OPCOES_ORJSON = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Funções
+
+
+def serializar(objeto):
+    """JSON compacto em bytes, chaves ordenadas (como o jsonify), com orjson quando instalado."""
+    if ORJSON_DISPONIVEL:
+        return orjson.dumps(objeto, default=DefaultJSONProvider.default, option=OPCOES_ORJSON)
+    return json.dumps(objeto, default=DefaultJSONProvider.default, sort_keys=True,
+                      separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor do jsonify que usa orjson quando instalado (mesma saída, chaves ordenadas)."""
+
+    def dumps(self, obj, **kwargs):
+        if not ORJSON_DISPONIVEL or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        opcoes = OPCOES_ORJSON | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0)
+        return orjson.dumps(obj, default=self.default, option=opcoes).decode('utf-8')
+
+
+def codificacao_aceita():
+    """'br' ou 'gzip' conforme o Accept-Encoding da requisição (br só com brotli instalado); senão None."""
+    if BROTLI_DISPONIVEL and request.accept_encodings.quality('br') > 0:
+        return 'br'
+    if request.accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def comprimir_partes(partes, codificacao):
+    """Comprime um iterável de bytes parte a parte, sem juntar o corpo inteiro."""
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        for parte in partes:
+            yield compressor.process(parte)
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)  # 31: cabeçalho gzip
+    for parte in partes:
+        comprimido = compressor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def comprimir_resposta(resposta):
+    """
+    after_request: comprime respostas comuns (não geradas em partes) a partir
+    de LIMITE_COMPRESSAO bytes. O ETag passa a ser fraco, já que o corpo
+    enviado muda com a codificação, e continua valendo para o If-None-Match.
+    """
+    if (resposta.status_code != 200 or resposta.direct_passthrough or resposta.is_streamed
+            or 'Content-Encoding' in resposta.headers):
+        return resposta
+    resposta.vary.add('Accept-Encoding')
+
+    corpo = resposta.get_data()
+    codificacao = codificacao_aceita()
+    if len(corpo) < LIMITE_COMPRESSAO or codificacao is None:
+        return resposta
+
+    if codificacao == 'br':
+        resposta.set_data(brotli.compress(corpo, quality=QUALIDADE_BROTLI))
+    else:
+        resposta.set_data(gzip.compress(corpo, NIVEL_GZIP))
+    resposta.headers['Content-Encoding'] = codificacao
+
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+
+def partes_json(cabecalho, chave, lotes):
+    """
+    Objeto JSON em partes: os campos de `cabecalho` e depois `chave` com a
+    lista formada pelos `lotes` (listas de linhas), um lote serializado por vez.
+    """
+    inicio = serializar(cabecalho)
+    yield inicio[:-1] + (b',' if len(inicio) > 2 else b'') + serializar(chave) + b':['
+
+    primeiro = True
+    for lote in lotes:
+        if not lote:
+            continue
+        # "[a,b]" → "a,b": os lotes são emendados com vírgula dentro da mesma lista
+        yield (b'' if primeiro else b',') + serializar(lote)[1:-1]
+        primeiro = False
+    yield b']}'
+
+
+def partes_ndjson(lotes):
+    """Uma linha JSON por registro (NDJSON), um lote por parte."""
+    for lote in lotes:
+        if lote:
+            yield b''.join(serializar(linha) + b'\n' for linha in lote)
+
+
+def formato_ndjson():
+    """NDJSON se pedido por ?format=ndjson ou Accept: application/x-ndjson."""
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == MIMETYPE_NDJSON
+
+
+def resposta_incremental(partes, mimetype='application/json'):
+    """
+    Resposta a partir de partes em bytes. Se o corpo inteiro couber em
+    LIMITE_COMPRESSAO, vai como resposta comum; senão é enviado conforme as
+    partes são geradas (comprimido com gzip/br se o cliente aceitar), sem
+    montar o corpo inteiro em memória.
+    """
+    partes = iter(partes)
+    inicio = []
+    tamanho = 0
+    for parte in partes:
+        inicio.append(parte)
+        tamanho += len(parte)
+        if tamanho >= LIMITE_COMPRESSAO:
+            break
+    else:
+        return Response(b''.join(inicio), mimetype=mimetype)
+
+    corpo = itertools.chain(inicio, partes)
+    codificacao = codificacao_aceita()
+    resposta = Response(comprimir_partes(corpo, codificacao) if codificacao else corpo, mimetype=mimetype)
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+    return resposta
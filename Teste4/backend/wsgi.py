@@ -0,0 +1,14 @@
+# TESTE 4 - ENTRADA WSGI DE PRODUÇÃO
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Carregar todos os dados na importação (processo mestre do gunicorn, antes do fork) e expor `app`
+
+# Bibliotecas
+
+import gc
+
+from main import app, precarregar
+
+# Carga única no mestre; gc.freeze() tira esses objetos das coletas de lixo dos
+# workers, que de outra forma escreveriam nas páginas herdadas e as copiariam
+precarregar()
+gc.freeze()
@@ -0,0 +1,238 @@
+# ESQUEMAS DOS ARQUIVOS ANS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Registro único de tipos, colunas e formato dos CSVs usados em Teste1, Teste2 e Teste4
+
+# Bibliotecas
+
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+# Mesmos marcadores de nulo que o pd.read_csv usa por padrão
+VALORES_NULOS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+                 '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+                 'n/a', 'nan', 'null']
+
+# Esquemas
+#
+# usecols: colunas lidas (as ausentes no arquivo são ignoradas)
+# dtype: tipos explícitos; colunas fora do dtype ficam com o tipo inferido
+# VL_SALDO_FINAL não tem dtype fixo: com decimal=',' vira float64 direto
+# quando o arquivo segue o padrão ANS e cai no to_numeric() da normalização
+# quando há valores fora do padrão
+
+ESQUEMAS = {
+    # Demonstrações contábeis trimestrais (ZIPs do FTP, entrada do Teste 1)
+    'demonstracoes_contabeis': {
+        'sep': ';',
+        'encoding': 'utf-8',
+        'decimal': ',',
+        'usecols': ['REG_ANS', 'CNPJ', 'RazaoSocial', 'Razao_Social', 'VL_SALDO_FINAL'],
+        'dtype': {
+            'REG_ANS': 'Int32',
+            'CNPJ': 'string',
+            'RazaoSocial': 'string',
+            'Razao_Social': 'string',
+        },
+    },
+    # Cadastro de operadoras ativas (Relatorio_cadop.csv / operadoras.csv)
+    'cadop': {
+        'sep': ';',
+        'encoding': 'utf-8',
+        'decimal': '.',
+        'usecols': ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Nome_Fantasia',
+                    'Modalidade', 'UF'],
+        'dtype': {
+            'REGISTRO_OPERADORA': 'Int32',
+            'CNPJ': 'string',
+            'Razao_Social': 'string',
+            'Nome_Fantasia': 'string',
+            'Modalidade': 'category',
+            'UF': 'category',
+        },
+    },
+    # Saída do Teste 1 (consolidado_despesas.csv)
+    'consolidado': {
+        'sep': ';',
+        'encoding': 'utf-8-sig',
+        'decimal': '.',
+        'usecols': ['REG_ANS', 'CNPJ', 'RazaoSocial', 'Ano', 'Trimestre',
+                    'ValorDespesas', 'FlagValorSuspeito', 'FlagDuplicado'],
+        'dtype': {
+            'REG_ANS': 'Int32',
+            'CNPJ': 'string',
+            'RazaoSocial': 'string',
+            'Ano': 'Int16',
+            'Trimestre': 'category',
+            'ValorDespesas': 'float64',
+            'FlagValorSuspeito': 'bool',
+            'FlagDuplicado': 'bool',
+        },
+    },
+    # Saída do Teste 2 (despesas_agregadas.csv)
+    'agregadas': {
+        'sep': ',',
+        'encoding': 'utf-8',
+        'decimal': '.',
+        'usecols': ['RazaoSocial', 'UF', 'TotalDespesas', 'MediaDespesas',
+                    'DesvioPadrao', 'QtdRegistros'],
+        'dtype': {
+            'RazaoSocial': 'string',
+            'UF': 'category',
+            'TotalDespesas': 'float64',
+            'MediaDespesas': 'float64',
+            'DesvioPadrao': 'float64',
+            'QtdRegistros': 'Int32',
+        },
+    },
+    # Cubo do Teste 2 (cubo_despesas.csv): medidas combináveis por célula
+    'cubo': {
+        'sep': ',',
+        'encoding': 'utf-8',
+        'decimal': '.',
+        'usecols': ['RegistroANS', 'RazaoSocial', 'UF', 'Modalidade', 'Ano', 'Trimestre',
+                    'n', 'soma', 'media', 'm2'],
+        'dtype': {
+            'RegistroANS': 'Int32',
+            'RazaoSocial': 'string',
+            'UF': 'category',
+            'Modalidade': 'category',
+            'Ano': 'Int16',
+            'Trimestre': 'category',
+            'n': 'int64',
+            'soma': 'float64',
+            'media': 'float64',
+            'm2': 'float64',
+        },
+    },
+}
+
+# Opções que _ler_csv_pyarrow sabe traduzir; com outras, a leitura vai pelo pandas
+OPCOES_PYARROW = {'sep', 'encoding', 'decimal', 'usecols', 'dtype', 'engine'}
+
+# Funções
+
+
+def _ler_cabecalho(fonte, sep, encoding):
+    """Retorna os nomes das colunas do arquivo sem consumir o stream."""
+    if isinstance(fonte, (str, Path)):
+        with open(fonte, 'r', encoding=encoding, newline='') as arquivo:
+            primeira_linha = arquivo.readline()
+    else:
+        posicao = fonte.tell()
+        primeira_linha = fonte.readline()
+        fonte.seek(posicao)
+        if isinstance(primeira_linha, bytes):
+            primeira_linha = primeira_linha.decode(encoding)
+
+    primeira_linha = primeira_linha.lstrip('\ufeff').rstrip('\r\n')
+    return [coluna.strip().strip('"') for coluna in primeira_linha.split(sep)]
+
+
+def _rebobinar(fonte):
+    if not isinstance(fonte, (str, Path)):
+        fonte.seek(0)
+
+
+def _ler_csv_pyarrow(fonte, argumentos):
+    """
+    Leitura com pyarrow.csv declarando as colunas de texto como string.
+    O engine 'pyarrow' do pandas infere o tipo e só depois aplica o dtype:
+    CNPJ "04439627000102" virava o inteiro 4439627000102 e perdia o zero à esquerda.
+    """
+    tipos = argumentos['dtype']
+    colunas_texto = {coluna: pa.string() for coluna, tipo in tipos.items()
+                     if tipo in ('string', 'category')}
+
+    if isinstance(fonte, Path):
+        fonte = str(fonte)
+
+    tabela = pa_csv.read_csv(
+        fonte,
+        read_options=pa_csv.ReadOptions(encoding=argumentos['encoding']),
+        parse_options=pa_csv.ParseOptions(delimiter=argumentos['sep']),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=argumentos['usecols'],
+            column_types=colunas_texto,
+            decimal_point=argumentos['decimal'],
+            null_values=VALORES_NULOS,
+            strings_can_be_null=True,
+        )
+    )
+    return tabela.to_pandas().astype(tipos)
+
+
+def opcoes_leitura(nome_esquema, colunas_arquivo=None, **opcoes):
+    """
+    Monta os argumentos de pd.read_csv para um esquema.
+    `colunas_arquivo` restringe usecols/dtype às colunas existentes no arquivo.
+    """
+    esquema = ESQUEMAS[nome_esquema]
+
+    usecols = opcoes.pop('usecols', esquema['usecols'])
+    if colunas_arquivo is not None:
+        usecols = [coluna for coluna in usecols if coluna in colunas_arquivo]
+
+    argumentos = {
+        'sep': esquema['sep'],
+        'encoding': esquema['encoding'],
+        'decimal': esquema['decimal'],
+        'usecols': usecols,
+        'dtype': {coluna: tipo for coluna, tipo in esquema['dtype'].items()
+                  if coluna in usecols},
+    }
+    argumentos.update(opcoes)
+
+    if 'engine' not in argumentos:
+        # pyarrow não suporta leitura em chunks
+        usar_pyarrow = PYARROW_DISPONIVEL and 'chunksize' not in argumentos
+        argumentos['engine'] = 'pyarrow' if usar_pyarrow else 'c'
+
+    return argumentos
+
+
+def ler_csv(fonte, nome_esquema, **opcoes):
+    """
+    Lê um CSV da ANS com os tipos do esquema (caminho ou stream binário seekable).
+    Se algum valor não couber no tipo declarado, relê a coluna como texto e
+    converte com to_numeric(errors='coerce'), em vez de falhar o arquivo inteiro.
+    """
+    esquema = ESQUEMAS[nome_esquema]
+    sep = opcoes.get('sep', esquema['sep'])
+    encoding = opcoes.get('encoding', esquema['encoding'])
+
+    colunas_arquivo = _ler_cabecalho(fonte, sep, encoding)
+    argumentos = opcoes_leitura(nome_esquema, colunas_arquivo, **opcoes)
+
+    try:
+        if argumentos['engine'] == 'pyarrow' and set(argumentos) <= OPCOES_PYARROW:
+            return _ler_csv_pyarrow(fonte, argumentos)
+        return pd.read_csv(fonte, **argumentos)
+    except (ValueError, TypeError) as erro:
+        if 'chunksize' in argumentos:
+            raise
+        print(f"  ⚠️ Tipos do esquema '{nome_esquema}' não aplicáveis ({erro}); convertendo coluna a coluna")
+
+    _rebobinar(fonte)
+    tipos = argumentos.pop('dtype')
+    # dtype=str no engine pyarrow também passa pela inferência: relê com o engine C
+    argumentos['engine'] = 'c'
+    df = pd.read_csv(fonte, dtype=str, **argumentos)
+
+    for coluna, tipo in tipos.items():
+        if tipo in ('string', 'category'):
+            df[coluna] = df[coluna].astype(tipo)
+        elif tipo == 'bool':
+            df[coluna] = df[coluna].str.lower().map({'true': True, 'false': False}).fillna(False).astype(bool)
+        else:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype(tipo)
+
+    return df
+
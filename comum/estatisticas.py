@@ -0,0 +1,58 @@
+# ESTATÍSTICAS DAS DESPESAS AGREGADAS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Resumo de despesas_agregadas.csv (total, média, top 5, total por UF) calculado uma vez por versão do arquivo e gravado em um JSON ao lado dele
+
+# Bibliotecas
+
+import json
+import os
+
+from comum.manifesto import hash_arquivo
+
+# Funções
+
+
+def caminho_estatisticas(caminho_agregado):
+    """JSON lateral do CSV agregado (ex.: despesas_agregadas.estatisticas.json)."""
+    return os.path.splitext(caminho_agregado)[0] + '.estatisticas.json'
+
+
+def calcular_estatisticas(agregado):
+    """Mesmos números do /api/estatisticas, a partir de RazaoSocial, UF e TotalDespesas."""
+    agregado = agregado[['RazaoSocial', 'UF', 'TotalDespesas']].copy()
+    agregado['TotalDespesas'] = agregado['TotalDespesas'].fillna(0)
+
+    top5 = agregado.nlargest(5, 'TotalDespesas')[['RazaoSocial', 'TotalDespesas']]
+    return {
+        'total_despesas': float(agregado['TotalDespesas'].sum()),
+        'media_despesas': float(agregado['TotalDespesas'].mean()),
+        'top5_operadoras': top5.astype(object).where(top5.notna(), None).to_dict(orient='records'),
+        # UF como texto (não categórico): mesma ordem das somas, e dos resultados, do cálculo original
+        'uf_despesas': {str(uf): float(total) for uf, total in
+                        agregado.groupby(agregado['UF'].astype(object))['TotalDespesas'].sum().items()},
+    }
+
+
+def salvar_estatisticas(caminho_agregado, agregado):
+    """
+    Grava as estatísticas junto com o SHA-256 do CSV já salvo: quem lê o JSON
+    sabe se ele corresponde ao CSV atual. Escrita atômica.
+    """
+    estatisticas = {'versao': hash_arquivo(caminho_agregado), 'dados': calcular_estatisticas(agregado)}
+
+    caminho = caminho_estatisticas(caminho_agregado)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(estatisticas, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def ler_estatisticas(caminho_agregado, versao):
+    """Estatísticas do JSON lateral se ele for da `versao` (SHA-256) do CSV; senão None."""
+    try:
+        with open(caminho_estatisticas(caminho_agregado), 'r', encoding='utf-8') as arquivo:
+            estatisticas = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    return estatisticas['dados'] if estatisticas.get('versao') == versao else None
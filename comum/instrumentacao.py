@@ -0,0 +1,324 @@
+# INSTRUMENTAÇÃO DAS ETAPAS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Tempo, linhas, bytes lidos/gravados e pico de memória de cada etapa do pipeline em um relatório JSON, com perfil cProfile/tracemalloc opcional e saída silenciosa
+
+# Bibliotecas
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Configurações
+
+# Perfil das etapas de primeiro nível: ANS_PERFIL=cprofile, tracemalloc ou cprofile,tracemalloc
+PERFIL = {modo.strip() for modo in os.environ.get('ANS_PERFIL', '').split(',') if modo.strip()}
+
+# ANS_SILENCIOSO=1: sem os prints de progresso (o relatório JSON continua sendo gravado)
+SILENCIOSO = os.environ.get('ANS_SILENCIOSO', '0') == '1'
+
+FUNCOES_PERFIL = 25
+LINHAS_TRACEMALLOC = 10
+
+# Execução ativa (None: etapa() e @instrumentar não medem nada)
+_execucao = None
+
+# Funções
+
+
+def zerar_pico_rss():
+    """Zera o pico de RSS do processo (Linux: /proc/self/clear_refs); sem efeito em outros sistemas."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as arquivo:
+            arquivo.write('5')
+    except OSError:
+        pass
+
+
+def pico_rss_mb():
+    """Pico de RSS do processo desde o último zerar_pico_rss (VmHWM), em MB; None se indisponível."""
+    try:
+        with open('/proc/self/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+def pico_rss_filhos_mb():
+    """Maior pico de RSS entre os processos filhos já encerrados (ex.: ANS_WORKERS > 1)."""
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+def bytes_io():
+    """(bytes lidos, bytes gravados) pelo processo até agora, incluindo rede (Linux: /proc/self/io)."""
+    try:
+        with open('/proc/self/io') as arquivo:
+            contadores = dict(linha.split(': ') for linha in arquivo.read().splitlines())
+        return int(contadores['rchar']), int(contadores['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _maximo(*valores):
+    valores = [valor for valor in valores if valor is not None]
+    return max(valores) if valores else None
+
+
+def _diferenca(depois, antes):
+    return None if depois is None or antes is None else depois - antes
+
+
+def _contar_linhas(valor):
+    """Linhas de um DataFrame (ou do primeiro DataFrame de uma tupla/lista); None para outros valores."""
+    if isinstance(valor, pd.DataFrame):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        linhas = [len(item) for item in valor if isinstance(item, pd.DataFrame)]
+        return sum(linhas) if linhas else None
+    return None
+
+
+class Etapa:
+    """
+    Medidas acumuladas de uma etapa: a mesma etapa chamada várias vezes (ex.:
+    leitura de cada arquivo) soma tempo, linhas e bytes; o pico é o maior.
+    `pai` é a etapa em que ela estava aninhada na primeira chamada.
+    """
+
+    def __init__(self, nome, pai):
+        self.nome = nome
+        self.pai = pai
+        self.chamadas = 0
+        self.duracao_s = 0.0
+        self.linhas_entrada = None
+        self.linhas_saida = None
+        self.bytes_lidos = None
+        self.bytes_gravados = None
+        self.pico_rss_mb = None
+        self.pico_python_mb = None
+        self.erro = None
+        self.perfil = None
+        self.alocacoes = None
+
+    def linhas(self, entrada=None, saida=None):
+        """Soma linhas de entrada/saída (para etapas que não recebem/devolvem um DataFrame)."""
+        if entrada is not None:
+            self.linhas_entrada = (self.linhas_entrada or 0) + entrada
+        if saida is not None:
+            self.linhas_saida = (self.linhas_saida or 0) + saida
+
+    def como_dict(self):
+        return {chave: (round(valor, 6) if isinstance(valor, float) else valor)
+                for chave, valor in vars(self).items()
+                if not chave.startswith('_') and (valor is not None or chave in ('linhas_entrada', 'linhas_saida'))}
+
+
+class _SemMedicao:
+    """Etapa usada fora de uma execução: aceita as mesmas chamadas e não guarda nada."""
+
+    def linhas(self, entrada=None, saida=None):
+        pass
+
+
+class Execucao:
+    """
+    Uma execução do pipeline: enquanto ativa (bloco `with`), etapa() e
+    @instrumentar medem cada etapa; na saída, grava o relatório JSON em
+    `caminho_relatorio` (e os .prof do cProfile ao lado dele).
+    """
+
+    def __init__(self, pipeline, caminho_relatorio, configuracao=None, perfil=None):
+        self.pipeline = pipeline
+        self.caminho_relatorio = Path(caminho_relatorio)
+        self.configuracao = configuracao or {}
+        self.perfil = set(PERFIL if perfil is None else perfil)
+        self.etapas = {}
+        self._pilha = []  # [etapa, pico parcial de RSS, pico parcial do tracemalloc]
+        self._inicio = None
+        self._data = None
+        self._pico_rss = None
+
+    def __enter__(self):
+        global _execucao
+        _execucao = self
+        self._data = datetime.now()
+        self._inicio = time.perf_counter()
+        zerar_pico_rss()
+        if 'tracemalloc' in self.perfil and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, tipo, erro, rastreamento):
+        global _execucao
+        _execucao = None
+        self._pico_rss = _maximo(self._pico_rss, pico_rss_mb())
+        relatorio = self.relatorio(time.perf_counter() - self._inicio, erro)
+        if 'tracemalloc' in self.perfil:
+            tracemalloc.stop()
+        self.salvar(relatorio)
+        return False
+
+    def _picos_abertos(self):
+        """Antes de zerar os picos para uma etapa aninhada, guarda o pico atual nas etapas abertas."""
+        rss = pico_rss_mb()
+        python = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if tracemalloc.is_tracing() else None
+        for aberta in self._pilha:
+            aberta[1] = _maximo(aberta[1], rss)
+            aberta[2] = _maximo(aberta[2], python)
+        self._pico_rss = _maximo(self._pico_rss, rss)
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        pai = self._pilha[-1][0].nome if self._pilha else None
+        atual = self.etapas.setdefault(nome, Etapa(nome, pai))
+        atual.chamadas += 1
+        atual.linhas(entrada=linhas_entrada)
+
+        self._picos_abertos()
+        zerar_pico_rss()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        # Perfil só nas etapas de primeiro nível (o cProfile não pode ser aninhado)
+        perfilador = cProfile.Profile() if 'cprofile' in self.perfil and not self._pilha else None
+        instantaneo = tracemalloc.take_snapshot() if tracemalloc.is_tracing() and not self._pilha else None
+
+        self._pilha.append([atual, None, None])
+        lidos, gravados = bytes_io()
+        inicio = time.perf_counter()
+        if perfilador:
+            perfilador.enable()
+        try:
+            yield atual
+        except BaseException as erro:
+            atual.erro = f"{type(erro).__name__}: {erro}"
+            raise
+        finally:
+            if perfilador:
+                perfilador.disable()
+            atual.duracao_s += time.perf_counter() - inicio
+            lidos_depois, gravados_depois = bytes_io()
+            for atributo, valor in (('bytes_lidos', _diferenca(lidos_depois, lidos)),
+                                    ('bytes_gravados', _diferenca(gravados_depois, gravados))):
+                if valor is not None:
+                    setattr(atual, atributo, (getattr(atual, atributo) or 0) + valor)
+
+            _, pico_rss, pico_python = self._pilha.pop()
+            pico_rss = _maximo(pico_rss, pico_rss_mb())
+            if tracemalloc.is_tracing():
+                pico_python = _maximo(pico_python, tracemalloc.get_traced_memory()[1] / 1024 ** 2)
+            atual.pico_rss_mb = _maximo(atual.pico_rss_mb, pico_rss)
+            atual.pico_python_mb = _maximo(atual.pico_python_mb, pico_python)
+            # O pico da etapa aninhada também é pico das etapas que a contêm
+            for aberta in self._pilha:
+                aberta[1] = _maximo(aberta[1], pico_rss)
+                aberta[2] = _maximo(aberta[2], pico_python)
+            self._pico_rss = _maximo(self._pico_rss, pico_rss)
+
+            if perfilador:
+                self._registrar_perfil(atual, perfilador)
+            if instantaneo is not None:
+                diferencas = tracemalloc.take_snapshot().compare_to(instantaneo, 'lineno')
+                atual.alocacoes = [{'linha': str(diferenca.traceback[0]),
+                                    'mb': round(diferenca.size_diff / 1024 ** 2, 3),
+                                    'blocos': diferenca.count_diff}
+                                   for diferenca in diferencas[:LINHAS_TRACEMALLOC]]
+
+    def _registrar_perfil(self, etapa, perfilador):
+        """Grava <relatório>.<etapa>.prof (para snakeviz/pstats) e guarda as funções com mais tempo próprio."""
+        self.caminho_relatorio.parent.mkdir(parents=True, exist_ok=True)
+        caminho = self.caminho_relatorio.with_suffix(f".{etapa.nome}.prof")
+        perfilador.dump_stats(caminho)
+
+        estatisticas = pstats.Stats(perfilador, stream=io.StringIO())
+        funcoes = sorted(estatisticas.stats.items(), key=lambda item: item[1][2], reverse=True)
+        etapa.perfil = {
+            'arquivo': str(caminho),
+            'funcoes': [{'funcao': f"{arquivo}:{linha}({nome})", 'chamadas': chamadas,
+                         'tempo_proprio_s': round(proprio, 6), 'tempo_acumulado_s': round(acumulado, 6)}
+                        for (arquivo, linha, nome), (_, chamadas, proprio, acumulado, _)
+                        in funcoes[:FUNCOES_PERFIL]],
+        }
+
+    def relatorio(self, duracao, erro=None):
+        return {
+            'pipeline': self.pipeline,
+            'inicio': self._data.isoformat(timespec='seconds'),
+            'duracao_s': round(duracao, 6),
+            'status': 'ok' if erro is None else 'erro',
+            'erro': None if erro is None else f"{type(erro).__name__}: {erro}",
+            'pico_rss_mb': None if self._pico_rss is None else round(self._pico_rss, 1),
+            'pico_rss_filhos_mb': pico_rss_filhos_mb(),
+            'perfil': sorted(self.perfil),
+            'configuracao': self.configuracao,
+            'etapas': [etapa.como_dict() for etapa in self.etapas.values()],
+        }
+
+    def salvar(self, relatorio):
+        """Grava o relatório de forma atômica."""
+        self.caminho_relatorio.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho_relatorio.with_suffix('.json.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, self.caminho_relatorio)
+
+
+@contextmanager
+def etapa(nome, linhas_entrada=None):
+    """Mede o bloco como a etapa `nome` da execução ativa; sem execução ativa, não faz nada."""
+    if _execucao is None:
+        yield _SemMedicao()
+        return
+    with _execucao.etapa(nome, linhas_entrada) as atual:
+        yield atual
+
+
+def instrumentar(nome):
+    """
+    Decorador: mede cada chamada como a etapa `nome`. Linhas de entrada = o
+    primeiro argumento DataFrame; de saída = o DataFrame devolvido (ou o
+    primeiro de uma tupla, como em (df, manifesto)).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def instrumentada(*args, **kwargs):
+            if _execucao is None:
+                return funcao(*args, **kwargs)
+            entrada = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+            with _execucao.etapa(nome, entrada) as atual:
+                resultado = funcao(*args, **kwargs)
+                saida = _contar_linhas(resultado[0] if isinstance(resultado, tuple) else resultado)
+                atual.linhas(saida=saida)
+                return resultado
+        return instrumentada
+    return decorador
+
+
+@contextmanager
+def silenciar(ativo=SILENCIOSO):
+    """Descarta os prints de progresso quando `ativo` (ANS_SILENCIOSO=1); erros no stderr continuam visíveis."""
+    if not ativo:
+        yield
+        return
+    with open(os.devnull, 'w', encoding='utf-8') as nulo, redirect_stdout(nulo):
+        yield
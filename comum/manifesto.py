@@ -0,0 +1,72 @@
+# MANIFESTO DE EXECUÇÃO
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Impressões digitais (hash/tamanho) das entradas para reprocessar só o que mudou
+
+# Bibliotecas
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Configurações
+
+TAMANHO_BLOCO_HASH = 4 * 1024 * 1024
+
+# Funções
+
+
+def hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def impressao_digital(caminho, anterior=None):
+    """
+    Retorna {'sha256', 'tamanho', 'mtime_ns'} do arquivo.
+    Se tamanho e mtime batem com a impressão `anterior`, reaproveita o hash
+    em vez de reler o arquivo inteiro.
+    """
+    info = os.stat(caminho)
+    digital = {'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+    if (anterior and anterior.get('tamanho') == info.st_size
+            and anterior.get('mtime_ns') == info.st_mtime_ns and anterior.get('sha256')):
+        digital['sha256'] = anterior['sha256']
+    else:
+        digital['sha256'] = hash_arquivo(caminho)
+
+    return digital
+
+
+def hash_dataframe(df):
+    """Hash do conteúdo de um DataFrame (valores e ordem das linhas)."""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    sha = hashlib.sha256(hashes.tobytes())
+    sha.update(','.join(df.columns).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def carregar_manifesto(caminho):
+    """Lê o manifesto JSON (vazio se não existir ou estiver corrompido)."""
+    caminho = Path(caminho)
+    if not caminho.exists():
+        return {}
+    try:
+        return json.loads(caminho.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_manifesto(caminho, manifesto):
+    """Grava o manifesto de forma atômica (arquivo temporário + replace)."""
+    caminho = Path(caminho)
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    temporario.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding='utf-8')
+    temporario.replace(caminho)
@@ -0,0 +1,97 @@
+# DATASETS PARQUET
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Escrita particionada e leitura com pushdown de colunas/predicados (pyarrow opcional)
+
+# Bibliotecas
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from comum.esquemas import ESQUEMAS
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# Configurações
+
+LINHAS_POR_ROW_GROUP = 128 * 1024
+# Posição de cada linha no CSV de origem (a escrita ordena, a leitura desfaz)
+COLUNA_LINHA = '_linha'
+
+# Funções
+
+
+def limpar_dataset(pasta):
+    """Remove um dataset anterior para que a escrita incremental recomece do zero."""
+    pasta = Path(pasta)
+    if pasta.exists():
+        shutil.rmtree(pasta)
+
+
+def escrever_particionado(df, pasta, particoes, nome_base, ordenar_por=None, primeira_linha=None):
+    """
+    Grava `df` como Parquet particionado (estilo hive: Ano=2025/Trimestre=1T).
+    Pode ser chamada várias vezes com `nome_base` diferentes (ex.: um por chunk).
+    Ordenar por `ordenar_por` deixa as estatísticas dos row groups seletivas.
+    Com `primeira_linha` (posição de df no arquivo de origem), grava também a
+    coluna COLUNA_LINHA para que ler_parquet devolva as linhas na ordem original.
+    """
+    if primeira_linha is not None:
+        df = df.assign(**{COLUNA_LINHA: np.arange(primeira_linha, primeira_linha + len(df), dtype='int64')})
+    if ordenar_por:
+        df = df.sort_values(ordenar_por, kind='stable')
+
+    # Sem metadados do pandas: os tipos são reaplicados na leitura pelo esquema
+    tabela = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    esquema_particoes = pa.schema([tabela.schema.field(coluna) for coluna in particoes])
+
+    ds.write_dataset(
+        tabela,
+        base_dir=str(pasta),
+        format='parquet',
+        partitioning=ds.partitioning(esquema_particoes, flavor='hive'),
+        basename_template=f"{nome_base}-{{i}}.parquet",
+        max_rows_per_group=LINHAS_POR_ROW_GROUP,
+        max_rows_per_file=0,
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='snappy')
+    )
+
+
+def ler_parquet(pasta, nome_esquema, colunas=None, filtros=None):
+    """
+    Lê um dataset Parquet lendo só `colunas` e só os arquivos/row groups que
+    podem satisfazer `filtros` (lista de tuplas no formato do pandas/pyarrow).
+    Aplica os tipos e a ordem de colunas do esquema e, se o dataset tiver
+    COLUNA_LINHA, devolve as linhas na ordem do arquivo de origem.
+    """
+    esquema = ESQUEMAS[nome_esquema]
+    if colunas is None:
+        colunas = esquema['usecols']
+
+    com_linha = COLUNA_LINHA in ds.dataset(str(pasta), format='parquet', partitioning='hive').schema.names
+    df = pd.read_parquet(pasta, engine='pyarrow', filters=filtros,
+                         columns=colunas + [COLUNA_LINHA] if com_linha else colunas)
+    if com_linha:
+        df = df.sort_values(COLUNA_LINHA, kind='stable').reset_index(drop=True)
+
+    tipos = {coluna: tipo for coluna, tipo in esquema['dtype'].items() if coluna in df.columns}
+    # Colunas de partição voltam como dictionary/int32: converte via texto
+    for coluna in ['Ano', 'Trimestre']:
+        if coluna in tipos and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype(str)
+    df = df.astype(tipos)
+
+    return df[[coluna for coluna in colunas if coluna in df.columns]]
+
+
+def dataset_disponivel(pasta):
+    """True se pyarrow está instalado e o dataset existe."""
+    return PARQUET_DISPONIVEL and Path(pasta).is_dir() and any(Path(pasta).rglob('*.parquet'))
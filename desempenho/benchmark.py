@@ -0,0 +1,265 @@
+# BENCHMARK DO PIPELINE E DA API
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Medir tempo, throughput e pico de memória de cada etapa (Testes 1, 2 e 4) sobre os dados sintéticos e gravar o resultado em JSON para comparar commits
+
+# Bibliotecas
+
+import gc
+import importlib.util
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comum.esquemas import ler_csv
+from comum.instrumentacao import pico_rss_mb, zerar_pico_rss
+from gerar_dados import ESCALA, gerar_dados, pasta_escala
+
+# Configurações
+
+PASTA_DESEMPENHO = Path(__file__).resolve().parent
+PASTA_RAIZ = PASTA_DESEMPENHO.parent
+PASTA_RESULTADOS = PASTA_DESEMPENHO / 'resultados'
+
+REPETICOES = int(os.environ.get('ANS_REPETICOES', '3'))
+
+# Requisições por rota da API em cada repetição
+REQUISICOES = int(os.environ.get('ANS_REQUISICOES', '200'))
+
+# Resultado anterior (JSON) para comparar ao final
+COMPARAR_COM = os.environ.get('ANS_COMPARAR_COM')
+
+# Funções
+
+
+def carregar_modulo(nome, caminho):
+    """
+    Importa um main.py com outro nome (os Testes 1, 2 e 4 têm todos um
+    main.py); a pasta dele entra no sys.path para os módulos vizinhos.
+    """
+    sys.path.insert(0, str(caminho.parent))
+    spec = importlib.util.spec_from_file_location(nome, caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def versao_codigo():
+    """Commit atual e se há alterações não commitadas (None fora de um repositório git)."""
+    def git(*argumentos):
+        return subprocess.run(['git', *argumentos], cwd=PASTA_RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', 'HEAD'), 'alteracoes_locais': bool(git('status', '--porcelain'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'alteracoes_locais': None}
+
+
+def ambiente():
+    try:
+        import pyarrow
+        versao_pyarrow = pyarrow.__version__
+    except ImportError:
+        versao_pyarrow = None
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'pyarrow': versao_pyarrow, 'sistema': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def medir(resultados, nome, funcao, linhas=None, preparar=None, unidade='linhas'):
+    """
+    Executa `funcao(*preparar())` REPETICOES vezes (saída do print descartada)
+    e registra os tempos, a mediana, o throughput (`linhas` por segundo; pode
+    ser uma função do resultado) e o pico de RSS do processo durante a etapa.
+    Retorna o resultado da última execução.
+    """
+    tempos = []
+    picos = []
+    for _ in range(REPETICOES):
+        argumentos = preparar() if preparar else ()
+        gc.collect()
+        zerar_pico_rss()
+        inicio = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            resultado = funcao(*argumentos)
+        tempos.append(time.perf_counter() - inicio)
+        picos.append(pico_rss_mb())
+
+    mediana = statistics.median(tempos)
+    if callable(linhas):
+        linhas = linhas(resultado)
+    registro = {
+        'etapa': nome,
+        'repeticoes': REPETICOES,
+        'tempos_s': [round(tempo, 6) for tempo in tempos],
+        'mediana_s': round(mediana, 6),
+        'minimo_s': round(min(tempos), 6),
+        unidade: linhas,
+        f'{unidade}_por_s': round(linhas / mediana, 1) if linhas else None,
+        'pico_rss_mb': round(max(picos), 1) if None not in picos else None,
+    }
+    resultados.append(registro)
+
+    vazao = f", {registro[f'{unidade}_por_s']:,.0f} {unidade}/s" if linhas else ''
+    print(f"  ⏱️  {nome}: {mediana:.3f} s{vazao}, pico RSS {registro['pico_rss_mb']} MB")
+    return resultado
+
+
+def medir_pipeline(resultados, pasta, temporaria):
+    """Etapas dos Testes 1 e 2: leitura dos ZIPs, normalização, flags, enriquecimento, validação e agregação."""
+    teste1 = carregar_modulo('teste1_main', PASTA_RAIZ / 'Teste1' / 'main.py')
+    teste2 = carregar_modulo('teste2_main', PASTA_RAIZ / 'Teste2' / 'main.py')
+
+    print("🔧 Pipeline")
+    membros = [teste1.MembroZip(caminho, caminho.stem + '.csv')
+               for caminho in sorted((pasta / 'downloads').glob('*.zip'))]
+
+    lidos = medir(resultados, 'teste1.processar_arquivo',
+                  lambda: [teste1.processar_arquivo(membro) for membro in membros],
+                  lambda lidos: sum(len(df) for df in lidos))
+    total = resultados[-1]['linhas']
+
+    def normalizar():
+        for membro, df in zip(membros, lidos):
+            df['arquivo_origem'] = membro.name
+        return pd.concat([teste1.normalizar_colunas(df, exibir=False) for df in lidos], ignore_index=True)
+    normalizado = medir(resultados, 'teste1.normalizar_colunas', normalizar, total)
+
+    medir(resultados, 'teste1.flags', lambda: teste1.detectar_duplicatas_suspeitas(
+        teste1.marcar_valores_suspeitos(normalizado, exibir=False), exibir=False), total)
+    del lidos, normalizado
+
+    consolidado = ler_csv(pasta / 'consolidado_despesas.csv', 'consolidado')
+    cadastro = ler_csv(pasta / 'Relatorio_cadop.csv', 'cadop')
+
+    enriquecido = medir(resultados, 'teste2.enriquecer_dados',
+                        lambda: teste2.enriquecer_dados(consolidado, cadastro), len(consolidado))
+
+    # Cache de validação vazio a cada repetição: mede a validação completa, sem acertos de cache
+    caches = itertools.count()
+
+    def cache_vazio():
+        teste2.CAMINHO_CACHE_VALIDACAO = os.path.join(temporaria, f"cache_validacao_{next(caches)}.json")
+        return (enriquecido.copy(),)
+    validado = medir(resultados, 'teste2.aplicar_validacao',
+                     lambda df: teste2.aplicar_validacao(df, exibir=False), len(enriquecido), cache_vazio)
+
+    agregado = medir(resultados, 'teste2.agregar_dados', lambda: teste2.agregar_dados(validado), len(validado))
+    return agregado
+
+
+def medir_api(resultados, pasta, agregado, temporaria):
+    """Carga dos dados da API e requisições por rota (Flask test client, um processo)."""
+    caminho_agregado = os.path.join(temporaria, 'despesas_agregadas.csv')
+    agregado.to_csv(caminho_agregado, index=False)
+
+    api = carregar_modulo('teste4_main', PASTA_RAIZ / 'Teste4' / 'backend' / 'main.py')
+    dados = sys.modules['dados']
+
+    print("🌐 API")
+    medir(resultados, 'api.carregar_operadoras',
+          lambda: dados.carregar_operadoras(str(pasta / 'Relatorio_cadop.csv')), len)
+    medir(resultados, 'api.carregar_historico',
+          lambda: dados.carregar_historico(str(pasta / 'consolidado_despesas.csv')), len)
+
+    api.configurar(operadoras_csv=str(pasta / 'Relatorio_cadop.csv'),
+                   despesas_csv=str(pasta / 'consolidado_despesas.csv'),
+                   despesas_parquet=os.path.join(temporaria, 'sem_parquet'),
+                   agregadas_csv=caminho_agregado)
+    with redirect_stdout(io.StringIO()):
+        api.precarregar()
+
+    # Operadora com o maior histórico: o pior caso da rota de despesas
+    indice = api.operadoras.obter()
+    historico = api.despesas.obter()
+    tamanhos = np.diff(historico.inicios)
+    cnpj = next(indice.registros[indice.por_reg_ans[reg_ans]]['CNPJ']
+                for reg_ans in historico.chaves[np.argsort(-tamanhos)].tolist() if reg_ans in indice.por_reg_ans)
+
+    cliente = api.app.test_client()
+    rotas = {
+        'api.lista': '/api/operadoras?page=1&limit=10',
+        'api.lista_profunda': f'/api/operadoras?page={max(len(indice) // 10, 1)}&limit=10',
+        'api.busca': '/api/operadoras?search=saude&limit=10',
+        'api.cursor': '/api/operadoras?after=&limit=10',
+        'api.detalhe': f'/api/operadoras/{cnpj}',
+        'api.despesas': f'/api/operadoras/{cnpj}/despesas',
+        'api.estatisticas': '/api/estatisticas',
+    }
+    for nome, url in rotas.items():
+        def requisitar(url=url):
+            for _ in range(REQUISICOES):
+                resposta = cliente.get(url)
+                resposta.get_data()
+                assert resposta.status_code == 200, (url, resposta.status_code)
+        medir(resultados, nome, requisitar, REQUISICOES, unidade='requisicoes')
+
+
+def comparar(base, atual):
+    """Tabela mediana anterior → atual por etapa (razão < 1 = mais rápido)."""
+    anteriores = {etapa['etapa']: etapa for etapa in base['etapas']}
+    print(f"📊 Comparação com {(base['codigo']['commit'] or '?')[:10]} (x{base['escala']:g})")
+    for etapa in atual['etapas']:
+        anterior = anteriores.get(etapa['etapa'])
+        if anterior is None:
+            print(f"  🆕 {etapa['etapa']}: {etapa['mediana_s']:.3f} s")
+            continue
+        razao = etapa['mediana_s'] / anterior['mediana_s'] if anterior['mediana_s'] else float('inf')
+        simbolo = '🟢' if razao < 0.95 else '🔴' if razao > 1.05 else '⚪'
+        print(f"  {simbolo} {etapa['etapa']}: {anterior['mediana_s']:.3f} s → {etapa['mediana_s']:.3f} s ({razao:.2f}x)")
+    print()
+
+
+def executar(escala=ESCALA):
+    """Gera os dados da escala (se ainda não existirem), mede todas as etapas e grava o JSON."""
+    pasta = pasta_escala(escala)
+    if not (pasta / 'consolidado_despesas.csv').exists():
+        gerar_dados(escala, pasta)
+
+    print("=" * 60)
+    print(f"BENCHMARK x{escala:g} ({REPETICOES} repetições)")
+    print("=" * 60)
+    print()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as temporaria:
+        agregado = medir_pipeline(resultados, pasta, temporaria)
+        medir_api(resultados, pasta, agregado, temporaria)
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'escala': escala,
+        'codigo': versao_codigo(),
+        'ambiente': ambiente(),
+        'etapas': resultados,
+    }
+
+    PASTA_RESULTADOS.mkdir(exist_ok=True)
+    commit = (relatorio['codigo']['commit'] or 'sem-git')[:10]
+    caminho = PASTA_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}-x{escala:g}.json"
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"\n💾 {caminho}\n")
+
+    if COMPARAR_COM:
+        with open(COMPARAR_COM, 'r', encoding='utf-8') as arquivo:
+            comparar(json.load(arquivo), relatorio)
+    return relatorio
+
+
+if __name__ == '__main__':
+    executar()
@@ -0,0 +1,359 @@
+# TESTE DE CARGA DA API
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Reproduzir o tráfego do frontend (App.vue) contra a API rodando localmente, com concorrência configurável, e medir throughput e percentis de latência por rota
+
+# Bibliotecas
+
+import gzip
+import http.client
+import importlib.util
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comum.esquemas import ler_csv
+from benchmark import PASTA_RAIZ, PASTA_RESULTADOS, ambiente, carregar_modulo, versao_codigo
+from gerar_dados import ESCALA, SEMENTE, gerar_dados, pasta_escala
+
+# Configurações
+
+PASTA_BACKEND = PASTA_RAIZ / 'Teste4' / 'backend'
+
+# Usuários virtuais simultâneos (cada um repete visitas ao dashboard sem parar)
+CONCORRENCIA = int(os.environ.get('ANS_CONCORRENCIA', '8'))
+
+# Segundos medidos, depois de um aquecimento que não entra no resultado
+DURACAO = float(os.environ.get('ANS_DURACAO', '30'))
+AQUECIMENTO = float(os.environ.get('ANS_AQUECIMENTO', '3'))
+
+# Pausa entre as ações de um usuário (0 = carga máxima)
+PAUSA_MS = float(os.environ.get('ANS_PAUSA_MS', '0'))
+
+# URL de uma API já rodando; sem ela, o servidor é iniciado localmente com os dados sintéticos
+ALVO = os.environ.get('ANS_ALVO')
+
+# Servidor local: gunicorn (gunicorn.conf.py, workers = ANS_WORKERS) ou o servidor do Flask (com threads)
+GUNICORN_DISPONIVEL = sys.platform != 'win32' and importlib.util.find_spec('gunicorn') is not None
+SERVIDOR = os.environ.get('ANS_SERVIDOR', 'gunicorn' if GUNICORN_DISPONIVEL else 'flask')
+
+# Resultado anterior do teste de carga (JSON) para comparar ao final
+COMPARAR_COM = os.environ.get('ANS_COMPARAR_COM')
+
+# Mix de uma visita, como o App.vue: lista e estatísticas ao abrir; depois busca
+# (uma requisição por tecla, sem debounce) ou algumas páginas; cliques em Detalhes
+# (detalhe e despesas em sequência) sobre a lista que está na tela
+LIMITE_PAGINA = 10
+PROBABILIDADE_BUSCA = 0.6
+MAXIMO_TECLAS = 8
+MAXIMO_PAGINAS = 3
+MAXIMO_CLIQUES = 2
+
+# Só gzip: o cliente descomprime apenas gzip (com brotli instalado, o servidor mandaria br)
+CABECALHOS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+
+PERCENTIS = [50, 90, 99]
+
+# Ordem das rotas no resultado
+ROTAS = ['lista', 'busca', 'detalhe', 'despesas', 'estatisticas']
+
+# Funções
+
+
+def sem_acentos(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+
+def porta_livre():
+    with socket.socket() as soquete:
+        soquete.bind(('127.0.0.1', 0))
+        return soquete.getsockname()[1]
+
+
+def preparar_dados(pasta):
+    """
+    Arquivos da API na pasta dos dados sintéticos: o cadastro e o consolidado
+    já existem; despesas_agregadas.csv é gerado uma vez pelo Teste 2.
+    """
+    if not (pasta / 'consolidado_despesas.csv').exists():
+        gerar_dados(ESCALA, pasta)
+
+    caminho_agregado = pasta / 'despesas_agregadas.csv'
+    if not caminho_agregado.exists():
+        print("🔧 despesas_agregadas.csv (Teste 2)")
+        teste2 = carregar_modulo('teste2_main', PASTA_RAIZ / 'Teste2' / 'main.py')
+        consolidado = ler_csv(pasta / 'consolidado_despesas.csv', 'consolidado')
+        cadastro = ler_csv(pasta / 'Relatorio_cadop.csv', 'cadop')
+        with tempfile.TemporaryDirectory() as temporaria, redirect_stdout(io.StringIO()):
+            teste2.CAMINHO_CACHE_VALIDACAO = os.path.join(temporaria, 'cache_validacao.json')
+            validado = teste2.aplicar_validacao(teste2.enriquecer_dados(consolidado, cadastro), exibir=False)
+            teste2.agregar_dados(validado).to_csv(caminho_agregado, index=False)
+
+    return {
+        'ANS_OPERADORAS_CSV': str(pasta / 'Relatorio_cadop.csv'),
+        'ANS_DESPESAS_CSV': str(pasta / 'consolidado_despesas.csv'),
+        'ANS_DESPESAS_PARQUET': str(pasta / 'sem_parquet'),
+        'ANS_AGREGADAS_CSV': str(caminho_agregado),
+    }
+
+
+def iniciar_servidor(variaveis, log):
+    """Sobe a API em outro processo (o gerador de carga não divide o GIL com ela) e espera /api/pronto."""
+    porta = porta_livre()
+    ambiente_servidor = {**os.environ, **variaveis, 'ANS_RECARREGAR': '0'}
+    if SERVIDOR == 'gunicorn':
+        ambiente_servidor['ANS_BIND'] = f'127.0.0.1:{porta}'
+        comando = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    else:
+        comando = [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run', '--host', '127.0.0.1',
+                   '--port', str(porta), '--with-threads']
+
+    processo = subprocess.Popen(comando, cwd=PASTA_BACKEND, env=ambiente_servidor,
+                                stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{porta}'
+    limite = time.monotonic() + 120
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Servidor encerrou ao iniciar (código {processo.returncode}); ver {log.name}")
+        try:
+            if Cliente(url).get('/api/pronto')[0] == 200:
+                return processo, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    parar_servidor(processo)
+    raise RuntimeError(f"Servidor não ficou pronto em 120 s; ver {log.name}")
+
+
+def parar_servidor(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+class Cliente:
+    """Conexão HTTP de um usuário virtual (reaberta quando o servidor a fecha)."""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=60)
+
+    def get(self, caminho, etag=None):
+        """(status, corpo descomprimido, ETag) da requisição; com `etag`, envia If-None-Match."""
+        cabecalhos = {**CABECALHOS, 'If-None-Match': etag} if etag else CABECALHOS
+        try:
+            self.conexao.request('GET', caminho, headers=cabecalhos)
+            resposta = self.conexao.getresponse()
+            corpo = resposta.read()
+        except (http.client.HTTPException, OSError):
+            self.conexao.close()
+            raise
+        if resposta.getheader('Content-Encoding') == 'gzip':
+            corpo = gzip.decompress(corpo)
+        return resposta.status, corpo, resposta.getheader('ETag')
+
+
+def termos_busca(url):
+    """Palavras das razões sociais do cadastro (sem acento, minúsculas), para simular a digitação."""
+    status, corpo, _ = Cliente(url).get('/api/operadoras?after=&limit=1000&fields=Razao_Social&count=none')
+    if status != 200:
+        raise RuntimeError(f"/api/operadoras respondeu {status}")
+    palavras = {sem_acentos(palavra).lower()
+                for item in json.loads(corpo)['data'] for palavra in (item['Razao_Social'] or '').split()}
+    return sorted(palavra for palavra in palavras if len(palavra) >= 4 and palavra.isalpha()) or ['saude']
+
+
+class UsuarioVirtual(threading.Thread):
+    """
+    Repete visitas ao dashboard até `fim`, anotando (rota, início, latência,
+    status) de cada requisição. Como o navegador, guarda o ETag de cada URL
+    e revalida com If-None-Match (as estatísticas voltam 304 sem corpo).
+    """
+
+    def __init__(self, url, termos, semente, fim):
+        super().__init__(daemon=True)
+        self.cliente = Cliente(url)
+        self.termos = termos
+        self.aleatorio = random.Random(semente)
+        self.fim = fim
+        self.medidas = []
+        self.operadoras = []
+        self.etags = {}
+
+    def requisitar(self, rota, caminho):
+        inicio = time.perf_counter()
+        try:
+            status, corpo, etag = self.cliente.get(caminho, self.etags.get(caminho))
+            if etag:
+                self.etags[caminho] = etag
+        except (http.client.HTTPException, OSError):
+            status, corpo = 0, b''
+        self.medidas.append((rota, inicio, time.perf_counter() - inicio, status))
+        if PAUSA_MS:
+            time.sleep(PAUSA_MS / 1000)
+        return status, corpo
+
+    def listar(self, rota, pagina, busca=''):
+        caminho = f'/api/operadoras?page={pagina}&limit={LIMITE_PAGINA}'
+        if busca:
+            caminho += f'&search={quote(busca)}'
+        status, corpo = self.requisitar(rota, caminho)
+        if status == 200:
+            self.operadoras = [item['CNPJ'] for item in json.loads(corpo)['data']]
+
+    def visita(self):
+        self.listar('lista', 1)
+        self.requisitar('estatisticas', '/api/estatisticas')
+
+        if self.aleatorio.random() < PROBABILIDADE_BUSCA:
+            termo = self.aleatorio.choice(self.termos)[:MAXIMO_TECLAS]
+            for tamanho in range(1, len(termo) + 1):
+                self.listar('busca', 1, termo[:tamanho])
+        else:
+            for pagina in range(2, self.aleatorio.randint(2, MAXIMO_PAGINAS + 1) + 1):
+                self.listar('lista', pagina)
+
+        for _ in range(self.aleatorio.randint(0, MAXIMO_CLIQUES)):
+            if not self.operadoras:
+                break
+            cnpj = quote(self.aleatorio.choice(self.operadoras) or '', safe='')
+            self.requisitar('detalhe', f'/api/operadoras/{cnpj}')
+            self.requisitar('despesas', f'/api/operadoras/{cnpj}/despesas')
+
+    def run(self):
+        while time.perf_counter() < self.fim:
+            self.visita()
+
+
+def resumir(medidas, duracao):
+    """Throughput, erros e percentis de latência (ms) por rota e no total."""
+    por_rota = {rota: [] for rota in ROTAS}
+    for rota, _, latencia, status in medidas:
+        por_rota[rota].append((latencia, status))
+    por_rota['total'] = [(latencia, status) for _, _, latencia, status in medidas]
+
+    resumo = {}
+    for rota, valores in por_rota.items():
+        if not valores:
+            continue
+        latencias = np.array([latencia for latencia, _ in valores]) * 1000
+        erros = sum(1 for _, status in valores if not 200 <= status < 400)
+        resumo[rota] = {
+            'requisicoes': len(valores),
+            'erros': erros,
+            'requisicoes_por_s': round(len(valores) / duracao, 1),
+            **{f'p{percentil}_ms': round(float(np.percentile(latencias, percentil)), 3) for percentil in PERCENTIS},
+            'media_ms': round(float(latencias.mean()), 3),
+            'maximo_ms': round(float(latencias.max()), 3),
+        }
+    return resumo
+
+
+def exibir(resumo):
+    print(f"  {'rota':<14}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'erros':>8}")
+    for rota, valores in resumo.items():
+        print(f"  {rota:<14}{valores['requisicoes_por_s']:>10,.1f}{valores['p50_ms']:>10.2f}"
+              f"{valores['p90_ms']:>10.2f}{valores['p99_ms']:>10.2f}{valores['maximo_ms']:>10.2f}{valores['erros']:>8}")
+    print()
+
+
+def comparar(base, atual):
+    """Throughput e p99 anteriores → atuais por rota (razão de p99 < 1 = mais rápido)."""
+    print(f"📊 Comparação com {(base['codigo']['commit'] or '?')[:10]} ({base['servidor']}, "
+          f"{base['concorrencia']} usuários)")
+    for rota, valores in atual['rotas'].items():
+        anterior = base['rotas'].get(rota)
+        if anterior is None:
+            continue
+        razao = valores['p99_ms'] / anterior['p99_ms'] if anterior['p99_ms'] else float('inf')
+        simbolo = '🟢' if razao < 0.95 else '🔴' if razao > 1.05 else '⚪'
+        print(f"  {simbolo} {rota}: {anterior['requisicoes_por_s']:,.1f} → {valores['requisicoes_por_s']:,.1f} req/s, "
+              f"p99 {anterior['p99_ms']:.2f} → {valores['p99_ms']:.2f} ms ({razao:.2f}x)")
+    print()
+
+
+def executar(escala=ESCALA):
+    """Sobe a API (ou usa ANS_ALVO), aplica a carga, grava e imprime o resultado."""
+    print("=" * 60)
+    alvo = ALVO or f"local ({SERVIDOR}, x{escala:g})"
+    print(f"TESTE DE CARGA: {CONCORRENCIA} usuários, {DURACAO:g} s, {alvo}")
+    print("=" * 60)
+    print()
+
+    processo = None
+    with tempfile.NamedTemporaryFile('w', suffix='.log', prefix='api-', delete=False) as log:
+        try:
+            url = ALVO
+            if url is None:
+                variaveis = preparar_dados(pasta_escala(escala))
+                processo, url = iniciar_servidor(variaveis, log)
+                print(f"🌐 {url} (pid {processo.pid}, log {log.name})")
+
+            termos = termos_busca(url)
+            inicio = time.perf_counter()
+            fim = inicio + AQUECIMENTO + DURACAO
+            usuarios = [UsuarioVirtual(url, termos, SEMENTE + numero, fim) for numero in range(CONCORRENCIA)]
+            for usuario in usuarios:
+                usuario.start()
+            for usuario in usuarios:
+                usuario.join()
+        finally:
+            if processo is not None:
+                parar_servidor(processo)
+
+    # Só as requisições iniciadas depois do aquecimento
+    medidas = [medida for usuario in usuarios for medida in usuario.medidas if medida[1] >= inicio + AQUECIMENTO]
+    if not medidas:
+        raise RuntimeError("Nenhuma requisição medida (aumente ANS_DURACAO)")
+    resumo = resumir(medidas, DURACAO)
+    exibir(resumo)
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'escala': None if ALVO else escala,
+        'alvo': ALVO,
+        'servidor': None if ALVO else SERVIDOR,
+        'workers': None if ALVO or SERVIDOR != 'gunicorn' else int(os.environ.get('ANS_WORKERS', os.cpu_count() or 1)),
+        'concorrencia': CONCORRENCIA,
+        'duracao_s': DURACAO,
+        'aquecimento_s': AQUECIMENTO,
+        'pausa_ms': PAUSA_MS,
+        'codigo': versao_codigo(),
+        'ambiente': ambiente(),
+        'rotas': resumo,
+    }
+
+    PASTA_RESULTADOS.mkdir(exist_ok=True)
+    commit = (relatorio['codigo']['commit'] or 'sem-git')[:10]
+    caminho = PASTA_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}-carga-c{CONCORRENCIA}.json"
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"💾 {caminho}\n")
+    os.unlink(log.name)
+
+    if COMPARAR_COM:
+        with open(COMPARAR_COM, 'r', encoding='utf-8') as arquivo:
+            comparar(json.load(arquivo), relatorio)
+    return relatorio
+
+
+if __name__ == '__main__':
+    executar()
@@ -0,0 +1,284 @@
+# DADOS SINTÉTICOS NO FORMATO ANS
+# Autora: Jéssica Mara de Morais Machado
+# Objetivo: Gerar ZIPs trimestrais, cadastro de operadoras e consolidado em escala configurável (1x a 100x) para medir o desempenho do pipeline e da API
+
+# Bibliotecas
+
+import csv
+import io
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configurações
+
+PASTA_DESEMPENHO = Path(__file__).resolve().parent
+
+# Escala 1x: 1.500 operadoras nas demonstrações e 50 mil linhas por trimestre
+# (os arquivos reais da ANS têm ~700 mil linhas por trimestre, ~14x)
+ESCALA = float(os.environ.get('ANS_ESCALA', '1'))
+SEMENTE = int(os.environ.get('ANS_SEMENTE', '42'))
+
+OPERADORAS_BASE = 1_500
+LINHAS_POR_TRIMESTRE_BASE = 50_000
+
+ANO = 2025
+TRIMESTRES = ['1T', '2T', '3T']
+
+# Parte das operadoras das demonstrações que está no cadastro de ativas
+# (as demais caem em FlagSemCadastro) e operadoras só no cadastro
+FRACAO_COM_CADASTRO = 0.75
+FRACAO_SO_CADASTRO = 0.05
+
+# Qualidade dos dados, como nos arquivos reais
+FRACAO_ZERADOS = 0.03
+FRACAO_NEGATIVOS = 0.02
+FRACAO_DUPLICADAS = 0.02          # linha repetida (mesmo REG_ANS, conta e valor)
+FRACAO_DUPLICADAS_LOGICAS = 0.01  # mesmo REG_ANS e valor em outra conta
+FRACAO_CNPJ_INVALIDO = 0.03
+FRACAO_RAZAO_VAZIA = 0.005
+FRACAO_REG_ANS_REPETIDO = 0.005   # REG_ANS repetido no cadastro
+
+CONTAS = [
+    ('411111', 'EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS'),
+    ('411121', 'EVENTOS - CONSULTAS MÉDICAS'),
+    ('411131', 'EVENTOS - EXAMES'),
+    ('411141', 'EVENTOS - TERAPIAS'),
+    ('411151', 'EVENTOS - INTERNAÇÕES'),
+    ('411161', 'EVENTOS - OUTROS ATENDIMENTOS AMBULATORIAIS'),
+    ('4121', 'VARIAÇÃO DA PROVISÃO DE EVENTOS OCORRIDOS E NÃO AVISADOS'),
+    ('431', 'DESPESAS DE COMERCIALIZAÇÃO'),
+    ('441', 'OUTRAS DESPESAS OPERACIONAIS'),
+    ('461', 'DESPESAS ADMINISTRATIVAS'),
+    ('4611', 'DESPESAS COM PESSOAL PRÓPRIO'),
+    ('4612', 'DESPESAS COM SERVIÇOS DE TERCEIROS'),
+    ('4613', 'DESPESAS COM LOCALIZAÇÃO E FUNCIONAMENTO'),
+    ('4614', 'DESPESAS COM PUBLICIDADE E PROPAGANDA'),
+    ('4615', 'DESPESAS COM TRIBUTOS'),
+    ('471', 'DESPESAS FINANCEIRAS'),
+]
+
+MODALIDADES = ['Administradora de Benefícios', 'Autogestão', 'Cooperativa Médica',
+               'Cooperativa Odontológica', 'Filantropia', 'Medicina de Grupo',
+               'Odontologia de Grupo', 'Seguradora Especializada em Saúde']
+PESOS_MODALIDADES = [0.15, 0.13, 0.25, 0.08, 0.04, 0.2, 0.13, 0.02]
+
+UFS = ['SP', 'MG', 'RJ', 'PR', 'RS', 'SC', 'BA', 'GO', 'PE', 'CE', 'ES', 'DF', 'PA', 'MT', 'MS',
+       'MA', 'PB', 'RN', 'AL', 'PI', 'SE', 'AM', 'RO', 'TO', 'AC', 'AP', 'RR']
+PESOS_UFS = np.array([30, 12, 10, 7, 6, 5, 4, 3, 3, 2.5, 2, 2, 1.5, 1.5, 1.5,
+                      1, 1, 1, 1, 1, 0.8, 0.8, 0.6, 0.5, 0.3, 0.3, 0.2])
+
+PREFIXOS = ['UNIMED', 'SAÚDE', 'ODONTO', 'VIDA', 'BEM ESTAR', 'SÃO LUCAS', 'SANTA CASA', 'HOSPITAL',
+            'ASSOCIAÇÃO', 'CAIXA DE ASSISTÊNCIA', 'AMIGO', 'PREVIDÊNCIA', 'SORRISO', 'MÉDICA',
+            'CLÍNICA', 'FUNDAÇÃO', 'SERVIÇO SOCIAL', 'PLANO', 'CUIDAR', 'INTERMÉDICA']
+CIDADES = ['CAMPINAS', 'SÃO PAULO', 'BELO HORIZONTE', 'CURITIBA', 'PORTO ALEGRE', 'RECIFE',
+           'SALVADOR', 'FORTALEZA', 'GOIÂNIA', 'VITÓRIA', 'JUNDIAÍ', 'LONDRINA', 'MARINGÁ',
+           'RIBEIRÃO PRETO', 'SOROCABA', 'UBERLÂNDIA', 'JOINVILLE', 'BLUMENAU', 'NATAL', 'BELÉM',
+           'MANAUS', 'CUIABÁ', 'ALTO VALE', 'VALE DO PARAÍBA', 'CERRADO', 'LITORAL NORTE']
+SUFIXOS = ['LTDA', 'LTDA.', 'S.A.', 'S/A', 'COOPERATIVA DE TRABALHO MÉDICO',
+           'ADMINISTRADORA DE BENEFÍCIOS LTDA', 'OPERADORA DE PLANOS DE SAÚDE LTDA', 'EIRELI']
+
+COLUNAS_CADASTRO = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Nome_Fantasia', 'Modalidade',
+                    'Logradouro', 'Numero', 'Complemento', 'Bairro', 'Cidade', 'UF', 'CEP', 'DDD',
+                    'Telefone', 'Fax', 'Endereco_eletronico', 'Representante', 'Cargo_Representante',
+                    'Regiao_de_Comercializacao', 'Data_Registro_ANS']
+
+# Funções
+
+
+def pasta_escala(escala=ESCALA):
+    """Pasta dos dados de uma escala (ex.: desempenho/dados/x10)."""
+    return PASTA_DESEMPENHO / 'dados' / f"x{escala:g}"
+
+
+def gerar_reg_ans(rng, quantidade):
+    """REG_ANS distintos de 6 dígitos (faixa dos registros reais, ampliada se preciso)."""
+    inicio, fim = (300_000, 500_000) if quantidade <= 150_000 else (100_000, 1_000_000)
+    return rng.choice(np.arange(inicio, fim), size=quantidade, replace=False)
+
+
+def gerar_cnpjs(rng, quantidade):
+    """CNPJs de 14 dígitos com dígitos verificadores corretos (mesmo cálculo de validar_cnpj)."""
+    digitos = rng.integers(0, 10, size=(quantidade, 14))
+    digitos[:, 8:12] = [0, 0, 0, 1]  # matriz
+
+    for posicao, pesos in [(12, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]),
+                           (13, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])]:
+        resto = (digitos[:, :posicao] * pesos).sum(axis=1) % 11
+        digitos[:, posicao] = np.where(resto < 2, 0, 11 - resto)
+
+    return [''.join(map(str, linha)) for linha in digitos.tolist()]
+
+
+def gerar_razoes_sociais(rng, quantidade):
+    """Razões sociais distintas combinando prefixo, cidade e sufixo (com acentos, para a busca)."""
+    razoes = pd.Series([f"{PREFIXOS[p]} {CIDADES[c]} {SUFIXOS[s]}" for p, c, s in zip(
+        rng.integers(0, len(PREFIXOS), quantidade), rng.integers(0, len(CIDADES), quantidade),
+        rng.integers(0, len(SUFIXOS), quantidade))])
+    repeticao = razoes.groupby(razoes).cumcount()
+    return razoes.where(repeticao == 0, razoes + ' ' + (repeticao + 1).astype(str)).tolist()
+
+
+def gerar_cadastro(rng, reg_ans_demonstracoes):
+    """
+    Cadastro de operadoras ativas (Relatorio_cadop.csv): parte das operadoras
+    das demonstrações, algumas só no cadastro, CNPJs com dígito errado,
+    razões sociais vazias e REG_ANS repetidos.
+    """
+    com_cadastro = rng.choice(reg_ans_demonstracoes,
+                              size=int(len(reg_ans_demonstracoes) * FRACAO_COM_CADASTRO), replace=False)
+    candidatos = np.setdiff1d(gerar_reg_ans(rng, len(reg_ans_demonstracoes) * 2), reg_ans_demonstracoes)
+    so_cadastro = candidatos[:int(len(reg_ans_demonstracoes) * FRACAO_SO_CADASTRO)]
+    reg_ans = np.concatenate([com_cadastro, so_cadastro])
+    quantidade = len(reg_ans)
+
+    cnpjs = gerar_cnpjs(rng, quantidade)
+    for posicao in np.flatnonzero(rng.random(quantidade) < FRACAO_CNPJ_INVALIDO).tolist():
+        cnpjs[posicao] = cnpjs[posicao][:13] + str((int(cnpjs[posicao][13]) + 1) % 10)
+
+    razoes = gerar_razoes_sociais(rng, quantidade)
+    for posicao in np.flatnonzero(rng.random(quantidade) < FRACAO_RAZAO_VAZIA).tolist():
+        razoes[posicao] = ''
+
+    cidades = np.array(CIDADES)[rng.integers(0, len(CIDADES), quantidade)]
+    cadastro = pd.DataFrame({
+        'REGISTRO_OPERADORA': reg_ans,
+        'CNPJ': cnpjs,
+        'Razao_Social': razoes,
+        'Nome_Fantasia': np.where(rng.random(quantidade) < 0.6,
+                                  [f"{razao.split(' ')[0]} {cidade}" for razao, cidade in zip(razoes, cidades)], ''),
+        'Modalidade': rng.choice(MODALIDADES, size=quantidade, p=PESOS_MODALIDADES),
+        'Logradouro': 'RUA ' + pd.Series(cidades),
+        'Numero': rng.integers(1, 3000, quantidade),
+        'Complemento': '',
+        'Bairro': 'CENTRO',
+        'Cidade': cidades,
+        'UF': rng.choice(UFS, size=quantidade, p=PESOS_UFS / PESOS_UFS.sum()),
+        'CEP': rng.integers(1_000_000, 99_999_999, quantidade).astype(str),
+        'DDD': rng.integers(11, 99, quantidade),
+        'Telefone': rng.integers(30_000_000, 39_999_999, quantidade),
+        'Fax': '',
+        'Endereco_eletronico': [f"contato{registro}@operadora.com.br" for registro in reg_ans.tolist()],
+        'Representante': 'REPRESENTANTE LEGAL',
+        'Cargo_Representante': 'DIRETOR',
+        'Regiao_de_Comercializacao': rng.integers(1, 7, quantidade),
+        'Data_Registro_ANS': pd.to_datetime('2000-01-01') + pd.to_timedelta(rng.integers(0, 9000, quantidade), 'D'),
+    }, columns=COLUNAS_CADASTRO)
+    cadastro['Data_Registro_ANS'] = cadastro['Data_Registro_ANS'].dt.strftime('%Y-%m-%d')
+
+    # REG_ANS repetidos: mesma operadora com outro CNPJ (o Teste 2 mantém a primeira)
+    repetidos = cadastro.sample(n=int(quantidade * FRACAO_REG_ANS_REPETIDO), random_state=rng.integers(2 ** 31))
+    repetidos = repetidos.assign(CNPJ=gerar_cnpjs(rng, len(repetidos)))
+    return pd.concat([cadastro, repetidos], ignore_index=True)
+
+
+def gerar_trimestre(rng, reg_ans, pesos, linhas):
+    """
+    Linhas de um trimestre: REG_ANS com distribuição desigual (operadoras
+    grandes têm mais lançamentos), valores log-normais, zerados/negativos e
+    duplicatas exatas e lógicas.
+    """
+    base = linhas - int(linhas * FRACAO_DUPLICADAS) - int(linhas * FRACAO_DUPLICADAS_LOGICAS)
+    contas = rng.integers(0, len(CONTAS), base)
+    valores = np.round(rng.lognormal(mean=11, sigma=2.5, size=base), 2)
+    sorteio = rng.random(base)
+    valores[sorteio < FRACAO_ZERADOS] = 0.0
+    negativos = (sorteio >= FRACAO_ZERADOS) & (sorteio < FRACAO_ZERADOS + FRACAO_NEGATIVOS)
+    valores[negativos] = -valores[negativos]
+
+    df = pd.DataFrame({'REG_ANS': rng.choice(reg_ans, size=base, p=pesos),
+                       'CONTA': contas, 'VL_SALDO_FINAL': valores})
+
+    duplicadas = df.sample(n=int(linhas * FRACAO_DUPLICADAS), random_state=rng.integers(2 ** 31))
+    logicas = df.sample(n=int(linhas * FRACAO_DUPLICADAS_LOGICAS), random_state=rng.integers(2 ** 31))
+    logicas = logicas.assign(CONTA=(logicas['CONTA'] + 1) % len(CONTAS))
+
+    df = pd.concat([df, duplicadas, logicas], ignore_index=True)
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def escrever_zip_trimestre(df, trimestre, pasta):
+    """ZIP no formato do FTP da ANS: <T>T<ANO>.zip com <T>T<ANO>.csv (';', aspas, vírgula decimal)."""
+    nome = f"{trimestre}{ANO}"
+    codigos = np.array([conta[0] for conta in CONTAS])
+    descricoes = np.array([conta[1] for conta in CONTAS])
+    mes = (int(trimestre[0]) - 1) * 3 + 1
+
+    saida = pd.DataFrame({
+        'DATA': f"{ANO}-{mes:02d}-01",
+        'REG_ANS': df['REG_ANS'],
+        'CD_CONTA_CONTABIL': codigos[df['CONTA']],
+        'DESCRICAO': descricoes[df['CONTA']],
+        'VL_SALDO_INICIAL': df['VL_SALDO_FINAL'] * 0.9,
+        'VL_SALDO_FINAL': df['VL_SALDO_FINAL'],
+    })
+
+    caminho = pasta / f"{nome}.zip"
+    with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        with zip_ref.open(f"{nome}.csv", 'w') as membro, \
+                io.TextIOWrapper(membro, encoding='utf-8', newline='') as arquivo:
+            saida.to_csv(arquivo, sep=';', decimal=',', float_format='%.2f', index=False,
+                         quoting=csv.QUOTE_ALL)
+    return caminho
+
+
+def linhas_consolidado(df, trimestre):
+    """Mesmas linhas no formato de consolidado_despesas.csv (saída do Teste 1)."""
+    consolidado = pd.DataFrame({
+        'REG_ANS': df['REG_ANS'],
+        'CNPJ': pd.NA,
+        'RazaoSocial': pd.NA,
+        'Ano': ANO,
+        'Trimestre': trimestre,
+        'ValorDespesas': df['VL_SALDO_FINAL'],
+    })
+    consolidado['FlagValorSuspeito'] = consolidado['ValorDespesas'] <= 0
+    # Mesmo critério do Teste 1: REG_ANS + período + valor repetidos (a primeira fica)
+    consolidado['FlagDuplicado'] = consolidado.duplicated(['REG_ANS', 'Ano', 'Trimestre', 'ValorDespesas'])
+    return consolidado
+
+
+def gerar_dados(escala=ESCALA, pasta=None, semente=SEMENTE):
+    """
+    Gera em `pasta` (padrão desempenho/dados/x<escala>): downloads/<T>T2025.zip,
+    Relatorio_cadop.csv e consolidado_despesas.csv. Retorna um resumo.
+    """
+    pasta = Path(pasta) if pasta else pasta_escala(escala)
+    (pasta / 'downloads').mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semente)
+
+    print(f"🧪 Dados sintéticos x{escala:g} → {pasta}")
+    inicio = time.perf_counter()
+
+    quantidade = max(int(OPERADORAS_BASE * escala), 10)
+    reg_ans = gerar_reg_ans(rng, quantidade)
+    pesos = rng.lognormal(mean=0, sigma=1.2, size=quantidade)
+    pesos /= pesos.sum()
+
+    cadastro = gerar_cadastro(rng, reg_ans)
+    cadastro.to_csv(pasta / 'Relatorio_cadop.csv', sep=';', index=False, quoting=csv.QUOTE_ALL)
+    print(f"  ✅ Relatorio_cadop.csv: {len(cadastro):,} operadoras")
+
+    linhas = int(LINHAS_POR_TRIMESTRE_BASE * escala)
+    total = 0
+    with open(pasta / 'consolidado_despesas.csv', 'w', encoding='utf-8-sig', newline='') as consolidado:
+        for numero, trimestre in enumerate(TRIMESTRES):
+            df = gerar_trimestre(rng, reg_ans, pesos, linhas)
+            escrever_zip_trimestre(df, trimestre, pasta / 'downloads')
+            linhas_consolidado(df, trimestre).to_csv(consolidado, sep=';', index=False, header=numero == 0)
+            total += len(df)
+            print(f"  ✅ downloads/{trimestre}{ANO}.zip: {len(df):,} linhas")
+            del df
+
+    print(f"  ✅ consolidado_despesas.csv: {total:,} linhas")
+    print(f"  ⏱️  {time.perf_counter() - inicio:.1f} s\n")
+    return {'pasta': str(pasta), 'escala': escala, 'operadoras': quantidade,
+            'cadastro': len(cadastro), 'linhas': total}
+
+
+if __name__ == '__main__':
+    gerar_dados()